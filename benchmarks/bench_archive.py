@@ -0,0 +1,129 @@
+"""Hot-path order query latency before and after archiving old orders.
+
+    python -m benchmarks.bench_archive --orders 10000000
+
+Seeds --orders orders spread over --days days of history. The order queries
+behind my_orders, manage_orders, the dashboard and the last-30-days export
+are timed against the full table. store.archive.archive_orders() then moves
+finished orders older than --archive-days into the archive tables, and the
+same queries are timed again on the hot table, and with ?history=1 over both
+tiers.
+
+The order templates are missing from the tree, so the querysets are timed
+directly rather than through the test client. "count" is a plain COUNT(*)
+of the hot table, which shows how much each full scan costs.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import (
+    add_common_arguments, print_table, seed_catalog, seed_orders, setup_django, summarize,
+    time_calls,
+)
+
+
+def hot_path(customer_ids, rng, history):
+    """{name: callable} of the order queries the views run"""
+    from datetime import timedelta
+
+    from django.utils import timezone
+    from store import archive, exports
+    from store.models import ArchivedOrder, Order
+    from store.pagination import KeysetPaginator, MergedKeysetPaginator
+
+    def listing(status=None):
+        orders = Order.objects.select_related('customer').with_items()
+        archived = ArchivedOrder.objects.select_related('customer').with_items()
+        if status:
+            orders, archived = orders.filter(status=status), archived.filter(status=status)
+        if history:
+            paginator = MergedKeysetPaginator([orders, archived], ordering=('-date', '-id'))
+        else:
+            paginator = KeysetPaginator(orders, ordering=('-date', '-id'))
+        first = paginator.page()
+        return len(paginator.page(first.next_cursor))
+
+    def my_orders():
+        customer_id = rng.choice(customer_ids)
+        orders = Order.objects.filter(customer_id=customer_id)
+        if history:
+            return len(archive.newest_first(orders, ArchivedOrder.objects.filter(customer_id=customer_id)))
+        return len(list(orders))
+
+    start, end = timezone.now() - timedelta(days=30), None
+    return {
+        'my_orders': my_orders,
+        'manage_orders page 2': listing,
+        'manage_orders Delivered p2': lambda: listing('Delivered'),
+        'dashboard recent orders': lambda: len(list(Order.objects.all()[:5])),
+        'export last 30 days': lambda: sum(1 for _ in exports.order_rows(start, end, history=history)),
+        'count': lambda: Order.objects.count(),
+    }
+
+
+def measure(customer_ids, repeat, seed, history=False):
+    rng = random.Random(seed)
+    results = {}
+    for name, query in hot_path(customer_ids, rng, history).items():
+        calls = 3 if name in ('export last 30 days', 'count') else repeat
+        query()  # warm the page cache
+        results[name] = summarize(time_calls(query, [()] * calls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=1095, help='Days of order history to seed')
+    parser.add_argument('--archive-days', type=int, default=180)
+    parser.add_argument('--repeat', type=int, default=50)
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    from store import aggregates, archive
+    from store.models import ArchivedOrder, Customer, Order, Product
+
+    if Product.objects.count() < options.products:
+        seed_catalog(options.products)
+    missing = options.orders - Order.objects.count() - ArchivedOrder.objects.count()
+    if missing > 0:
+        start = time.perf_counter()
+        seed_orders(missing, customers=options.customers, days=options.days, batch_size=50000)
+        aggregates.rebuild()
+        print(f'Seeded {missing} orders in {time.perf_counter() - start:.1f}s')
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+    totals_before = aggregates.dashboard_totals()
+
+    before = measure(customer_ids, options.repeat, options.seed)
+    start = time.perf_counter()
+    moved, payments = archive.archive_orders(options.archive_days, batch_size=archive.BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    after = measure(customer_ids, options.repeat, options.seed)
+    history = measure(customer_ids, options.repeat, options.seed, history=True)
+
+    print(f'Archived {moved} orders and {payments} payments in {elapsed:.1f}s '
+          f'({moved / max(elapsed, 1e-9):.0f} orders/s); hot table now {Order.objects.count()} '
+          f'rows, archive {ArchivedOrder.objects.count()}')
+    print(f'Dashboard totals unchanged: {aggregates.dashboard_totals() == totals_before}')
+    rows = []
+    for name in before:
+        rows.append({
+            'query': name,
+            'before_p50_ms': before[name]['p50_ms'],
+            'hot_p50_ms': after[name]['p50_ms'],
+            'history_p50_ms': history[name]['p50_ms'],
+            'before_p95_ms': before[name]['p95_ms'],
+            'hot_p95_ms': after[name]['p95_ms'],
+        })
+    print_table(rows, ['query', 'before_p50_ms', 'hot_p50_ms', 'history_p50_ms',
+                       'before_p95_ms', 'hot_p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
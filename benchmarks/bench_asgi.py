@@ -0,0 +1,166 @@
+"""Requests/sec of the catalog read views over WSGI and ASGI at equal concurrency.
+
+    python -m benchmarks.bench_asgi --products 20000 --concurrency 16 --requests 2000
+
+All modes replay the same mix of home, product_list (deep cursors and
+category filters) and product_detail URLs against one seeded database.
+Each mode runs in its own subprocess, since ASYNC_CATALOG_VIEWS is read at
+startup:
+
+  wsgi        sync views in views.py; N threads, each with a test Client
+  asgi        async views in async_views.py; N concurrent AsyncClient tasks
+              on one event loop, each request in its own ThreadSensitiveContext
+              as an ASGI server would run it
+  asgi-sync   the sync views served over ASGI, for reference
+
+The catalog fragment cache starts empty, and the random cursors and ids
+keep most product_list and product_detail requests as cache misses.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import add_common_arguments, print_table, seed_catalog, setup_django, summarize
+
+MODES = {
+    'wsgi': {'ASYNC_CATALOG_VIEWS': 'False'},
+    'asgi': {'ASYNC_CATALOG_VIEWS': 'True'},
+    'asgi-sync': {'ASYNC_CATALOG_VIEWS': 'False'},
+}
+
+
+def request_mix(count, seed):
+    from django.urls import reverse
+    from store.models import Category, Product
+    from store.pagination import encode_cursor
+
+    rng = random.Random(seed)
+    category_ids = list(Category.objects.values_list('id', flat=True))
+    max_id = Product.objects.order_by('-id').values_list('id', flat=True).first()
+    urls = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.2:
+            urls.append((reverse('home'), {}))
+        elif kind < 0.4:
+            urls.append((reverse('product_list'), {'category': rng.choice(category_ids)}))
+        elif kind < 0.6:
+            urls.append((reverse('product_list'), {'cursor': encode_cursor([rng.randint(1, max_id)])}))
+        else:
+            urls.append((reverse('product_detail', args=[rng.randint(1, max_id)]), {}))
+    return urls
+
+
+def run_threads(urls, concurrency):
+    from django.db import connection
+    from django.test import Client
+
+    latencies = []
+    lock = threading.Lock()
+    chunks = [urls[i::concurrency] for i in range(concurrency)]
+
+    def worker(chunk):
+        client = Client()
+        try:
+            for path, params in chunk:
+                start = time.perf_counter()
+                client.get(path, params)
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, chunks))
+    return latencies
+
+
+def run_event_loop(urls, concurrency):
+    from asgiref.sync import ThreadSensitiveContext
+    from django.test import AsyncClient
+
+    latencies = []
+    chunks = [urls[i::concurrency] for i in range(concurrency)]
+
+    async def worker(chunk):
+        client = AsyncClient()
+        for path, params in chunk:
+            start = time.perf_counter()
+            async with ThreadSensitiveContext():
+                await client.get(path, params)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async def main():
+        await asyncio.gather(*(worker(chunk) for chunk in chunks))
+
+    asyncio.run(main())
+    return latencies
+
+
+def run_mode(options):
+    setup_django(options.database)
+    from django.core.cache import caches
+
+    caches['catalog'].clear()
+    urls = request_mix(options.requests, options.seed)
+    runner = run_threads if options.run == 'wsgi' else run_event_loop
+    start = time.perf_counter()
+    latencies = runner(urls, options.concurrency)
+    elapsed = time.perf_counter() - start
+    result = {'mode': options.run, 'concurrency': options.concurrency,
+              'requests': len(latencies), 'per_s': round(len(latencies) / elapsed, 1)}
+    result.update({key: value for key, value in summarize(latencies).items() if key != 'count'})
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Threads for WSGI, concurrent tasks for ASGI')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run:
+        run_mode(options)
+        return
+
+    database = setup_django(options.database)
+    from store import facets, search
+    from store.models import Product
+
+    if Product.objects.count() < options.products:
+        seed_catalog(options.products - Product.objects.count())
+        search.rebuild_index()
+        facets.rebuild()
+
+    rows = []
+    for mode in options.modes:
+        env = dict(os.environ, **MODES[mode])
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        command = [sys.executable, '-m', 'benchmarks.bench_asgi', '--run', mode,
+                   '--database', database, '--seed', str(options.seed),
+                   '--concurrency', str(options.concurrency), '--requests', str(options.requests)]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            print(completed.stderr, file=sys.stderr)
+            continue
+        rows.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_table(rows, ['mode', 'concurrency', 'requests', 'per_s', 'mean_ms', 'p50_ms',
+                       'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
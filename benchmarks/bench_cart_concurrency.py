@@ -0,0 +1,64 @@
+"""Fire parallel add-to-cart requests for one user and check the final quantity.
+
+    python -m benchmarks.bench_cart_concurrency --clicks 200 --workers 16
+
+Each worker thread drives the real add_to_cart view through its own test
+client. The run fails (exit status 1) if the cart does not end up with
+exactly one row holding every click.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import add_common_arguments, seed_catalog, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument('--clicks', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16)
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+    from store.models import Cart, Customer, Product
+
+    if not Product.objects.exists():
+        seed_catalog(10)
+    product = Product.objects.first()
+    user = User.objects.create_user('bench-cart', password='bench-cart')
+    customer = Customer.objects.create(user=user, name='Bench', email='b@example.com',
+                                       phone='9999999999', address='Surat')
+    url = reverse('add_to_cart', args=[product.pk])
+
+    def click(_):
+        try:
+            client = Client()
+            client.force_login(user)
+            return client.get(url).status_code
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.workers) as pool:
+        statuses = list(pool.map(click, range(options.clicks)))
+    elapsed = time.perf_counter() - start
+
+    rows = list(Cart.objects.filter(customer=customer, product=product).values_list('quantity', flat=True))
+    print(f'{options.clicks} clicks from {options.workers} threads in {elapsed:.2f}s '
+          f'({options.clicks / elapsed:.0f} req/s)')
+    print(f'responses: {sorted(set(statuses))}  cart rows: {len(rows)}  quantity: {sum(rows)}')
+    if rows != [options.clicks]:
+        print('FAIL: clicks were lost or duplicated')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
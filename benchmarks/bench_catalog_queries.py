@@ -0,0 +1,77 @@
+"""Count the SQL queries issued by the catalog pages as the catalog grows.
+
+    python -m benchmarks.bench_catalog_queries --sizes 8 48 200
+
+Each page is fetched twice: cold (empty catalog cache) and warm. Exits with
+status 1 if any page's query count depends on the number of products, i.e.
+if an N+1 lookup has crept back into a view or template.
+"""
+import argparse
+import sys
+
+from benchmarks.common import add_common_arguments, print_table, setup_django
+
+
+def seed(size):
+    from store.models import Category, Product, ProductImage
+
+    ProductImage.objects.all().delete()
+    Product.objects.all().delete()
+    categories = [Category.objects.get_or_create(name=f'Category {i}')[0] for i in range(4)]
+    products = Product.objects.bulk_create([
+        Product(name=f'Ring {i}', description='solitaire diamond ring', price=1000 + i,
+                category=categories[i % len(categories)], carat=1)
+        for i in range(size)
+    ])
+    ProductImage.objects.bulk_create([
+        ProductImage(product=product, image_path=f'products/{product.pk}-{n}.jpg')
+        for product in products for n in range(2)
+    ])
+    return products[0].pk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 48, 200])
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    client = Client()
+    rows = []
+    for size in options.sizes:
+        first_pk = seed(size)
+        # bulk_create sends no signals, so nothing has invalidated the fragments.
+        caches['catalog'].clear()
+        pages = {
+            'home': reverse('home'),
+            'product_list': reverse('product_list'),
+            'product_detail': reverse('product_detail', args=[first_pk]),
+        }
+        row = {'products': size}
+        for name, url in pages.items():
+            for run in ('cold', 'warm'):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+                row[f'{name} {run}'] = len(queries)
+        rows.append(row)
+
+    columns = [f'{name} {run}' for name in ('home', 'product_list', 'product_detail')
+               for run in ('cold', 'warm')]
+    print_table(rows, ['products'] + columns)
+    growing = [name for name in columns if len({row[name] for row in rows}) > 1]
+    if growing:
+        print(f'Query count grows with catalog size on: {", ".join(growing)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
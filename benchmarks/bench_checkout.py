@@ -0,0 +1,77 @@
+"""Writes and latency of checkout for 1, 10 and 100-item carts.
+
+    python -m benchmarks.bench_checkout --sizes 1 10 100 --repeat 20
+
+"legacy" replays a per-item OrderItem.objects.create loop in autocommit
+mode; "place_order" is the transactional bulk service.
+"""
+import argparse
+
+from benchmarks.common import (
+    add_common_arguments, print_table, seed_catalog, setup_django, summarize,
+)
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def legacy_checkout(customer, address, payment_type):
+    from store.models import Cart, Order, OrderItem, Payment
+
+    cart_items = Cart.objects.filter(customer=customer)
+    order = Order.objects.create(customer=customer, name=customer.name, address=address,
+                                 status='Pending')
+    for item in cart_items:
+        OrderItem.objects.create(order=order, product=item.product, price=item.product.price,
+                                 quantity=item.quantity)
+        order.total += item.get_total()
+    order.save(update_fields=['total'])
+    Payment.objects.create(order=order, payment_type=payment_type)
+    cart_items.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    import time
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from store.models import Cart, Customer, Product
+    from store.services import place_order
+
+    if Product.objects.count() < max(options.sizes):
+        seed_catalog(max(options.sizes))
+    products = list(Product.objects.all()[:max(options.sizes)])
+    user, _ = User.objects.get_or_create(username='bench-checkout')
+    customer, _ = Customer.objects.get_or_create(
+        user=user, defaults={'name': 'Bench', 'email': 'b@example.com',
+                             'phone': '9999999999', 'address': 'Surat'}
+    )
+
+    rows = []
+    for size in options.sizes:
+        for label, func in (('legacy', legacy_checkout), ('place_order', place_order)):
+            samples = []
+            for _ in range(options.repeat):
+                Cart.objects.bulk_create([
+                    Cart(customer=customer, product=product, quantity=2)
+                    for product in products[:size]
+                ])
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    func(customer, customer.address, 'COD')
+                    samples.append((time.perf_counter() - start) * 1000)
+            writes = sum(1 for q in queries if q['sql'].lstrip().upper().startswith(WRITE_PREFIXES))
+            rows.append({'items': size, 'path': label, 'queries': len(queries),
+                         'writes': writes, **summarize(samples)})
+    print_table(rows, ['items', 'path', 'queries', 'writes', 'mean_ms', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Concurrent checkout throughput under each database profile.
+
+    python -m benchmarks.bench_db_profiles --workers 16 --checkouts 400
+    DB_ENGINE=postgres DB_NAME=... python -m benchmarks.bench_db_profiles --profiles postgres
+
+Every worker thread is its own customer. It repeatedly fills a 3-item cart
+and calls place_order(), the same write path as the checkout view. Each
+profile runs in a fresh subprocess, because settings are read only once:
+
+  sqlite-default  rollback journal, fsync on every commit, deferred BEGIN and
+                  a 5 s busy timeout (what the old hard-coded settings gave)
+  sqlite-wal      WAL and synchronous=NORMAL only
+  sqlite-tuned    WAL, synchronous=NORMAL, BEGIN IMMEDIATE and a 20 s busy
+                  timeout (the default now)
+  postgres        DB_ENGINE=postgres with the DB_* variables from the
+                  environment; run it against a local or throwaway server
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import add_common_arguments, print_table, seed_catalog, setup_django, summarize
+
+PROFILES = {
+    'sqlite-default': {'DB_ENGINE': 'sqlite', 'SQLITE_WAL': 'False',
+                       'SQLITE_IMMEDIATE_TRANSACTIONS': 'False', 'SQLITE_BUSY_TIMEOUT': '5'},
+    'sqlite-wal': {'DB_ENGINE': 'sqlite', 'SQLITE_WAL': 'True',
+                   'SQLITE_IMMEDIATE_TRANSACTIONS': 'False', 'SQLITE_BUSY_TIMEOUT': '20'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite', 'SQLITE_WAL': 'True',
+                     'SQLITE_IMMEDIATE_TRANSACTIONS': 'True', 'SQLITE_BUSY_TIMEOUT': '20'},
+    'postgres': {'DB_ENGINE': 'postgres'},
+}
+
+
+def run_profile(options):
+    """Run the workload in this process and print one JSON result line"""
+    setup_django(options.database)
+
+    from django.contrib.auth.models import User
+    from django.db import DatabaseError, connection
+    from store.models import Customer, Product
+    from store.services import add_cart_item, place_order
+
+    seed_catalog(50)
+    products = list(Product.objects.all()[:50])
+    customers = []
+    for i in range(options.workers):
+        user = User.objects.create_user(f'bench-db-{i}')
+        customers.append(Customer.objects.create(user=user, name=f'Bench {i}', email='b@example.com',
+                                                 phone='9999999999', address='Surat'))
+
+    per_worker = options.checkouts // options.workers
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(index):
+        customer = customers[index]
+        try:
+            for n in range(per_worker):
+                start = time.perf_counter()
+                try:
+                    for offset in range(3):
+                        add_cart_item(customer, products[(index + n + offset) % len(products)])
+                    place_order(customer, 'Surat', 'COD')
+                except DatabaseError as exc:
+                    with lock:
+                        errors.append(type(exc).__name__ + ': ' + str(exc))
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.workers) as pool:
+        list(pool.map(worker, range(options.workers)))
+    elapsed = time.perf_counter() - start
+
+    result = {'profile': options.run, 'workers': options.workers,
+              'checkouts': len(latencies), 'errors': len(errors),
+              'per_s': round(len(latencies) / elapsed, 1)}
+    result.update({key: value for key, value in summarize(latencies).items() if key != 'count'})
+    if errors:
+        result['first_error'] = errors[0][:80]
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES),
+                        default=['sqlite-default', 'sqlite-wal', 'sqlite-tuned'])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--checkouts', type=int, default=400,
+                        help='Total checkouts, split evenly across the workers')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run:
+        run_profile(options)
+        return
+
+    rows = []
+    for profile in options.profiles:
+        env = dict(os.environ, **PROFILES[profile])
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        command = [sys.executable, '-m', 'benchmarks.bench_db_profiles', '--run', profile,
+                   '--workers', str(options.workers), '--checkouts', str(options.checkouts)]
+        if options.database:
+            command += ['--database', options.database]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            rows.append({'profile': profile, 'first_error': completed.stderr.strip().splitlines()[-1][:80]})
+            continue
+        rows.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_table(rows, ['profile', 'workers', 'checkouts', 'errors', 'per_s', 'mean_ms', 'p50_ms',
+                       'p95_ms', 'p99_ms', 'first_error'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""First-byte latency, throughput and peak memory of the admin CSV exports.
+
+    python -m benchmarks.bench_export --orders 1000000
+
+Each export is fetched through the test client as an admin. "first_row_ms"
+is the time until the first chunk holding data rows (after the header);
+"peak_mb" is the peak Python allocation while consuming the whole response,
+measured in a separate pass with tracemalloc. "legacy list" is what the
+manage_orders page used to do: materialise every order with select_related.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import (
+    add_common_arguments, print_table, seed_catalog, seed_orders, setup_django,
+)
+
+
+def consume(response):
+    """Read a streaming response; returns (first_row_ms, total_s, data rows)"""
+    start = time.perf_counter()
+    first_row_ms = None
+    lines = 0
+    for chunk in response.streaming_content:
+        lines += chunk.count(b'\n')
+        if first_row_ms is None and lines > 1:
+            first_row_ms = (time.perf_counter() - start) * 1000
+    return first_row_ms or 0.0, time.perf_counter() - start, max(lines - 1, 0)
+
+
+def legacy_list():
+    from store.models import Order
+    return len(list(Order.objects.all().select_related('customer').with_items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='Do not materialise the whole table for the baseline row')
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    from datetime import timedelta
+
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+    from django.utils import timezone
+    from store import aggregates
+    from store.models import Admin, Order, Product
+
+    if Product.objects.count() < options.products:
+        seed_catalog(options.products)
+    missing = options.orders - Order.objects.count()
+    if missing > 0:
+        start = time.perf_counter()
+        seed_orders(missing)
+        aggregates.rebuild()
+        print(f'Seeded {missing} orders in {time.perf_counter() - start:.1f}s')
+
+    user, created = User.objects.get_or_create(username='bench-admin')
+    if created:
+        Admin.objects.create(user=user, email='admin@example.com', number='9999999999',
+                             address='Surat')
+    client = Client()
+    client.force_login(user)
+
+    today = timezone.localdate()
+    last_month = {'date_from': (today - timedelta(days=30)).isoformat(),
+                  'date_to': today.isoformat()}
+    cases = [
+        ('orders, all', reverse('export_orders'), {}),
+        ('orders, last 30 days', reverse('export_orders'), last_month),
+        ('orders, Pending', reverse('export_orders'), {'status': 'Pending'}),
+        ('payments, all', reverse('export_payments'), {}),
+        ('report by day', reverse('export_report', args=['day']), {}),
+    ]
+
+    rows = []
+    for label, url, params in cases:
+        first_row_ms, total_s, count = consume(client.get(url, params))
+        tracemalloc.start()
+        consume(client.get(url, params))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append({
+            'export': label, 'rows': count, 'first_row_ms': round(first_row_ms, 1),
+            'total_s': round(total_s, 2), 'rows_per_s': round(count / total_s) if total_s else 0,
+            'peak_mb': round(peak / 2 ** 20, 1),
+        })
+
+    if not options.skip_legacy:
+        start = time.perf_counter()
+        count = legacy_list()
+        total_s = time.perf_counter() - start
+        tracemalloc.start()
+        legacy_list()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append({
+            'export': 'legacy list', 'rows': count, 'first_row_ms': round(total_s * 1000, 1),
+            'total_s': round(total_s, 2), 'rows_per_s': round(count / total_s) if total_s else 0,
+            'peak_mb': round(peak / 2 ** 20, 1),
+        })
+
+    print_table(rows, ['export', 'rows', 'first_row_ms', 'total_s', 'rows_per_s', 'peak_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Storage and query time of per-line orders versus orders with OrderItem lines.
+
+    python -m benchmarks.bench_order_items --orders 1000000
+
+Stops the store app at 0011, before orders had lines, and seeds --orders
+checkouts the way the old place_order() wrote them: one Order and one
+Payment row per cart line, with consecutive ids and the same customer,
+address, status and (within microseconds) date. Most checkouts carry one or
+two pieces (see common.LINE_WEIGHTS). The order tables are measured, the
+sales aggregates are built as the old code kept them, and the order queries
+behind my_orders, manage_orders, the exports and the sales reports are
+timed through the old models. Migration 0012 then groups the rows into
+headers with lines, and the same queries are timed through the new code.
+
+Sizes come from SQLite's dbstat table: every page that a table or its
+indexes use, including the free space inside those pages. The two sides of
+"manage_orders page 2" show 50 rows each: 50 lines before, 50 whole orders
+after.
+"""
+import argparse
+import math
+import os
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.common import (
+    LINE_COUNTS, LINE_WEIGHTS, add_common_arguments, print_table, seed_catalog, seed_customers,
+    setup_django, summarize, time_calls,
+)
+
+LEGACY = ('store', '0011_order_archive')
+MB = 1024 * 1024
+
+
+def legacy_models():
+    """Order and Payment as they were at 0011, from the migration state"""
+    from django.db import connection
+    from django.db.migrations.loader import MigrationLoader
+
+    apps = MigrationLoader(connection).project_state(LEGACY).apps
+    return apps.get_model('store', 'Order'), apps.get_model('store', 'Payment')
+
+
+def seed_legacy(checkouts, customers, days, rng, batch_size=50000):
+    """Insert per-line order and payment rows; returns the number of order rows"""
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from store.models import Product
+
+    Order, Payment = legacy_models()
+    customer_ids = seed_customers(customers)
+    products = list(Product.objects.values_list('id', 'price'))
+    statuses = ['Pending', 'Accepted', 'Rejected', 'Delivered', 'Delivered', 'Delivered']
+    finished = ['Rejected', 'Delivered', 'Delivered', 'Delivered', 'Delivered', 'Delivered']
+    payment_types = ['COD', 'Card', 'UPI', 'NetBanking']
+    now = timezone.now()
+    first = now - timedelta(days=days)
+    step = days * 86400 / max(checkouts, 1)
+    month_ago = now - timedelta(days=30)
+
+    quote = connection.ops.quote_name
+    order_columns = ['id', 'customer_id', 'product_id', 'name', 'address', 'date', 'description',
+                     'price', 'quantity', 'status']
+    payment_columns = ['order_id', 'payment_type', 'payment_date']
+
+    def insert(model, columns):
+        return (f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(map(quote, columns))}) '
+                f'VALUES ({", ".join(["%s"] * len(columns))})')
+
+    # Raw executemany: the historical models have no bulk path that keeps
+    # explicit dates, and this is several times faster than bulk_create.
+    row_id = 0
+    for offset in range(0, checkouts, batch_size):
+        orders, payments = [], []
+        for i in range(offset, min(offset + batch_size, checkouts)):
+            date = first + timedelta(seconds=(i + rng.random()) * step)
+            customer_id = rng.choice(customer_ids)
+            status = rng.choice(finished if date < month_ago else statuses)
+            payment_type = rng.choice(payment_types)
+            for line in range(rng.choices(LINE_COUNTS, LINE_WEIGHTS)[0]):
+                row_id += 1
+                # auto_now_add stamped each row of a bulk insert separately.
+                stamp = date + timedelta(microseconds=40 * line)
+                product_id, price = rng.choice(products)
+                orders.append((row_id, customer_id, product_id, f'Customer {customer_id}', 'Surat',
+                               stamp, '', price, rng.randint(1, 3), status))
+                payments.append((row_id, payment_type, stamp))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(insert(Order, order_columns), orders)
+            cursor.executemany(insert(Payment, payment_columns), payments)
+    return row_id
+
+
+def legacy_totals(Order):
+    """(kind, key, orders, quantity, revenue) rows as the old aggregates.rebuild() built them"""
+    from django.db.models import Count, F, Sum
+    from django.db.models.functions import TruncDay, TruncMonth
+
+    line_total = F('price') * F('quantity')
+    delivered = Order.objects.filter(status='Delivered').order_by()
+    for row in Order.objects.order_by().values('status').annotate(
+            n=Count('id'), qty=Sum('quantity'), total=Sum(line_total)):
+        yield 'status', row['status'], row['n'], row['qty'], row['total']
+    for kind, trunc, fmt in (('day', TruncDay, '%Y-%m-%d'), ('month', TruncMonth, '%Y-%m')):
+        for row in delivered.annotate(period=trunc('date')).values('period').annotate(
+                n=Count('id'), qty=Sum('quantity'), total=Sum(line_total)):
+            yield kind, row['period'].strftime(fmt), row['n'], row['qty'], row['total']
+    for row in delivered.values('product__category_id').annotate(
+            n=Count('id'), qty=Sum('quantity'), total=Sum(line_total)):
+        yield 'category', str(row['product__category_id']), row['n'], row['qty'], row['total']
+
+
+def table_sizes(tables):
+    """{table: (rows, data bytes, index bytes)} from dbstat"""
+    from django.db import connection
+
+    quote = connection.ops.quote_name
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                'SELECT m.type, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name '
+                'WHERE m.tbl_name = %s GROUP BY m.type', [table])
+            pages = dict(cursor.fetchall())
+            cursor.execute(f'SELECT COUNT(*) FROM {quote(table)}')
+            sizes[table] = (cursor.fetchone()[0], pages.get('table', 0), pages.get('index', 0))
+    return sizes
+
+
+def aggregate_rows():
+    from store.models import SalesAggregate
+    return {(row.kind, row.key): (row.order_count, row.quantity, row.revenue)
+            for row in SalesAggregate.objects.all()}
+
+
+def legacy_queries(customer_ids, rng):
+    """{name: callable} of the order queries the old views, exports and reports ran.
+
+    Exports are timed up to the rows from the database, without the CSV
+    formatting, which is the same on both sides.
+    """
+    from django.db.models import F, Sum
+    from django.db.models.functions import TruncMonth
+    from django.utils import timezone
+    from store.pagination import KeysetPaginator
+
+    Order, Payment = legacy_models()
+    start = timezone.now() - timedelta(days=30)
+
+    def manage_orders():
+        paginator = KeysetPaginator(Order.objects.select_related('customer', 'product'),
+                                    ordering=('-date', '-id'))
+        return len(paginator.page(paginator.page().next_cursor))
+
+    def export_orders():
+        return sum(1 for _ in Order.objects.filter(date__gte=start).order_by('date', 'id').values_list(
+            'id', 'date', 'customer__name', 'customer__email', 'product__name',
+            'product__category__name', 'quantity', 'price', 'status', 'address',
+        ).iterator(chunk_size=2000))
+
+    def export_payments():
+        return sum(1 for _ in Payment.objects.filter(payment_date__gte=start).order_by(
+            'payment_date', 'id').values_list(
+            'id', 'payment_date', 'payment_type', 'order_id', 'order__status',
+            'order__customer__name', 'order__price', 'order__quantity',
+        ).iterator(chunk_size=2000))
+
+    return {
+        'my_orders': lambda: len(list(Order.objects.filter(
+            customer_id=rng.choice(customer_ids)).select_related('product'))),
+        'manage_orders page 2': manage_orders,
+        'export orders 30 days': export_orders,
+        'export payments 30 days': export_payments,
+        'sales totals rebuild': lambda: len(list(legacy_totals(Order))),
+        'monthly revenue scan': lambda: len(list(Order.objects.filter(status='Delivered').annotate(
+            month=TruncMonth('date')).values('month').annotate(revenue=Sum(F('price') * F('quantity'))))),
+        'count': lambda: Order.objects.count(),
+    }
+
+
+def current_queries(customer_ids, rng):
+    """{name: callable} of the same queries as the views, exports and reports run them now"""
+    from django.db.models import Sum
+    from django.db.models.functions import TruncMonth
+    from django.utils import timezone
+    from store import aggregates, exports
+    from store.models import Order, OrderItem, Payment
+    from store.pagination import KeysetPaginator
+
+    start = timezone.now() - timedelta(days=30)
+
+    def manage_orders():
+        paginator = KeysetPaginator(
+            Order.objects.select_related('customer').with_items(),
+            ordering=('-date', '-id'))
+        return len(paginator.page(paginator.page().next_cursor))
+
+    return {
+        'my_orders': lambda: len(list(Order.objects.filter(
+            customer_id=rng.choice(customer_ids)).with_items())),
+        'manage_orders page 2': manage_orders,
+        'export orders 30 days': lambda: sum(1 for _ in exports._order_values(Order, start, None, None)),
+        'export payments 30 days': lambda: sum(1 for _ in exports._payment_values(Payment, start, None, None)),
+        'sales totals rebuild': lambda: len(list(aggregates._totals(Order, OrderItem))),
+        'monthly revenue scan': lambda: len(list(Order.objects.filter(status='Delivered').annotate(
+            month=TruncMonth('date')).values('month').annotate(revenue=Sum('total')))),
+        'count': lambda: Order.objects.count(),
+    }
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, query in queries.items():
+        calls = repeat if name in ('my_orders', 'manage_orders page 2') else 3
+        query()  # warm the page cache
+        results[name] = summarize(time_calls(query, [()] * calls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--orders', type=int, default=1000000, help='Checkouts to seed')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=730, help='Days of order history to seed')
+    parser.add_argument('--repeat', type=int, default=50)
+    options = parser.parse_args()
+    if options.database and os.path.exists(options.database):
+        parser.error('--database must name a new file; the benchmark migrates it forward')
+
+    setup_django(options.database, migrate_to=LEGACY)
+
+    from django.core.management import call_command
+    from store import aggregates
+    from store.models import Customer, SalesAggregate
+
+    rng = random.Random(options.seed)
+    seed_catalog(options.products)
+    start = time.perf_counter()
+    legacy_rows = seed_legacy(options.orders, options.customers, options.days, rng)
+    print(f'Seeded {options.orders} checkouts as {legacy_rows} order rows '
+          f'in {time.perf_counter() - start:.1f}s')
+    LegacyOrder, _ = legacy_models()
+    SalesAggregate.objects.bulk_create([
+        SalesAggregate(kind=kind, key=key, order_count=count, quantity=quantity, revenue=revenue)
+        for kind, key, count, quantity, revenue in legacy_totals(LegacyOrder)
+    ], batch_size=1000)
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+
+    before_sizes = table_sizes(['order', 'payment'])
+    before = measure(legacy_queries(customer_ids, random.Random(options.seed)), options.repeat)
+
+    start = time.perf_counter()
+    call_command('migrate', 'store', verbosity=0)
+    elapsed = time.perf_counter() - start
+    from store.models import Order, OrderItem, Payment
+
+    after_sizes = table_sizes(['order', 'order_item', 'payment'])
+    after = measure(current_queries(customer_ids, random.Random(options.seed)), options.repeat)
+    migrated = aggregate_rows()
+    aggregates.rebuild()
+    rebuilt = aggregate_rows()
+    # Revenue is summed in a different order, so compare it with a tolerance.
+    consistent = migrated.keys() == rebuilt.keys() and all(
+        migrated[key][:2] == rebuilt[key][:2] and math.isclose(migrated[key][2], rebuilt[key][2])
+        for key in migrated)
+
+    print(f'Migrated {legacy_rows} rows into {Order.objects.count()} orders, '
+          f'{OrderItem.objects.count()} lines and {Payment.objects.count()} payments '
+          f'in {elapsed:.1f}s ({legacy_rows / max(elapsed, 1e-9):.0f} rows/s)')
+    print(f'Migrated aggregates match a rebuild: {consistent}')
+    rows = []
+    for label, sizes in (('before', before_sizes), ('after', after_sizes)):
+        for table, (count, data, index) in sizes.items():
+            rows.append({'schema': label, 'table': table, 'rows': count,
+                         'data_mb': round(data / MB, 1), 'index_mb': round(index / MB, 1)})
+        rows.append({'schema': label, 'table': 'total', 'rows': sum(size[0] for size in sizes.values()),
+                     'data_mb': round(sum(size[1] for size in sizes.values()) / MB, 1),
+                     'index_mb': round(sum(size[2] for size in sizes.values()) / MB, 1)})
+    print_table(rows, ['schema', 'table', 'rows', 'data_mb', 'index_mb'])
+    print()
+    print_table([{
+        'query': name,
+        'before_p50_ms': before[name]['p50_ms'],
+        'after_p50_ms': after[name]['p50_ms'],
+        'before_p95_ms': before[name]['p95_ms'],
+        'after_p95_ms': after[name]['p95_ms'],
+    } for name in before], ['query', 'before_p50_ms', 'after_p50_ms', 'before_p95_ms', 'after_p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compare the search index against the old icontains filter.
+
+    python -m benchmarks.bench_search --products 100000 --queries 200
+"""
+import argparse
+import random
+
+from benchmarks.common import (
+    WORDS, add_common_arguments, print_table, seed_catalog, setup_django, summarize,
+    time_calls,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    from django.db.models import Q
+    from store import search
+    from store.models import Product
+
+    rng = random.Random(options.seed)
+    if not Product.objects.exists():
+        seed_catalog(options.products, rng=rng)
+    print(f'Indexed {search.rebuild_index()} products with {type(search.get_index()).__name__}')
+
+    # Mix of whole words, typed-so-far prefixes and two-word queries.
+    queries = []
+    for _ in range(options.queries):
+        word = rng.choice(WORDS)
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(word)
+        elif kind < 0.8:
+            queries.append(word[:rng.randint(2, max(2, len(word) - 1))])
+        else:
+            queries.append(f'{word} {rng.choice(WORDS)}')
+
+    # Both paths materialise what product_list renders: every icontains
+    # match before, the ranked (bounded) hit list now.
+    def icontains(query):
+        list(Product.objects.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ))
+
+    def indexed(query):
+        search.search_products(Product.objects.all(), query)
+
+    args = [(query,) for query in queries]
+    rows = []
+    for label, func in (('icontains', icontains), ('search index', indexed)):
+        func(queries[0])
+        rows.append({'path': label, **summarize(time_calls(func, args))})
+    print_table(rows, ['path', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""SQL queries per request across the cart and checkout flow, by session profile.
+
+    python -m benchmarks.bench_sessions --shoppers 20
+
+Each shopper logs in with a password, browses, fills and updates a cart,
+checks out and logs out, through the test client. Every request's queries
+are counted, in total and those on django_session. Profiles:
+
+  db+fallback         SESSION_ENGINE db with the default FallbackStorage
+                      messages (the old settings)
+  cached_db+fallback  cache-backed sessions written through to the database
+  cached_db+cookie    the same with signed-cookie messages (the default now)
+
+The cart, checkout and my_orders templates are missing from the tree, so
+those pages answer 500 after their queries have run. That does not change
+the session traffic.
+"""
+import argparse
+from collections import defaultdict
+
+from benchmarks.common import add_common_arguments, print_table, seed_catalog, setup_django
+
+PROFILES = {
+    'db+fallback': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cached_db+fallback': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cached_db+cookie': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+}
+PASSWORD = 'bench-password'
+
+
+class QueryCounter:
+    def __init__(self):
+        self.total = 0
+        self.session = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if 'django_session' in sql:
+            self.session += 1
+        return execute(sql, params, many, context)
+
+
+def flow(product_ids):
+    """(step, method, url name, args, data) of one shopper visit"""
+    first, second = product_ids
+    return [
+        ('login', 'post', 'login', [], {'password': PASSWORD}),
+        ('home', 'get', 'home', [], None),
+        ('product detail', 'get', 'product_detail', [first], None),
+        ('add to cart', 'get', 'add_to_cart', [first], None),
+        ('cart', 'get', 'cart', [], None),
+        ('add to cart', 'get', 'add_to_cart', [second], None),
+        ('cart', 'get', 'cart', [], None),
+        ('checkout', 'get', 'checkout', [], None),
+        ('place order', 'post', 'checkout', [], {'payment_type': 'COD', 'address': 'Surat'}),
+        ('my orders', 'get', 'my_orders', [], None),
+        ('logout', 'get', 'logout', [], None),
+    ]
+
+
+def run_profile(name, users, product_ids):
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    samples = defaultdict(list)
+    with override_settings(**PROFILES[name]):
+        for cache in ('default', 'catalog', 'sessions'):
+            caches[cache].clear()
+        for index, user in enumerate(users):
+            client = Client(raise_request_exception=False)
+            pair = (product_ids[index % len(product_ids)], product_ids[(index + 1) % len(product_ids)])
+            for step, method, url_name, args, data in flow(pair):
+                if step == 'login':
+                    data = dict(data, username=user.username)
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    getattr(client, method)(reverse(url_name, args=args), data)
+                samples[step].append((counter.total, counter.session))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--shoppers', type=int, default=20)
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    import logging
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from store.models import Customer, Product
+
+    settings.DEBUG = False
+    logging.getLogger('django.request').disabled = True
+    # Password hashing is not what is being measured.
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+    if not Product.objects.exists():
+        seed_catalog(200)
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:50])
+    users = []
+    for i in range(options.shoppers):
+        user, created = User.objects.get_or_create(username=f'bench-session-{i}')
+        if created:
+            user.set_password(PASSWORD)
+            user.save()
+            Customer.objects.create(user=user, name=f'Shopper {i}', email='s@example.com',
+                                    phone='9999999999', address='Surat')
+        users.append(user)
+
+    results = {name: run_profile(name, users, product_ids) for name in options.profiles}
+
+    steps = list(dict.fromkeys(step for step, *_ in flow((0, 0))))
+    rows = []
+    for step in steps:
+        row = {'step': step}
+        for name in options.profiles:
+            counts = results[name][step]
+            row[f'{name} q'] = round(sum(total for total, _ in counts) / len(counts), 1)
+            row[f'{name} session'] = round(sum(session for _, session in counts) / len(counts), 1)
+        rows.append(row)
+    totals = {'step': 'whole visit'}
+    for name in options.profiles:
+        totals[f'{name} q'] = round(sum(sum(total for total, _ in results[name][step])
+                                        for step in steps) / len(users), 1)
+        totals[f'{name} session'] = round(sum(sum(session for _, session in results[name][step])
+                                              for step in steps) / len(users), 1)
+    rows.append(totals)
+    columns = ['step'] + [f'{name} {kind}' for name in options.profiles for kind in ('q', 'session')]
+    print_table(rows, columns)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Bytes transferred for the site's own assets over a storefront visit.
+
+    python -m benchmarks.bench_static --views 20
+
+Renders home, product_list and product_detail through the test client with
+DEBUG off and StaticFilesMiddleware on. Each asset linked from STATIC_URL
+is then fetched the way a browser would. Modes:
+
+  inline      what base.html did before: the site CSS in a <style> block,
+              so every page view carries it uncompressed
+  hashed      the linked, hashed files without compression (a client that
+              sends no Accept-Encoding)
+  hashed+gz   gzip variants (brotli too when the package is installed)
+
+A visit is --views page views cycling over the three pages. With far-future
+immutable caching, only the first view downloads the assets, and later views
+make no asset requests at all. Only response bodies are counted, and the
+CDN-hosted Bootstrap and Font Awesome files are left out.
+"""
+import argparse
+import re
+
+from benchmarks.common import add_common_arguments, print_table, seed_catalog, setup_django
+
+ASSET_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+LINK_RE = re.compile(rb'<link[^>]+/static/[^>]+>')
+HOME_CSS_MARKER = b'/* Home page */'
+
+
+def fetch_assets(client, urls, accept_encoding):
+    """{url: (body bytes, Content-Encoding, Cache-Control)}"""
+    assets = {}
+    for url in urls:
+        response = client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        assert response.status_code == 200, (url, response.status_code)
+        assets[url] = (len(body), response.get('Content-Encoding', ''),
+                       response.get('Cache-Control', ''))
+    return assets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--views', type=int, default=20, help='Page views in one visit')
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    from django.conf import settings
+    from django.contrib.staticfiles import finders
+    from django.test import Client
+    from django.urls import reverse
+    from store import staticfiles
+    from store.models import Product
+
+    settings.DEBUG = False
+    settings.SERVE_STATIC = True
+    if not Product.objects.exists():
+        seed_catalog(200)
+    product_id = Product.objects.order_by('id').values_list('id', flat=True).first()
+    pages = [reverse('home'), reverse('product_list'), reverse('product_detail', args=[product_id])]
+
+    client = Client()
+    html = {page: client.get(page).content for page in pages}
+    asset_urls = sorted({url for content in html.values() for url in ASSET_RE.findall(content.decode())})
+    # The old <style> blocks: the base rules on every page, the home rules
+    # (the end of site.css) on the home page only.
+    with open(finders.find('css/site.css'), 'rb') as handle:
+        base_css, _, home_css = handle.read().partition(HOME_CSS_MARKER)
+    inline = {page: len(content) - sum(len(tag) for tag in LINK_RE.findall(content))
+              + len(base_css) + len(b'<style></style>')
+              + (len(home_css) + len(b'<style></style>') if page == pages[0] else 0)
+              for page, content in html.items()}
+
+    views = [pages[i % len(pages)] for i in range(options.views)]
+    html_total = sum(len(html[page]) for page in views)
+    rows = [{
+        'mode': 'inline',
+        'first_view': inline[views[0]],
+        'repeat_view': round(sum(inline[page] for page in views[1:]) / max(len(views) - 1, 1)),
+        'asset_requests': 0,
+        'visit_bytes': sum(inline[page] for page in views),
+    }]
+    encodings = [('hashed', 'identity'), ('hashed+gz', 'gzip')]
+    if staticfiles.brotli is not None:
+        encodings.append(('hashed+br', 'br, gzip'))
+    served = {}
+    for mode, accept_encoding in encodings:
+        assets = fetch_assets(client, asset_urls, accept_encoding)
+        served[mode] = assets
+        asset_bytes = sum(size for size, _, _ in assets.values())
+        rows.append({
+            'mode': mode,
+            'first_view': len(html[views[0]]) + asset_bytes,
+            'repeat_view': round(sum(len(html[page]) for page in views[1:]) / max(len(views) - 1, 1)),
+            'asset_requests': len(assets),
+            'visit_bytes': html_total + asset_bytes,
+        })
+    baseline = rows[0]['visit_bytes']
+    for row in rows:
+        row['vs_inline_%'] = round((row['visit_bytes'] - baseline) / baseline * 100, 1)
+
+    print_table(rows, ['mode', 'first_view', 'repeat_view', 'asset_requests', 'visit_bytes',
+                       'vs_inline_%'])
+    print()
+    for mode, assets in served.items():
+        for url, (size, encoding, cache_control) in assets.items():
+            print(f'{mode:10} {url} {size} B  Content-Encoding: {encoding or "-"}  '
+                  f'Cache-Control: {cache_control}')
+
+
+if __name__ == '__main__':
+    main()
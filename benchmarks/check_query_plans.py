@@ -0,0 +1,33 @@
+"""Run EXPLAIN QUERY PLAN on the hot storefront and admin queries.
+
+    python -m benchmarks.check_query_plans
+
+A shortcut for ``python manage.py test store.tests.QueryPlanTests``, where
+the queries and the index each one must use are listed. Fails (exit status
+1) if any query reads a table with a full SCAN or misses its index. The
+checks are SQLite-specific and skip on other engines.
+"""
+import argparse
+import os
+import sys
+
+from benchmarks.common import ROOT
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--verbose', action='store_true', help='name every check as it runs')
+    options = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'diamond_aura.settings')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('test', 'store.tests.QueryPlanTests', interactive=False,
+                 verbosity=2 if options.verbose else 1)
+
+
+if __name__ == '__main__':
+    main()
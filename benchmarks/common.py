@@ -0,0 +1,212 @@
+"""Shared helpers for the scripts in this package.
+
+Each benchmark runs against a throwaway SQLite database (or the one named by
+--database) so it never touches db.sqlite3; with DB_ENGINE=postgres it uses a
+freshly created test_<DB_NAME> database instead. Run them from the repository
+root, e.g. ``python -m benchmarks.bench_search --products 100000``.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+WORDS = [
+    'diamond', 'gold', 'silver', 'platinum', 'ring', 'pendant', 'necklace',
+    'bracelet', 'earring', 'solitaire', 'halo', 'vintage', 'classic', 'rose',
+    'oval', 'princess', 'cushion', 'emerald', 'sapphire', 'ruby', 'bridal',
+    'eternity', 'tennis', 'stud', 'drop', 'charm', 'twist', 'pave', 'bezel',
+]
+
+CATEGORY_NAMES = ['Rings', 'Necklaces', 'Earrings', 'Bracelets', 'Pendants', 'Bangles']
+
+# Lines per order: most checkouts carry one or two pieces.
+LINE_COUNTS = [1, 2, 3, 4, 5]
+LINE_WEIGHTS = [50, 25, 13, 7, 5]
+
+
+def setup_django(database=None, migrate_to=None):
+    """Configure Django against a scratch database and create the schema.
+
+    migrate_to=(app_label, migration) stops that app at an older migration,
+    with every other app fully migrated, e.g. to seed data in a legacy
+    layout and time the migration itself; SQLite only."""
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'diamond_aura.settings')
+
+    import django
+    from django.conf import settings
+
+    sqlite = settings.DATABASES['default']['ENGINE'].endswith('sqlite3')
+    if sqlite:
+        if database is None:
+            database = os.path.join(tempfile.mkdtemp(prefix='diamond-aura-bench-'), 'bench.sqlite3')
+        settings.DATABASES['default']['NAME'] = database
+    settings.STATIC_ROOT = tempfile.mkdtemp(prefix='diamond-aura-static-')
+    # Fresh file caches too: fragments cached against another database must not be served.
+    cache_root = tempfile.mkdtemp(prefix='diamond-aura-cache-')
+    for alias, cache in settings.CACHES.items():
+        if cache['BACKEND'].endswith('FileBasedCache'):
+            cache['LOCATION'] = os.path.join(cache_root, alias)
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    # Lets the test client through ALLOWED_HOSTS and keeps mail in memory.
+    setup_test_environment()
+    # Pages rendered with DEBUG off link the hashed names from the manifest.
+    call_command('collectstatic', interactive=False, verbosity=0)
+    if sqlite:
+        if migrate_to:
+            from django.db.migrations.executor import MigrationExecutor
+            executor = MigrationExecutor(connection)
+            leaves = executor.loader.graph.leaf_nodes()
+            executor.migrate([node for node in leaves if node[0] != migrate_to[0]] + [tuple(migrate_to)])
+        else:
+            call_command('migrate', run_syncdb=True, verbosity=0)
+        return database
+    if migrate_to:
+        raise SystemExit('migrate_to needs the SQLite profile')
+    # Other engines (DB_ENGINE=postgres) get a fresh test_<name> database.
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def add_common_arguments(parser):
+    parser.add_argument('--database', help='SQLite file to use instead of a temporary one')
+    parser.add_argument('--seed', type=int, default=28)
+
+
+def seed_catalog(products, batch_size=5000, rng=None):
+    """Bulk insert categories and products; returns the product count"""
+    from store.models import Category, Product
+
+    rng = rng or random.Random(28)
+    categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORY_NAMES]
+    batch = []
+    for i in range(products):
+        batch.append(Product(
+            name=f'{rng.choice(WORDS)[:5]} {i}'[:10],
+            description=' '.join(rng.sample(WORDS, 5))[:50],
+            price=round(rng.uniform(5000, 500000), 2),
+            category=rng.choice(categories),
+            carat=rng.randint(0, 10),
+        ))
+        if len(batch) >= batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+    return products
+
+
+def seed_customers(customers):
+    """Bulk insert customers with their users; returns every customer id"""
+    from django.contrib.auth.models import User
+    from store.models import Customer
+
+    start = User.objects.count()
+    User.objects.bulk_create([User(username=f'bench-{start + i}') for i in range(customers)])
+    users = User.objects.filter(username__startswith='bench-').order_by('-id')[:customers]
+    Customer.objects.bulk_create([
+        Customer(user=user, name=f'Customer {user.pk}', email=f'c{user.pk}@example.com',
+                 phone='9999999999', address='Surat') for user in users
+    ])
+    return list(Customer.objects.values_list('id', flat=True))
+
+
+def seed_orders(orders, customers=1000, days=730, batch_size=10000, rng=None):
+    """Bulk insert customers, orders of 1-5 lines spread over the last `days`
+    days and one payment per order; needs a seeded catalog. Returns the order
+    count.
+
+    Dates rise with the id, as in a real table, and orders older than a month
+    are finished (Delivered or Rejected)."""
+    from datetime import timedelta
+
+    from django.utils import timezone
+    from store.models import Order, OrderItem, Payment, Product
+
+    rng = rng or random.Random(28)
+    customer_ids = seed_customers(customers)
+    products = list(Product.objects.values_list('id', 'price'))
+    statuses = ['Pending', 'Accepted', 'Rejected', 'Delivered', 'Delivered', 'Delivered']
+    finished = ['Rejected', 'Delivered', 'Delivered', 'Delivered', 'Delivered', 'Delivered']
+    payment_types = ['COD', 'Card', 'UPI', 'NetBanking']
+    now = timezone.now()
+    first = now - timedelta(days=days)
+    step = days * 86400 / max(orders, 1)
+    month_ago = now - timedelta(days=30)
+
+    # auto_now_add would stamp every row with the current time.
+    order_date = Order._meta.get_field('date')
+    payment_date = Payment._meta.get_field('payment_date')
+    order_date.auto_now_add = payment_date.auto_now_add = False
+    try:
+        for offset in range(0, orders, batch_size):
+            batch, lines = [], []
+            for i in range(offset, min(offset + batch_size, orders)):
+                date = first + timedelta(seconds=(i + rng.random()) * step)
+                order_lines = []
+                for _ in range(rng.choices(LINE_COUNTS, LINE_WEIGHTS)[0]):
+                    product_id, price = rng.choice(products)
+                    order_lines.append(OrderItem(product_id=product_id, price=price,
+                                                 quantity=rng.randint(1, 3)))
+                batch.append(Order(
+                    customer_id=rng.choice(customer_ids), name='Bench', address='Surat',
+                    total=sum(line.get_total() for line in order_lines),
+                    status=rng.choice(finished if date < month_ago else statuses), date=date,
+                ))
+                lines.append(order_lines)
+            Order.objects.bulk_create(batch)
+            for order, order_lines in zip(batch, lines):
+                for line in order_lines:
+                    line.order_id = order.pk
+            OrderItem.objects.bulk_create([line for order_lines in lines for line in order_lines])
+            Payment.objects.bulk_create([
+                Payment(order_id=order.pk, payment_type=rng.choice(payment_types),
+                        payment_date=order.date) for order in batch
+            ])
+    finally:
+        order_date.auto_now_add = payment_date.auto_now_add = True
+    return orders
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def time_calls(func, args_list):
+    """Call func once per argument tuple and return per-call latencies in ms"""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples), 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(col)), *(len(str(row.get(col, ''))) for row in rows)) for col in columns]
+    print('  '.join(str(col).ljust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row.get(col, '')).ljust(width) for col, width in zip(columns, widths)))
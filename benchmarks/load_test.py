@@ -0,0 +1,302 @@
+"""Load test of the whole storefront flow with concurrent simulated shoppers.
+
+    python -m benchmarks.load_test --products 100000 --orders 1000000 \\
+        --workers 8 --sessions 50 --output load.json
+    python -m benchmarks.load_test --database load.sqlite3 --baseline load.json
+
+Seeds the catalog, customers and order history in bulk (only what is
+missing when --database points at an existing file). Then each worker
+thread runs shopper sessions through the test client:
+
+    home -> browse -> browse category -> browse facets -> deep page ->
+    search -> product detail -> add to cart (x2) -> cart -> checkout ->
+    place order -> my orders
+
+Every --admin-every'th session also opens the admin dashboard, reports,
+order list and a CSV export. Throughput, latency percentiles, query counts
+and response statuses are reported per step and written as JSON. A view
+whose template is missing answers 500 after running its queries, which
+shows up as errors on that step. With
+--baseline, p95 latency and mean query counts are compared against an
+earlier run, and the script exits with status 1 on a regression.
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.common import (
+    ROOT, WORDS, add_common_arguments, percentile, print_table, seed_catalog, seed_orders,
+    setup_django,
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed(options):
+    """Bring the database up to the requested size; returns seconds spent"""
+    from store import aggregates, facets, search
+    from store.models import Customer, Order, Product
+
+    start = time.perf_counter()
+    rng = random.Random(options.seed)
+    products = Product.objects.count()
+    if products < options.products:
+        seed_catalog(options.products - products, rng=rng)
+        search.rebuild_index()
+        facets.rebuild()
+    orders = Order.objects.count()
+    if orders < options.orders or Customer.objects.count() < options.customers:
+        seed_orders(max(options.orders - orders, 0), customers=options.customers, rng=rng)
+        aggregates.rebuild()
+    return time.perf_counter() - start
+
+
+def read_stream(response):
+    for _ in response.streaming_content:
+        pass
+    return response
+
+
+def build_steps(options):
+    """Return (shopper_steps, admin_steps): lists of (name, callable(client, ctx))"""
+    from django.urls import reverse
+    from store.models import Category, Product
+    from store.pagination import encode_cursor
+
+    category_ids = list(Category.objects.values_list('id', flat=True))
+    max_product_id = Product.objects.order_by('-id').values_list('id', flat=True).first() or 1
+
+    def random_product(ctx):
+        return ctx['rng'].randint(1, max_product_id)
+
+    shopper = [
+        ('home', lambda c, ctx: c.get(reverse('home'))),
+        ('browse', lambda c, ctx: c.get(reverse('product_list'))),
+        ('browse category', lambda c, ctx: c.get(
+            reverse('product_list'), {'category': ctx['rng'].choice(category_ids)})),
+        ('browse facets', lambda c, ctx: c.get(reverse('product_list'), {
+            'category': ctx['rng'].sample(category_ids, min(2, len(category_ids))),
+            'price': [ctx['rng'].randint(0, 5)], 'carat': [ctx['rng'].randint(0, 4)]})),
+        ('deep page', lambda c, ctx: c.get(
+            reverse('product_list'), {'cursor': encode_cursor([random_product(ctx)])})),
+        ('search', lambda c, ctx: c.get(
+            reverse('product_list'), {'search': ctx['rng'].choice(WORDS)[:ctx['rng'].randint(3, 8)]})),
+        ('product detail', lambda c, ctx: c.get(reverse('product_detail', args=[random_product(ctx)]))),
+        ('add to cart', lambda c, ctx: c.get(reverse('add_to_cart', args=[random_product(ctx)]))),
+        ('add to cart', lambda c, ctx: c.get(reverse('add_to_cart', args=[random_product(ctx)]))),
+        ('cart', lambda c, ctx: c.get(reverse('cart'))),
+        ('checkout', lambda c, ctx: c.get(reverse('checkout'))),
+        ('place order', lambda c, ctx: c.post(
+            reverse('checkout'), {'payment_type': 'COD', 'address': 'Surat'})),
+        ('my orders', lambda c, ctx: c.get(reverse('my_orders'))),
+    ]
+    admin = [
+        ('admin dashboard', lambda c, ctx: c.get(reverse('admin_dashboard'))),
+        ('admin reports', lambda c, ctx: c.get(reverse('reports'))),
+        ('admin orders', lambda c, ctx: c.get(reverse('manage_orders'))),
+        ('admin export day', lambda c, ctx: read_stream(
+            c.get(reverse('export_report', args=['day'])))),
+    ]
+    return shopper, admin
+
+
+def run(options, shopper_steps, admin_steps):
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from store.models import Admin
+
+    customer_users = list(
+        User.objects.filter(customer__isnull=False).order_by('id')
+        .values_list('id', flat=True)[:options.customers]
+    )
+    admin_user, created = User.objects.get_or_create(username='load-admin')
+    if created:
+        Admin.objects.create(user=admin_user, email='admin@example.com', number='9999999999',
+                             address='Surat')
+    users = {user.pk: user for user in User.objects.filter(pk__in=customer_users)}
+
+    samples = defaultdict(list)   # step -> [(ms, queries)]
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+
+    def call(step, func, client, ctx):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = func(client, ctx)
+        elapsed = (time.perf_counter() - start) * 1000
+        status = getattr(response, 'status_code', 200)
+        with lock:
+            samples[step].append((elapsed, counter.count))
+            statuses[step][str(status)] += 1
+
+    def session(index):
+        ctx = {'rng': random.Random(options.seed * 100003 + index)}
+        try:
+            # Views whose template is missing answer 500; keep going.
+            client = Client(raise_request_exception=False)
+            client.force_login(users[customer_users[index % len(customer_users)]])
+            for step, func in shopper_steps:
+                call(step, func, client, ctx)
+            if options.admin_every and index % options.admin_every == 0:
+                admin = Client(raise_request_exception=False)
+                admin.force_login(admin_user)
+                for step, func in admin_steps:
+                    call(step, func, admin, ctx)
+        finally:
+            connection.close()
+
+    total_sessions = options.workers * options.sessions
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.workers) as pool:
+        list(pool.map(session, range(total_sessions)))
+    elapsed = time.perf_counter() - start
+    return samples, statuses, elapsed
+
+
+def step_summary(samples, statuses, elapsed):
+    steps = {}
+    for step, rows in samples.items():
+        latencies = sorted(ms for ms, _ in rows)
+        queries = [count for _, count in rows]
+        errors = sum(n for status, n in statuses[step].items() if status.startswith('5'))
+        steps[step] = {
+            'requests': len(rows),
+            'per_s': round(len(rows) / elapsed, 1),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries_mean': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+            'errors': errors,
+            'statuses': dict(statuses[step]),
+        }
+    return steps
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(steps, baseline, tolerance):
+    """Print deltas against a previous result; returns the regressed step names"""
+    rows, regressed = [], []
+    for step, current in steps.items():
+        before = baseline['steps'].get(step)
+        if before is None:
+            continue
+        p95_change = (current['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        query_change = current['queries_mean'] - before['queries_mean']
+        bad = p95_change > tolerance or query_change > 0.5
+        if bad:
+            regressed.append(step)
+        rows.append({
+            'step': step, 'p95_before': before['p95_ms'], 'p95_now': current['p95_ms'],
+            'p95_change_%': round(p95_change, 1), 'queries_before': before['queries_mean'],
+            'queries_now': current['queries_mean'], 'regressed': 'YES' if bad else '',
+        })
+    print()
+    print_table(rows, ['step', 'p95_before', 'p95_now', 'p95_change_%', 'queries_before',
+                       'queries_now', 'regressed'])
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent shopper threads')
+    parser.add_argument('--sessions', type=int, default=20, help='Shopper sessions per worker')
+    parser.add_argument('--admin-every', type=int, default=5,
+                        help='Run the admin steps in every Nth session (0 to skip them)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=25.0,
+                        help='Allowed p95 increase over the baseline, in percent')
+    options = parser.parse_args()
+
+    setup_django(options.database)
+
+    import django
+    from django.conf import settings
+    from django.db import connection
+
+    # Measure production behaviour, not the debug error pages. The error
+    # report logged for a 500 would also evaluate every queryset in the
+    # traceback's locals, so keep it out of the timings.
+    settings.DEBUG = False
+    logging.getLogger('django.request').disabled = True
+    seed_seconds = seed(options)
+    shopper_steps, admin_steps = build_steps(options)
+    samples, statuses, elapsed = run(options, shopper_steps, admin_steps)
+    steps = step_summary(samples, statuses, elapsed)
+
+    total_requests = sum(step['requests'] for step in steps.values())
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'products': options.products, 'orders': options.orders,
+            'customers': options.customers, 'workers': options.workers,
+            'sessions': options.workers * options.sessions, 'seed_seconds': round(seed_seconds, 1),
+        },
+        'totals': {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total_requests,
+            'requests_per_s': round(total_requests / elapsed, 1),
+            'sessions_per_s': round(options.workers * options.sessions / elapsed, 2),
+            'errors': sum(step['errors'] for step in steps.values()),
+        },
+        'steps': steps,
+    }
+
+    print_table([{'step': name, **values} for name, values in steps.items()],
+                ['step', 'requests', 'per_s', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+                 'queries_mean', 'queries_max', 'errors'])
+    print()
+    print(' '.join(f'{key}={value}' for key, value in result['totals'].items()))
+
+    if options.output:
+        with open(options.output, 'w') as handle:
+            json.dump(result, handle, indent=2)
+        print(f'Wrote {options.output}')
+
+    if options.baseline:
+        with open(options.baseline) as handle:
+            regressed = compare(steps, json.load(handle), options.tolerance)
+        if regressed:
+            print(f'FAIL: regressions in {", ".join(regressed)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
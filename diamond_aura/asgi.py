@@ -1,5 +1,17 @@
+"""ASGI entry point.
+
+Serves the async catalog views (ASYNC_CATALOG_VIEWS defaults to on here).
+Run it under an ASGI server with one worker process per core, e.g.
+
+    gunicorn diamond_aura.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+
+Sync views and the built-in middleware still work; Django runs them in a
+thread per request. Compare with the WSGI path using
+benchmarks/bench_asgi.py.
+"""
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'diamond_aura.settings')
-application = get_asgi_application()
\ No newline at end of file
+os.environ.setdefault('ASYNC_CATALOG_VIEWS', 'True')
+application = get_asgi_application()
@@ -0,0 +1,31 @@
+"""SQLite backend tuned for several concurrent writers.
+
+Used for every SQLite database in settings.py; each tweak can be switched
+off there for comparison (see benchmarks/bench_db_profiles.py).
+
+- WAL journal: readers no longer block on the writer, nor it on them.
+- synchronous=NORMAL: no fsync on every commit. In WAL mode a power loss
+  can drop the last commits but cannot corrupt the file.
+- BEGIN IMMEDIATE: an atomic block takes the write lock when it starts.
+  With the default deferred BEGIN, a transaction that reads and then
+  writes (place_order, for one) has to upgrade its lock midway, and SQLite
+  fails that upgrade with "database is locked" at once instead of waiting
+  out the busy timeout.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if settings.SQLITE_WAL:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if settings.SQLITE_IMMEDIATE_TRANSACTIONS:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
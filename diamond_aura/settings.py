@@ -1,13 +1,14 @@
 from pathlib import Path
 import os
+from decouple import Csv, config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-your-secret-key-change-in-production'
 
-DEBUG = True
+DEBUG = config('DEBUG', default=True, cast=bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=Csv())
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -23,6 +24,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Answers /static/ requests before anything else (metrics included) runs.
+    'store.middleware.StaticFilesMiddleware',
+    'store.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -31,6 +35,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request timing and SQL counts, shown at /admin-panel/metrics/.
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=False, cast=bool)
+REQUEST_METRICS_WINDOW = config('REQUEST_METRICS_WINDOW', default=1000, cast=int)
+
 ROOT_URLCONF = 'diamond_aura.urls'
 
 TEMPLATES = [
@@ -52,12 +60,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'diamond_aura.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Serve the catalog read views from store/async_views.py; asgi.py defaults it on.
+ASYNC_CATALOG_VIEWS = config('ASYNC_CATALOG_VIEWS', default=False, cast=bool)
+
+# Database: 'sqlite' for development, 'postgres' for production.
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+if DB_ENGINE == 'postgres':
+    # Needs a driver that is not in requirements.txt: pip install psycopg2-binary.
+    # Django 4.2 has no built-in pool: run PgBouncer in front of PostgreSQL
+    # (point DB_PORT at it) and set DB_PGBOUNCER=True for transaction pooling.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='diamond_aura'),
+            'USER': config('DB_USER', default='diamond_aura'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='127.0.0.1'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Keep each worker's connection open between requests.
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            # Server-side cursors do not survive transaction-mode pooling.
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': {'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int)},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'diamond_aura.db.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            # Seconds a writer waits for the lock before "database is locked".
+            'OPTIONS': {'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int)},
+            # A file rather than the in-memory default, so threaded tests wait
+            # on the lock like workers do instead of failing "table is locked".
+            'TEST': {'NAME': config('SQLITE_TEST_PATH', default=str(BASE_DIR / 'test_db.sqlite3'))},
+        }
     }
-}
+
+# Concurrency tuning applied by diamond_aura/db/sqlite3/base.py.
+SQLITE_WAL = config('SQLITE_WAL', default=True, cast=bool)
+SQLITE_IMMEDIATE_TRANSACTIONS = config('SQLITE_IMMEDIATE_TRANSACTIONS', default=True, cast=bool)
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -75,11 +118,68 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed copies plus .gz (and .br, with
+# pip install brotli) variants; {% static %} links the hashed names when
+# DEBUG is off, so run collectstatic before starting a production server.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'store.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+# Serve STATIC_ROOT from the app (store.middleware.StaticFilesMiddleware);
+# turn off when nginx or a CDN serves /static/.
+SERVE_STATIC = config('SERVE_STATIC', default=not DEBUG, cast=bool)
+# Cache lifetime of static files without a content hash in their name.
+STATIC_MAX_AGE = config('STATIC_MAX_AGE', default=60, cast=int)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache backend: 'file' (shared by the processes on one host), 'redis'
+# (shared across hosts) or 'locmem' (private to each process; only for a
+# single-process server, since writes made by manage.py commands, the job
+# worker or other workers never reach it).
+CACHE_BACKEND = config('CACHE_BACKEND', default='file')
+SHARED_CACHE = CACHE_BACKEND != 'locmem'
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'diamond-aura-{alias}'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache' / '{alias}')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', config('REDIS_URL', default='redis://127.0.0.1:6379/1')),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[CACHE_BACKEND]
+CACHES = {
+    alias: {
+        'BACKEND': _cache_backend,
+        'LOCATION': _cache_location.format(alias=alias),
+        'KEY_PREFIX': alias,
+        'OPTIONS': {} if CACHE_BACKEND == 'redis' else {'MAX_ENTRIES': 5000},
+    }
+    for alias in ('default', 'catalog', 'sessions')
+}
+# Catalog fragments live under versioned keys (store/catalog_cache.py), so
+# they are replaced on change rather than expired. A locmem cache misses the
+# version bumps of other processes, so there they expire instead.
+CACHES['catalog']['TIMEOUT'] = None if SHARED_CACHE else config('CATALOG_LOCAL_TIMEOUT', default=60, cast=int)
+
+# With a shared cache, sessions are read from the cache and written through
+# to django_session, so most requests cost no session query and a cache miss
+# falls back to the database. A per-process cache would keep serving a
+# session that another worker flushed (logout, password change), so locmem
+# keeps sessions in the database only.
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db'
+                        if SHARED_CACHE else 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = 'sessions'
+# Flash messages ride in a signed cookie and never touch the session.
+MESSAGE_STORAGE = config('MESSAGE_STORAGE', default='django.contrib.messages.storage.cookie.CookieStorage')
+
+# Delivered and Rejected orders older than this many days move to the
+# archive tables when manage.py archive_orders runs (e.g. nightly from cron).
+ORDER_ARCHIVE_DAYS = config('ORDER_ARCHIVE_DAYS', default=180, cast=int)
+
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='info@diamondaura.com')
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = 'bootstrap4'
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
@@ -8,12 +8,13 @@ def main():
     base_dir = Path(__file__).resolve().parent
     project_dir = base_dir / "DIAMONDAURAWEB()" / "DIAMONDAURAWEB()" / "DIAMONDAURAWEB"
 
-    if not project_dir.exists():
-        raise FileNotFoundError(f"Django project folder not found: {project_dir}")
-
-    os.chdir(project_dir)
-    sys.path.insert(0, str(project_dir))
-    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+    if project_dir.exists():
+        os.chdir(project_dir)
+        sys.path.insert(0, str(project_dir))
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+    else:
+        # This checkout keeps the project at the top level.
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "diamond_aura.settings")
 
     from django.core.management import execute_from_command_line
     execute_from_command_line(sys.argv)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Admin, Customer, Category, Product, ProductImage, Cart, Order, Payment, Feedback, Complaint
+from .models import Admin, Customer, Category, Product, ProductImage, Cart, Order, OrderItem, Payment, ArchivedOrder, ArchivedOrderItem, ArchivedPayment, Feedback, Complaint
 
 @admin.register(Admin)
 class AdminModelAdmin(admin.ModelAdmin):
@@ -29,17 +29,48 @@ class ProductAdmin(admin.ModelAdmin):
 class CartAdmin(admin.ModelAdmin):
     list_display = ['customer', 'product', 'quantity', 'get_total']
 
+class ReadOnlyLinesInline(admin.TabularInline):
+    """Order lines as placed; Order.total and the sales aggregates are kept in step with them"""
+    fields = ['product', 'price', 'quantity']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class OrderItemInline(ReadOnlyLinesInline):
+    model = OrderItem
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'customer', 'product', 'quantity', 'price', 'status', 'date']
+    list_display = ['id', 'customer', 'total', 'status', 'date']
     list_filter = ['status', 'date']
     search_fields = ['customer__name']
+    readonly_fields = ['total']
+    inlines = [OrderItemInline]
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['order', 'payment_type', 'payment_date']
     list_filter = ['payment_type']
 
+class ArchivedOrderItemInline(ReadOnlyLinesInline):
+    model = ArchivedOrderItem
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'customer', 'total', 'status', 'date', 'archived_at']
+    list_filter = ['status', 'date']
+    search_fields = ['customer__name']
+    readonly_fields = ['total']
+    inlines = [ArchivedOrderItemInline]
+
+@admin.register(ArchivedPayment)
+class ArchivedPaymentAdmin(admin.ModelAdmin):
+    list_display = ['order', 'payment_type', 'payment_date']
+    list_filter = ['payment_type']
+
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
     list_display = ['customer', 'description', 'date']
@@ -1,39 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Count, Sum
-from .models import Product, Category, Order, Customer, Feedback, Complaint, ProductImage, Admin
-from .forms import ProductForm, CategoryForm, ProductImageForm
-
-def is_admin(user):
-    """Check if user is admin"""
-    try:
-        return Admin.objects.filter(user=user).exists()
-    except:
-        return False
-
-@login_required
-@user_passes_test(is_admin)
+from django.conf import settings
+from .models import Product, Category, Order, ArchivedOrder, Customer, Feedback, Complaint, ProductImage
+from .forms import ProductForm, CategoryForm, ProductImageForm, ExportFilterForm
+from .decorators import admin_required
+from .pagination import KeysetPaginator, MergedKeysetPaginator, paginate
+from . import aggregates, archive, catalog_cache, exports, facets, jobs, metrics, services
+
+@admin_required
 def admin_dashboard(request):
     """Admin dashboard with statistics"""
-    total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='Pending').count()
-    total_customers = Customer.objects.count()
-    total_revenue = Order.objects.filter(status='Delivered').aggregate(
-        total=Sum('price')
-    )['total'] or 0
+    # Counted from maintained rows and caches; nothing here scans a table.
+    total_products = facets.product_total()
+    total_customers = services.get_customer_count()
+    totals = aggregates.dashboard_totals()
     
-    recent_orders = Order.objects.all()[:5]
+    recent_orders = Order.objects.select_related('customer')[:5]
     recent_feedbacks = Feedback.objects.all()[:5]
     recent_complaints = Complaint.objects.all()[:5]
     
     context = {
         'total_products': total_products,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
+        'total_orders': totals['total_orders'],
+        'pending_orders': totals['pending_orders'],
         'total_customers': total_customers,
-        'total_revenue': total_revenue,
+        'total_revenue': totals['total_revenue'],
         'recent_orders': recent_orders,
         'recent_feedbacks': recent_feedbacks,
         'recent_complaints': recent_complaints,
@@ -42,15 +33,13 @@ def admin_dashboard(request):
 
 # ============= CATEGORY MANAGEMENT =============
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def manage_categories(request):
     """List all categories"""
     categories = Category.objects.all()
     return render(request, 'admin_panel/categories.html', {'categories': categories})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def add_category(request):
     """Add new category"""
     if request.method == 'POST':
@@ -63,8 +52,7 @@ def add_category(request):
         form = CategoryForm()
     return render(request, 'admin_panel/add_category.html', {'form': form})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def edit_category(request, pk):
     """Edit category"""
     category = get_object_or_404(Category, pk=pk)
@@ -78,8 +66,7 @@ def edit_category(request, pk):
         form = CategoryForm(instance=category)
     return render(request, 'admin_panel/edit_category.html', {'form': form, 'category': category})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def delete_category(request, pk):
     """Delete category"""
     category = get_object_or_404(Category, pk=pk)
@@ -91,15 +78,13 @@ def delete_category(request, pk):
 
 # ============= PRODUCT MANAGEMENT =============
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def manage_products(request):
     """List all products"""
     products = Product.objects.all().select_related('category')
     return render(request, 'admin_panel/products.html', {'products': products})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def add_product(request):
     """Add new product"""
     if request.method == 'POST':
@@ -109,9 +94,10 @@ def add_product(request):
         if form.is_valid():
             product = form.save()
             
-            # Save product images
+            # Save product images; resized derivatives are made in the background
             for image in images:
-                ProductImage.objects.create(product=product, image_path=image)
+                product_image = ProductImage.objects.create(product=product, image_path=image)
+                jobs.enqueue('generate_image_derivatives', image_id=product_image.pk)
             
             messages.success(request, 'Product added successfully!')
             return redirect('manage_products')
@@ -119,8 +105,7 @@ def add_product(request):
         form = ProductForm()
     return render(request, 'admin_panel/add_product.html', {'form': form})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def edit_product(request, pk):
     """Edit product"""
     product = get_object_or_404(Product, pk=pk)
@@ -133,7 +118,8 @@ def edit_product(request, pk):
             
             # Add new images
             for image in images:
-                ProductImage.objects.create(product=product, image_path=image)
+                product_image = ProductImage.objects.create(product=product, image_path=image)
+                jobs.enqueue('generate_image_derivatives', image_id=product_image.pk)
             
             messages.success(request, 'Product updated successfully!')
             return redirect('manage_products')
@@ -145,8 +131,7 @@ def edit_product(request, pk):
         'product': product
     })
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def delete_product(request, pk):
     """Delete product"""
     product = get_object_or_404(Product, pk=pk)
@@ -156,8 +141,7 @@ def delete_product(request, pk):
         return redirect('manage_products')
     return render(request, 'admin_panel/delete_product.html', {'product': product})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def delete_product_image(request, pk):
     """Delete product image"""
     image = get_object_or_404(ProductImage, pk=pk)
@@ -168,29 +152,39 @@ def delete_product_image(request, pk):
 
 # ============= ORDER MANAGEMENT =============
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def manage_orders(request):
-    """List all orders"""
-    orders = Order.objects.all().select_related('customer', 'product')
+    """List all orders; ?history=1 adds the archived ones"""
+    orders = Order.objects.all().select_related('customer').with_items()
+    archived = ArchivedOrder.objects.all().select_related('customer').with_items()
     
     # Filter by status
     status = request.GET.get('status')
     if status:
         orders = orders.filter(status=status)
+        archived = archived.filter(status=status)
     
-    return render(request, 'admin_panel/orders.html', {'orders': orders})
+    history = archive.wants_history(request)
+    if history:
+        paginator = MergedKeysetPaginator([orders, archived], ordering=('-date', '-id'))
+    else:
+        paginator = KeysetPaginator(orders, ordering=('-date', '-id'))
+    page = paginate(request, paginator)
+    return render(request, 'admin_panel/orders.html', {
+        'orders': page.object_list, 'page': page, 'history': history,
+    })
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def update_order_status(request, pk):
     """Update order status"""
     order = get_object_or_404(Order, pk=pk)
     
     if request.method == 'POST':
         new_status = request.POST.get('status')
-        order.status = new_status
-        order.save()
+        if new_status not in dict(Order.STATUS_CHOICES):
+            messages.error(request, 'Please choose a valid status.')
+            return redirect('update_order_status', pk=order.pk)
+        services.update_order_status(order, new_status)
         messages.success(request, f'Order #{order.id} status updated to {new_status}!')
         return redirect('manage_orders')
     
@@ -198,53 +192,99 @@ def update_order_status(request, pk):
 
 # ============= USER MANAGEMENT =============
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def manage_users(request):
     """List all customers"""
     customers = Customer.objects.all().select_related('user')
-    return render(request, 'admin_panel/users.html', {'customers': customers})
+    page = paginate(request, KeysetPaginator(customers, ordering=('id',)))
+    return render(request, 'admin_panel/users.html', {'customers': page.object_list, 'page': page})
 
 # ============= FEEDBACK & COMPLAINTS =============
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def manage_feedback(request):
     """View all feedback"""
     feedbacks = Feedback.objects.all().select_related('customer')
-    return render(request, 'admin_panel/feedback.html', {'feedbacks': feedbacks})
+    page = paginate(request, KeysetPaginator(feedbacks, ordering=('-date', '-id')))
+    return render(request, 'admin_panel/feedback.html', {'feedbacks': page.object_list, 'page': page})
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def manage_complaints(request):
     """View all complaints"""
     complaints = Complaint.objects.all().select_related('customer', 'product')
-    return render(request, 'admin_panel/complaints.html', {'complaints': complaints})
+    page = paginate(request, KeysetPaginator(complaints, ordering=('-date', '-id')))
+    return render(request, 'admin_panel/complaints.html', {'complaints': page.object_list, 'page': page})
 
 # ============= REPORTS =============
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def reports(request):
     """Generate reports"""
-    # Sales by category
-    category_sales = Order.objects.filter(status='Delivered').values(
-        'product__category__name'
-    ).annotate(
-        total_sales=Sum('price'),
-        total_orders=Count('id')
-    )
-    
-    # Monthly revenue
-    from django.db.models.functions import TruncMonth
-    monthly_revenue = Order.objects.filter(status='Delivered').annotate(
-        month=TruncMonth('date')
-    ).values('month').annotate(
-        revenue=Sum('price')
-    ).order_by('month')
+    category_sales = aggregates.category_sales()
+    monthly_revenue = aggregates.monthly_revenue()
     
     context = {
         'category_sales': category_sales,
         'monthly_revenue': monthly_revenue,
     }
-    return render(request, 'admin_panel/reports.html', context)
\ No newline at end of file
+    return render(request, 'admin_panel/reports.html', context)
+
+def _export_filename(prefix, filters):
+    parts = [prefix]
+    if filters['status']:
+        parts.append(filters['status'].lower())
+    if filters['date_from'] or filters['date_to']:
+        parts.append(f"{filters['date_from'] or 'start'}_{filters['date_to'] or 'now'}")
+    return '-'.join(str(part) for part in parts) + '.csv'
+
+@admin_required
+def export_orders(request):
+    """Stream orders as CSV, filtered by ?date_from, ?date_to and ?status; ?history=1 adds archived ones"""
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Invalid export filters.')
+        return redirect('manage_orders')
+    filters = form.cleaned_data
+    start, end = exports.date_bounds(filters['date_from'], filters['date_to'])
+    rows = exports.order_rows(start, end, filters['status'], filters['history'])
+    return exports.csv_response(_export_filename('orders', filters), exports.ORDER_HEADER, rows)
+
+@admin_required
+def export_payments(request):
+    """Stream payments as CSV, filtered by payment date and order status"""
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Invalid export filters.')
+        return redirect('manage_orders')
+    filters = form.cleaned_data
+    start, end = exports.date_bounds(filters['date_from'], filters['date_to'])
+    rows = exports.payment_rows(start, end, filters['status'], filters['history'])
+    return exports.csv_response(_export_filename('payments', filters), exports.PAYMENT_HEADER, rows)
+
+@admin_required
+def export_report(request, report):
+    """Stream one kind of sales aggregate (status, day, month or category) as CSV"""
+    form = ExportFilterForm(request.GET)
+    if report not in exports.REPORTS or not form.is_valid():
+        messages.error(request, 'Invalid export filters.')
+        return redirect('reports')
+    filters = form.cleaned_data
+    rows = exports.report_rows(report, filters['date_from'], filters['date_to'])
+    return exports.csv_response(_export_filename(f'sales-by-{report}', filters),
+                                exports.REPORT_HEADER, rows)
+
+@admin_required
+def request_metrics(request):
+    """Per-URL latency and SQL statistics for this process"""
+    if request.method == 'POST':
+        metrics.reset()
+        catalog_cache.reset_stats()
+        messages.success(request, 'Request metrics cleared.')
+        return redirect('request_metrics')
+    
+    return render(request, 'admin_panel/metrics.html', {
+        'metrics_enabled': settings.REQUEST_METRICS_ENABLED,
+        'rows': metrics.summary(),
+        'cache_stats': catalog_cache.stats(),
+        'job_stats': jobs.queue_stats(),
+    })
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""Incrementally maintained sales totals for the admin dashboard and reports.
+
+Placing an order calls into this module inside the same transaction, and
+the Order and ArchivedOrder save and delete signals (store.signals) cover
+status changes and deletes from anywhere, the Django admin included, so the
+SalesAggregate rows always agree with the Order and OrderItem tables. Status, day and month rows count
+orders; category rows count the order lines sold in that category.
+Archiving an order (store.archive) leaves the totals alone, so they cover
+the archived orders too, and ``rebuild()`` recomputes them from scratch
+over both tables.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Category, Order, OrderItem, SalesAggregate
+
+REVENUE_STATUS = 'Delivered'
+# (order model, line model) of the hot and archived tables.
+TIERS = ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem))
+
+
+def _order_buckets(order, status):
+    """(kind, key) rows an order contributes to in status"""
+    buckets = [('status', status)]
+    if status == REVENUE_STATUS:
+        order_date = timezone.localdate(order.date)
+        buckets += [('day', order_date.isoformat()), ('month', order_date.strftime('%Y-%m'))]
+    return buckets
+
+
+def _add(deltas, bucket, count, quantity, revenue):
+    old_count, old_quantity, old_revenue = deltas[bucket]
+    deltas[bucket] = (old_count + count, old_quantity + quantity, old_revenue + revenue)
+
+
+def _collect(deltas, order, items, sign, status=None, header=True):
+    """Add an order's header and lines to deltas with sign, as if in status.
+
+    The header counts once in the status, day and month rows; every line adds
+    its quantity and total there, and counts as one sale in its category.
+    """
+    status = order.status if status is None else status
+    buckets = _order_buckets(order, status)
+    if header:
+        for bucket in buckets:
+            _add(deltas, bucket, sign, 0, 0.0)
+    for item in items:
+        quantity, revenue = sign * item.quantity, sign * item.get_total()
+        for bucket in buckets:
+            _add(deltas, bucket, 0, quantity, revenue)
+        if status == REVENUE_STATUS:
+            _add(deltas, ('category', str(item.product.category_id)), sign, quantity, revenue)
+
+
+def _apply(deltas):
+    for (kind, key), (count, quantity, revenue) in deltas.items():
+        rows = SalesAggregate.objects.filter(kind=kind, key=key)
+        changes = {
+            'order_count': F('order_count') + count,
+            'quantity': F('quantity') + quantity,
+            'revenue': F('revenue') + revenue,
+        }
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                SalesAggregate.objects.create(kind=kind, key=key, order_count=count,
+                                              quantity=quantity, revenue=revenue)
+        except IntegrityError:
+            rows.update(**changes)
+
+
+def _deltas():
+    return defaultdict(lambda: (0, 0, 0.0))
+
+
+def record_order(order, items):
+    """Add a newly placed order and its lines to the totals"""
+    deltas = _deltas()
+    _collect(deltas, order, items, 1)
+    _apply(deltas)
+
+
+def record_status_change(order, old_status):
+    """Move an order's contribution, lines included, from old_status to its current status"""
+    if old_status == order.status:
+        return
+    items = list(order.items.select_related('product'))
+    deltas = _deltas()
+    _collect(deltas, order, items, -1, status=old_status)
+    _collect(deltas, order, items, 1)
+    _apply(deltas)
+
+
+def record_deleted_order(order):
+    """Remove an order about to be deleted, lines included"""
+    deltas = _deltas()
+    _collect(deltas, order, list(order.items.select_related('product')), -1)
+    _apply(deltas)
+
+
+def record_deleted_item(order, item):
+    """Remove one line of an order that stays in place"""
+    deltas = _deltas()
+    _collect(deltas, order, [item], -1, header=False)
+    _apply(deltas)
+
+
+def record_deleted_customer(customer):
+    """Remove every order of a customer about to be deleted, hot and archived, in one pass"""
+    deltas = _deltas()
+    for order_model, item_model in TIERS:
+        lines = defaultdict(list)
+        for item in item_model.objects.filter(order__customer=customer).select_related('product'):
+            lines[item.order_id].append(item)
+        for order in order_model.objects.filter(customer=customer):
+            _collect(deltas, order, lines[order.pk], -1)
+    _apply(deltas)
+
+
+def record_deleted_product(product):
+    """Remove the lines of a product about to be deleted from the totals and from their orders' totals"""
+    deltas = _deltas()
+    for order_model, item_model in TIERS:
+        items = list(item_model.objects.filter(product=product).select_related('order', 'product'))
+        if not items:
+            continue
+        for item in items:
+            _collect(deltas, item.order, [item], -1, header=False)
+        removed = item_model.objects.filter(order=OuterRef('pk'), product=product).order_by().values(
+            'order').annotate(sum=Sum(F('price') * F('quantity'))).values('sum')
+        order_model.objects.filter(pk__in={item.order_id for item in items}).update(
+            total=F('total') - Subquery(removed))
+    _apply(deltas)
+
+
+def dashboard_totals():
+    """Order count, pending count and delivered revenue from the status rows"""
+    rows = {row.key: row for row in SalesAggregate.objects.filter(kind='status')}
+    delivered = rows.get(REVENUE_STATUS)
+    return {
+        'total_orders': sum(row.order_count for row in rows.values()),
+        'pending_orders': rows['Pending'].order_count if 'Pending' in rows else 0,
+        'total_revenue': delivered.revenue if delivered else 0,
+    }
+
+
+def category_sales():
+    rows = list(SalesAggregate.objects.filter(kind='category', order_count__gt=0))
+    names = Category.objects.in_bulk([int(row.key) for row in rows])
+    return [
+        {
+            'product__category__name': names[int(row.key)].name if int(row.key) in names else '',
+            'total_sales': row.revenue,
+            'total_orders': row.order_count,
+        }
+        for row in rows
+    ]
+
+
+def monthly_revenue():
+    rows = SalesAggregate.objects.filter(kind='month', order_count__gt=0).order_by('key')
+    return [
+        {'month': date(int(row.key[:4]), int(row.key[5:7]), 1), 'revenue': row.revenue}
+        for row in rows
+    ]
+
+
+def _periods(day):
+    return [('day', day.strftime('%Y-%m-%d')), ('month', day.strftime('%Y-%m'))]
+
+
+def _line_sum(item_model, expression):
+    """Per-order sum over the order's lines, read through the order_id index"""
+    return Subquery(item_model.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        sum=Sum(expression)).values('sum'))
+
+
+def _totals(order_model, item_model):
+    """(kind, key, orders, quantity, revenue) rows over one tier of orders and lines"""
+    line_total = F('price') * F('quantity')
+    lines = item_model.objects.order_by()
+    for row in order_model.objects.order_by().values('status').annotate(n=Count('id')):
+        yield 'status', row['status'], row['n'], 0, 0.0
+    for row in lines.values('order__status').annotate(qty=Sum('quantity'), total=Sum(line_total)):
+        yield 'status', row['order__status'], 0, row['qty'], row['total']
+    # Truncating dates is a Python function call per row on SQLite, so it
+    # runs once per order rather than per line, and days also feed months.
+    delivered = order_model.objects.filter(status=REVENUE_STATUS).order_by().annotate(
+        day=TruncDay('date'), line_quantity=_line_sum(item_model, 'quantity'),
+        line_revenue=_line_sum(item_model, line_total))
+    for row in delivered.values('day').annotate(
+            n=Count('id'), qty=Sum('line_quantity'), revenue=Sum('line_revenue')):
+        for kind, key in _periods(row['day']):
+            yield kind, key, row['n'], row['qty'] or 0, row['revenue'] or 0.0
+    for row in lines.filter(order__status=REVENUE_STATUS).values('product__category_id').annotate(
+            n=Count('id'), qty=Sum('quantity'), total=Sum(line_total)):
+        yield 'category', str(row['product__category_id']), row['n'], row['qty'], row['total']
+
+
+def rebuild():
+    """Recompute every aggregate row from the hot and archived orders; returns the row count"""
+    totals = defaultdict(lambda: (0, 0, 0.0))
+    for order_model, item_model in TIERS:
+        for kind, key, count, quantity, revenue in _totals(order_model, item_model):
+            old_count, old_quantity, old_revenue = totals[kind, key]
+            totals[kind, key] = (old_count + count, old_quantity + quantity, old_revenue + revenue)
+    rows = [SalesAggregate(kind=kind, key=key, order_count=count, quantity=quantity, revenue=revenue)
+            for (kind, key), (count, quantity, revenue) in totals.items()]
+    with transaction.atomic():
+        SalesAggregate.objects.all().delete()
+        SalesAggregate.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,91 @@
+"""Hot/cold storage for orders.
+
+Delivered and Rejected orders older than settings.ORDER_ARCHIVE_DAYS no
+longer change, so ``archive_orders()`` moves them, with their lines and
+payments, out of the order, order_item and payment tables into
+archived_order, archived_order_item and archived_payment.
+The storefront and admin pages read only the small hot tables. Customers
+and admins see the archived rows too when they ask for history
+(``?history=1``).
+
+Each batch is copied and deleted with INSERT ... SELECT and DELETE in its
+own short transaction. Rows keep their ids, and the deletes send no
+signals, so the sales aggregates still count archived orders; see
+aggregates.rebuild().
+"""
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, ArchivedPayment, Order, OrderItem, Payment
+
+ARCHIVE_STATUSES = ('Delivered', 'Rejected')
+BATCH_SIZE = 2000
+HISTORY_PARAM = 'history'
+
+
+def wants_history(request):
+    return request.GET.get(HISTORY_PARAM) == '1'
+
+
+def newest_first(*querysets):
+    """The orders of several querysets (e.g. hot and archived) in one list, newest first"""
+    rows = [order for queryset in querysets for order in queryset]
+    rows.sort(key=attrgetter('date', 'id'), reverse=True)
+    return rows
+
+
+# ============= ARCHIVING =============
+
+def _move(cursor, source, target, key, ids, extra=None):
+    """Copy the source rows whose key column is in ids into target, then delete them"""
+    quote = connection.ops.quote_name
+    columns = [field.column for field in source._meta.concrete_fields]
+    target_columns = columns + list(extra or {})
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(
+        f'INSERT INTO {quote(target._meta.db_table)} ({", ".join(map(quote, target_columns))}) '
+        f'SELECT {", ".join(map(quote, columns))}{", %s" * len(extra or {})} '
+        f'FROM {quote(source._meta.db_table)} WHERE {quote(key)} IN ({placeholders})',
+        list((extra or {}).values()) + list(ids),
+    )
+    cursor.execute(f'DELETE FROM {quote(source._meta.db_table)} WHERE {quote(key)} IN ({placeholders})',
+                   list(ids))
+    return cursor.rowcount
+
+
+def archive_batch(before, batch_size=BATCH_SIZE):
+    """Move up to batch_size finished orders dated before `before`; returns (orders, payments)"""
+    with transaction.atomic():
+        # Locked, so a status change cannot slip in between the copy and the delete.
+        ids = list(Order.objects.select_for_update().filter(
+            status__in=ARCHIVE_STATUSES, date__lt=before,
+        ).order_by().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0, 0
+        with connection.cursor() as cursor:
+            # Foreign keys are checked at commit, when every table has moved.
+            orders = _move(cursor, Order, ArchivedOrder, 'id', ids,
+                           extra={ArchivedOrder._meta.get_field('archived_at').column: timezone.now()})
+            _move(cursor, OrderItem, ArchivedOrderItem, OrderItem._meta.get_field('order').column, ids)
+            payments = _move(cursor, Payment, ArchivedPayment, Payment._meta.get_field('order').column, ids)
+    return orders, payments
+
+
+def archive_orders(days=None, batch_size=BATCH_SIZE, progress=None):
+    """Archive every finished order older than `days`; returns (orders, payments) moved"""
+    days = settings.ORDER_ARCHIVE_DAYS if days is None else days
+    before = timezone.now() - timedelta(days=days)
+    total_orders = total_payments = 0
+    while True:
+        orders, payments = archive_batch(before, batch_size)
+        if not orders:
+            break
+        total_orders += orders
+        total_payments += payments
+        if progress:
+            progress(total_orders, total_payments)
+    return total_orders, total_payments
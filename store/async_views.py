@@ -0,0 +1,118 @@
+"""Async versions of the catalog read views.
+
+urls.py routes home, product_list and product_detail here instead of to
+views.py when ASYNC_CATALOG_VIEWS is on, which asgi.py turns on by default.
+The templates and the context are the same as the sync views'.
+
+Each view first asks the catalog cache which of its fragments are missing
+and loads data only for those, running the independent queries together
+with asyncio.gather(). Fragments that were cached get the same lazy
+querysets the sync views pass, so a fragment evicted in between still
+renders correctly. With Django 4.2's async ORM every query still runs in
+the request's sync thread, so gather() overlaps the waits of one request
+without running its queries in parallel. The event loop stays free for
+other requests meanwhile.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
+
+from . import catalog_cache, facets, recommendations
+from .conditional import conditional_page, list_stamps, product_stamps
+from .models import Category, Product
+from .views import catalog_facets, catalog_page
+
+CATEGORIES = [catalog_cache.CATEGORIES]
+PRODUCTS = [catalog_cache.PRODUCTS, catalog_cache.CATEGORIES]
+
+_missing = sync_to_async(catalog_cache.missing)
+_render = sync_to_async(render)
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _is_authenticated(request):
+    # request.user loads the session and the user on first access.
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+async def _load(context, loaders):
+    """Await the {context key: coroutine} loaders together and store the results"""
+    if loaders:
+        results = await asyncio.gather(*loaders.values())
+        context.update(zip(loaders, results))
+    return context
+
+
+async def home(request):
+    """Homepage with featured products"""
+    missing = await _missing([
+        ('category_nav', CATEGORIES, []),
+        ('featured_products', PRODUCTS, []),
+    ])
+    context = {
+        'categories': Category.objects.all(),
+        'featured_products': Product.objects.for_listing()[:8],
+    }
+    loaders = {}
+    if 'category_nav' in missing:
+        loaders['categories'] = _list(context['categories'])
+    if 'featured_products' in missing:
+        loaders['featured_products'] = _list(context['featured_products'])
+    await _load(context, loaders)
+    return await _render(request, 'store/home.html', context)
+
+
+@conditional_page(list_stamps)
+async def product_list(request):
+    """Display all products with category, price and carat filters"""
+    selection = facets.parse(request.GET)
+    products = facets.filter_products(Product.objects.for_listing(), selection)
+    categories = Category.objects.all()
+    facet_key = facets.selection_key(selection, request.GET.get('search', ''))
+
+    missing = await _missing([
+        ('product_facets', PRODUCTS, [facet_key]),
+        ('product_cards', PRODUCTS, [request.GET.urlencode()]),
+    ])
+    context = {
+        'page': SimpleLazyObject(lambda: catalog_page(request, products)),
+        'facets': SimpleLazyObject(lambda: catalog_facets(request, selection, categories)),
+        'facet_key': facet_key,
+    }
+    loaders = {}
+    if 'product_facets' in missing:
+        loaders['facets'] = sync_to_async(catalog_facets)(request, selection, categories)
+    if 'product_cards' in missing:
+        loaders['page'] = sync_to_async(catalog_page)(request, products)
+    await _load(context, loaders)
+    return await _render(request, 'store/product_list.html', context)
+
+
+@conditional_page(product_stamps)
+async def product_detail(request, pk):
+    """Product detail page"""
+    try:
+        product, is_authenticated = await asyncio.gather(
+            Product.objects.select_related('category').aget(pk=pk),
+            _is_authenticated(request),
+        )
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+
+    related_products = SimpleLazyObject(lambda: recommendations.related_products(product))
+    context = {'product': product, 'related_products': related_products}
+    missing = await _missing([('product_detail', PRODUCTS, [product.pk, is_authenticated])])
+    if 'product_detail' in missing:
+        # The prefetch fills product.images.all() for the template.
+        context['related_products'], _ = await asyncio.gather(
+            sync_to_async(recommendations.related_products)(product),
+            sync_to_async(prefetch_related_objects)([product], 'images'),
+        )
+    return await _render(request, 'store/product_detail.html', context)
@@ -0,0 +1,141 @@
+"""Versioned fragment cache for the public catalog pages.
+
+Fragments are stored under keys that embed the current version of every
+namespace they depend on ('categories', 'products'). Signal handlers bump a
+namespace whenever a Product, ProductImage or Category row changes, which
+makes every dependent key unreachable at once. Nothing relies on a TTL, and
+stale entries simply age out of the backend. A bump writes a new random
+version rather than incrementing the old one, so it needs no atomic incr:
+FileBasedCache's incr is a read followed by a write, and two bumps racing
+through it could leave a single new version behind. Hit and miss counts are
+kept in process memory, so a cache hit costs no write to the backend.
+
+Bumps only reach processes that share the cache. On a per-process locmem
+cache, settings.py gives the alias a short TIMEOUT instead, so fragments
+and versions expire and other processes' changes show up within it.
+"""
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+CACHE_ALIAS = 'catalog'
+
+CATEGORIES = 'categories'
+PRODUCTS = 'products'
+
+# Fragment names used by the templates, listed for stats().
+FRAGMENTS = ('category_nav', 'featured_products', 'product_facets', 'product_cards',
+             'product_detail')
+
+_lock = threading.Lock()
+_counts = Counter()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def is_shared():
+    """Whether other processes see this cache, and with it the version bumps made here"""
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _fresh_version():
+    # Random, so a version key lost to eviction can never come back with a
+    # value that matches fragments cached before the loss.
+    return uuid.uuid4().hex
+
+
+def get_versions(namespaces):
+    cache = _cache()
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version())
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*namespaces):
+    """Invalidate every fragment that depends on the given namespaces.
+
+    Bumps immediately and again on commit, so a fragment rendered from data
+    read before the commit is not left reachable.
+    """
+    def _bump():
+        _cache().set_many({_version_key(namespace): _fresh_version() for namespace in namespaces})
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def fragment_key(name, versions, vary_on):
+    digest = hashlib.md5(
+        ':'.join(str(part) for part in vary_on).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'fragment:{name}:{".".join(str(v) for v in versions)}:{digest}'
+
+
+def _count(name, outcome):
+    with _lock:
+        _counts[name, outcome] += 1
+
+
+def get_or_render(name, namespaces, vary_on, render):
+    """Return the cached fragment, calling render() to produce it on a miss"""
+    cache = _cache()
+    key = fragment_key(name, get_versions(namespaces), vary_on)
+    content = cache.get(key)
+    if content is not None:
+        _count(name, 'hits')
+        return content
+    _count(name, 'misses')
+    content = render()
+    cache.set(key, content)
+    return content
+
+
+def missing(fragments):
+    """Names of the (name, namespaces, vary_on) fragments not currently cached.
+
+    Lets a view skip loading data for fragments the template will take
+    from the cache. Nothing is counted in the hit/miss stats.
+    """
+    cache = _cache()
+    keys = {
+        fragment_key(name, get_versions(namespaces), vary_on): name
+        for name, namespaces, vary_on in fragments
+    }
+    cached = cache.get_many(list(keys))
+    return {name for key, name in keys.items() if key not in cached}
+
+
+def reset_stats():
+    with _lock:
+        _counts.clear()
+
+
+def stats():
+    """Hit and miss counts per fragment since this process started"""
+    with _lock:
+        counters = dict(_counts)
+    result = {}
+    for name in FRAGMENTS:
+        hits = counters.get((name, 'hits'), 0)
+        misses = counters.get((name, 'misses'), 0)
+        total = hits + misses
+        result[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+        }
+    return result
@@ -0,0 +1,155 @@
+"""Conditional GET (ETag / Last-Modified) for the catalog pages.
+
+Validators come from change stamps read with one small query before the
+view runs. A matching If-None-Match or If-Modified-Since gets a 304 without
+rendering anything:
+
+- Product.updated_at, which is also touched when the product's images
+  change or their derivatives become ready (touch_products());
+- Category.updated_at, also touched when one of its products is deleted,
+  plus the category count, so deletions change the stamps too;
+- for product_detail, the related products' stamps and the time the
+  recommendations were last rebuilt.
+
+The ETag also covers everything else a page shows: the user, their cart
+count and the query string. Requests with flash messages waiting to be
+shown always render. Pages are sent with "max-age=0, must-revalidate", so
+browsers and reverse proxies store them but check back every time; pages
+for signed-in users are private.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Category, Product, ProductNeighbor, RecommendationState
+from .services import get_cart_count
+
+
+# ============= CHANGE STAMPS =============
+
+def touch_products(product_ids):
+    """Mark products changed for conditional GET, without sending signals"""
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+
+def touch_category(category_id):
+    Category.objects.filter(pk=category_id).update(updated_at=timezone.now())
+
+
+def _latest(queryset, field='updated_at'):
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def _category_count():
+    # Grouped by a constant, so the count covers the whole table in one row.
+    return Subquery(Category.objects.order_by().values(all=Value(1)).annotate(n=Count('id')).values('n'))
+
+
+def list_stamps_query():
+    """Newest category change (the row itself), category count, newest product change"""
+    return Category.objects.order_by('-updated_at').annotate(
+        categories=_category_count(),
+        products_changed=_latest(Product.objects.all()),
+    ).values('updated_at', 'categories', 'products_changed')[:1]
+
+
+def product_stamps_query(pk):
+    related = ProductNeighbor.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        changed=Max('neighbor__updated_at')).values('changed')
+    return Product.objects.filter(pk=pk).annotate(
+        categories_changed=_latest(Category.objects.all()),
+        categories=_category_count(),
+        # Products without neighbours show others from their category.
+        related_changed=Coalesce(
+            Subquery(related),
+            _latest(Product.objects.filter(category_id=OuterRef('category_id'))),
+        ),
+        recommendations_rebuilt=_latest(RecommendationState.objects.filter(pk=1), 'rebuilt_at'),
+    ).values('updated_at', 'categories_changed', 'categories', 'related_changed',
+             'recommendations_rebuilt')
+
+
+def list_stamps(request):
+    return list_stamps_query().first()
+
+
+def product_stamps(request, pk):
+    """Stamps of one product page, or None if there is no such product"""
+    return product_stamps_query(pk).first()
+
+
+# ============= VALIDATORS =============
+
+def _validators(stamps_func, request, args, kwargs):
+    """(etag, last_modified timestamp) for the request, or (None, None) to just render"""
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        return None, None
+    stamps = stamps_func(request, *args, **kwargs)
+    if not stamps:
+        return None, None
+    user = request.user
+    parts = [f'{key}={value}' for key, value in sorted(stamps.items())]
+    if user.is_authenticated:
+        parts += [f'user={user.pk}', f'cart={get_cart_count(user)}']
+    parts.append(request.GET.urlencode())
+    digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    # Weak: the rendered bytes differ in per-render details such as the CSRF token.
+    etag = f'W/"{digest}"'
+    changed = [value for value in stamps.values() if hasattr(value, 'timestamp')]
+    last_modified = int(max(changed).timestamp()) if changed else None
+    return etag, last_modified
+
+
+def _finish(request, response, etag, last_modified):
+    if etag and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        cache_control = {'max_age': 0, 'must_revalidate': True}
+        if request.user.is_authenticated:
+            cache_control['private'] = True
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def conditional_page(stamps_func):
+    """Answer matching conditional GETs with 304 before the view renders.
+
+    stamps_func(request, *args, **kwargs) returns a dict of change stamps
+    for the page, or None when validators do not apply (e.g. a 404).
+    Works on sync and async views.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            validators = sync_to_async(_validators)
+            finish = sync_to_async(_finish)
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified = await validators(stamps_func, request, args, kwargs)
+                response = None
+                if etag:
+                    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return await finish(request, response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified = _validators(stamps_func, request, args, kwargs)
+            response = None
+            if etag:
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            return _finish(request, response, etag, last_modified)
+        return wrapper
+    return decorator
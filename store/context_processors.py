@@ -1,11 +1,7 @@
-from .models import Cart
+from .services import get_cart_count
 
 def cart_context(request):
     cart_count = 0
     if request.user.is_authenticated:
-        try:
-            cart_items = Cart.objects.filter(customer__user=request.user)
-            cart_count = sum(item.quantity for item in cart_items)
-        except:
-            pass
-    return {'cart_count': cart_count}
\ No newline at end of file
+        cart_count = get_cart_count(request.user)
+    return {'cart_count': cart_count}
@@ -0,0 +1,8 @@
+from django.contrib.auth.decorators import login_required, user_passes_test
+
+from .services import is_admin
+
+
+def admin_required(view_func):
+    """Require a logged-in user with the admin role; others go to the login page"""
+    return login_required(user_passes_test(is_admin)(view_func))
@@ -0,0 +1,148 @@
+"""CSV exports of orders, payments and report aggregates for the admin panel.
+
+Rows are read with ``iterator()`` and written to the response in chunks as
+they arrive, so memory use stays flat whatever the size of the table. The
+header row is sent before the first query runs, and every query walks an
+index in the requested order, so the first rows follow without a sort.
+With history=True the archived orders or payments are merged into the
+stream in the same order.
+"""
+import csv
+import heapq
+import io
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedPayment, Category, Order, Payment, SalesAggregate
+
+CHUNK_SIZE = 2000
+# Rows buffered into each chunk of the response body.
+ROWS_PER_WRITE = 500
+
+REPORTS = ('status', 'day', 'month', 'category')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_bounds(date_from=None, date_to=None):
+    """Aware [start, end) datetimes covering the given local dates, inclusive"""
+    start = _day_start(date_from) if date_from else None
+    end = _day_start(date_to + timedelta(days=1)) if date_to else None
+    return start, end
+
+
+def _csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= ROWS_PER_WRITE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def csv_response(filename, header, rows):
+    """Stream rows as a CSV attachment; rows may be any (lazy) iterable"""
+    response = StreamingHttpResponse(_csv_chunks(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _local(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+ORDER_HEADER = ('Order ID', 'Date', 'Customer', 'Email', 'Product', 'Category', 'Quantity',
+                'Unit price', 'Line total', 'Status', 'Address')
+
+
+def _order_values(model, start, end, status):
+    """One row per order line, walking the orders of one tier"""
+    orders = model.objects.filter(items__isnull=False)
+    if start:
+        orders = orders.filter(date__gte=start)
+    if end:
+        orders = orders.filter(date__lt=end)
+    if status:
+        orders = orders.filter(status=status)
+    # (date, id) is covered by the (date, id) and (status, date, id) indexes,
+    # and each order's lines come off the order_id index already in id order.
+    return orders.order_by('date', 'id', 'items__id').values_list(
+        'id', 'date', 'customer__name', 'customer__email', 'items__product__name',
+        'items__product__category__name', 'items__quantity', 'items__price', 'status', 'address',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def order_rows(start=None, end=None, status=None, history=False):
+    rows = _order_values(Order, start, end, status)
+    if history:
+        # Both tiers come back in (date, id) order, so a merge keeps the stream sorted.
+        rows = heapq.merge(rows, _order_values(ArchivedOrder, start, end, status),
+                           key=itemgetter(1, 0))
+    for pk, date, customer, email, product, category, quantity, price, status, address in rows:
+        yield (pk, _local(date), customer, email, product, category, quantity,
+               f'{price:.2f}', f'{price * quantity:.2f}', status, address)
+
+
+PAYMENT_HEADER = ('Payment ID', 'Payment date', 'Payment type', 'Order ID', 'Order status',
+                  'Customer', 'Amount')
+
+
+def _payment_values(model, start, end, status):
+    payments = model.objects.all()
+    if start:
+        payments = payments.filter(payment_date__gte=start)
+    if end:
+        payments = payments.filter(payment_date__lt=end)
+    if status:
+        payments = payments.filter(order__status=status)
+    return payments.order_by('payment_date', 'id').values_list(
+        'id', 'payment_date', 'payment_type', 'order_id', 'order__status',
+        'order__customer__name', 'order__total',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def payment_rows(start=None, end=None, status=None, history=False):
+    rows = _payment_values(Payment, start, end, status)
+    if history:
+        rows = heapq.merge(rows, _payment_values(ArchivedPayment, start, end, status),
+                           key=itemgetter(1, 0))
+    type_labels = dict(Payment.PAYMENT_TYPE_CHOICES)
+    for pk, paid, payment_type, order_id, status, customer, total in rows:
+        yield (pk, _local(paid), type_labels.get(payment_type, payment_type), order_id, status,
+               customer, f'{total:.2f}')
+
+
+REPORT_HEADER = ('Report', 'Key', 'Label', 'Orders', 'Quantity', 'Revenue')
+
+
+def report_rows(report, date_from=None, date_to=None):
+    """Rows of one SalesAggregate kind; day and month keys are limited to the date range"""
+    aggregates = SalesAggregate.objects.filter(kind=report, order_count__gt=0).order_by('key')
+    if report in ('day', 'month'):
+        # Keys are ISO dates ('2024-05-31') or months ('2024-05'), which sort as text.
+        width = 10 if report == 'day' else 7
+        if date_from:
+            aggregates = aggregates.filter(key__gte=date_from.isoformat()[:width])
+        if date_to:
+            aggregates = aggregates.filter(key__lte=date_to.isoformat()[:width])
+    names = dict(Category.objects.values_list('id', 'name')) if report == 'category' else {}
+    for row in aggregates.iterator(chunk_size=CHUNK_SIZE):
+        label = names.get(int(row.key), '') if report == 'category' else row.key
+        yield (report, row.key, label, row.order_count, row.quantity, f'{row.revenue:.2f}')
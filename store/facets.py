@@ -0,0 +1,204 @@
+"""Category, price and carat facets for the product list.
+
+FacetCount holds the number of products in every (category, price bucket,
+carat bucket) cell. Signal handlers keep it up to date as products are
+saved and deleted, and ``rebuild()`` recomputes it after bulk writes. The
+whole table is a few hundred rows, so the counts for any combination of
+filters come from a single query plus a pass over the cells in Python.
+
+Each facet's counts apply the filters of the other facets but not its own,
+so the options of a facet show what selecting them would add. With a text
+search the cells are tallied in SQL over every matching product instead,
+which is again one query.
+"""
+from bisect import bisect_right
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+
+from .models import FacetCount, Product
+
+
+class RangeFacet:
+    """Buckets of a numeric product field, split at the given edges"""
+
+    def __init__(self, name, field, edges, labels):
+        self.name = name
+        self.field = field
+        self.edges = edges
+        self.labels = labels
+
+    def bucket(self, value):
+        return bisect_right(self.edges, value)
+
+    def bounds(self, bucket):
+        low = self.edges[bucket - 1] if bucket > 0 else None
+        high = self.edges[bucket] if bucket < len(self.edges) else None
+        return low, high
+
+    def q(self, buckets):
+        """Q matching products in any of the buckets"""
+        condition = Q()
+        for bucket in sorted(buckets):
+            low, high = self.bounds(bucket)
+            bounds = {}
+            if low is not None:
+                bounds[f'{self.field}__gte'] = low
+            if high is not None:
+                bounds[f'{self.field}__lt'] = high
+            condition |= Q(**bounds)
+        return condition
+
+    def expression(self):
+        """SQL CASE giving the bucket of each row, for rebuild()"""
+        return Case(
+            *[When(**{f'{self.field}__lt': edge}, then=Value(bucket))
+              for bucket, edge in enumerate(self.edges)],
+            default=Value(len(self.edges)), output_field=IntegerField(),
+        )
+
+
+PRICE = RangeFacet('price', 'price', [10000, 25000, 50000, 100000, 250000], [
+    'Under ₹10,000', '₹10,000 – ₹25,000', '₹25,000 – ₹50,000', '₹50,000 – ₹1,00,000',
+    '₹1,00,000 – ₹2,50,000', 'Over ₹2,50,000',
+])
+CARAT = RangeFacet('carat', 'carat', [2, 4, 6, 9], [
+    '0 – 1 carat', '2 – 3 carat', '4 – 5 carat', '6 – 8 carat', '9 carat and up',
+])
+RANGE_FACETS = (PRICE, CARAT)
+
+
+def cell(category_id, price, carat):
+    return category_id, PRICE.bucket(price), CARAT.bucket(carat)
+
+
+# ============= SELECTION =============
+
+def _int_values(values):
+    result = set()
+    for value in values:
+        try:
+            result.add(int(value))
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def parse(params):
+    """The request's selected {facet name: set of values}; unknown values are dropped"""
+    selection = {'category': _int_values(params.getlist('category'))}
+    for facet in RANGE_FACETS:
+        selection[facet.name] = {bucket for bucket in _int_values(params.getlist(facet.name))
+                                 if 0 <= bucket <= len(facet.edges)}
+    return selection
+
+
+def selection_key(selection, search_query=''):
+    """Stable string for the selection and search, to vary cached fragments on"""
+    parts = [f'{name}={",".join(str(value) for value in sorted(values))}'
+             for name, values in sorted(selection.items())]
+    return ';'.join(parts + [f'search={search_query}'])
+
+
+def filter_products(products, selection):
+    if selection['category']:
+        products = products.filter(category_id__in=selection['category'])
+    for facet in RANGE_FACETS:
+        if selection[facet.name]:
+            products = products.filter(facet.q(selection[facet.name]))
+    return products
+
+
+# ============= COUNTS =============
+
+def _cells(products=None):
+    """(category_id, price bucket, carat bucket, products) for every non-empty cell"""
+    if products is None:
+        return FacetCount.objects.filter(products__gt=0).values_list(
+            'category_id', 'price_bucket', 'carat_bucket', 'products')
+    return products.order_by().annotate(
+        price_bucket=PRICE.expression(), carat_bucket=CARAT.expression(),
+    ).values_list('category_id', 'price_bucket', 'carat_bucket').annotate(n=Count('id'))
+
+
+def counts(selection, products=None):
+    """{facet name: Counter of value -> products} and the total for the selection.
+
+    products, a Product queryset, limits the counts to its rows (the search results).
+    """
+    result = {name: Counter() for name in selection}
+    total = 0
+    for category_id, price_bucket, carat_bucket, n in _cells(products):
+        matches = {
+            'category': not selection['category'] or category_id in selection['category'],
+            'price': not selection['price'] or price_bucket in selection['price'],
+            'carat': not selection['carat'] or carat_bucket in selection['carat'],
+        }
+        values = {'category': category_id, 'price': price_bucket, 'carat': carat_bucket}
+        for name in result:
+            if all(match for other, match in matches.items() if other != name):
+                result[name][values[name]] += n
+        if all(matches.values()):
+            total += n
+    return result, total
+
+
+def product_total():
+    """Number of products, summed from the cells rather than counted from the product table"""
+    return FacetCount.objects.aggregate(total=Sum('products'))['total'] or 0
+
+
+def sidebar(selection, categories, products=None):
+    """Facet options for the template.
+
+    Returns {'total': n, 'facets': [{name, title, options}]}, where each
+    option is a {value, label, count, selected} dict.
+    """
+    facet_counts, total = counts(selection, products)
+
+    def options(name, choices):
+        return [{'value': value, 'label': label, 'count': facet_counts[name][value],
+                 'selected': value in selection[name]} for value, label in choices]
+
+    return {
+        'total': total,
+        'facets': [
+            {'name': 'category', 'title': 'Categories',
+             'options': options('category', [(category.id, category.name) for category in categories])},
+            {'name': 'price', 'title': 'Price', 'options': options('price', enumerate(PRICE.labels))},
+            {'name': 'carat', 'title': 'Carat', 'options': options('carat', enumerate(CARAT.labels))},
+        ],
+    }
+
+
+# ============= MAINTENANCE =============
+
+def record(key, delta):
+    """Add delta products to the (category_id, price bucket, carat bucket) cell"""
+    category_id, price_bucket, carat_bucket = key
+    rows = FacetCount.objects.filter(category_id=category_id, price_bucket=price_bucket,
+                                     carat_bucket=carat_bucket)
+    if rows.update(products=F('products') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            FacetCount.objects.create(category_id=category_id, price_bucket=price_bucket,
+                                      carat_bucket=carat_bucket, products=delta)
+    except IntegrityError:
+        rows.update(products=F('products') + delta)
+
+
+def rebuild():
+    """Recompute every cell from the Product table; returns the cell count"""
+    rows = [
+        FacetCount(category_id=row['category_id'], price_bucket=row['price_bucket'],
+                   carat_bucket=row['carat_bucket'], products=row['n'])
+        for row in Product.objects.order_by().annotate(
+            price_bucket=PRICE.expression(), carat_bucket=CARAT.expression(),
+        ).values('category_id', 'price_bucket', 'carat_bucket').annotate(n=Count('id'))
+    ]
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Customer, Product, Category, Feedback, Complaint, ProductImage
+from .models import Customer, Product, Category, Feedback, Complaint, ProductImage, Order
 
 class CustomerRegistrationForm(UserCreationForm):
     name = forms.CharField(max_length=30, required=True)
@@ -47,6 +47,11 @@ class ProductForm(forms.ModelForm):
             'carat': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+class ProductImportForm(ProductForm):
+    """ProductForm rules for bulk import; the category is resolved by name separately"""
+    class Meta(ProductForm.Meta):
+        fields = ['name', 'description', 'price', 'carat']
+
 class ProductImageForm(forms.ModelForm):
     class Meta:
         model = ProductImage
@@ -70,4 +75,18 @@ class ComplaintForm(forms.ModelForm):
         widgets = {
             'product': forms.Select(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Describe your complaint...'})
-        }
\ No newline at end of file
+        }
+
+class ExportFilterForm(forms.Form):
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    status = forms.ChoiceField(choices=[('', 'All')] + Order.STATUS_CHOICES, required=False)
+    history = forms.BooleanField(required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('The start date must not be after the end date.')
+        return cleaned_data
\ No newline at end of file
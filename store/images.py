@@ -0,0 +1,93 @@
+"""Resized WebP and JPEG derivatives of product images.
+
+Each original ``products/ring.jpg`` gets siblings such as
+``products/ring.jpg__card.webp`` and ``products/ring.jpg__card.jpg`` for every
+size in SIZES. The original's extension stays in the name, so ``ring.jpg``
+and ``ring.png`` never share derivatives. Templates pick between them with
+the ``responsive_image`` tag.
+"""
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import catalog_cache, conditional
+
+logger = logging.getLogger(__name__)
+
+# Square crops, in pixels; the catalog shows images with object-fit: cover.
+SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, size, extension):
+    return f'{name}__{size}.{extension}'
+
+
+def _encode(image, extension):
+    image_format, options = FORMATS[extension]
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1])
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, overwrite=False, storage=None):
+    """Write every size/format derivative of the stored image called name"""
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    written = []
+    for size, pixels in SIZES.items():
+        resized = ImageOps.fit(image, (pixels, pixels), Image.Resampling.LANCZOS)
+        for extension in FORMATS:
+            target = derivative_name(name, size, extension)
+            if storage.exists(target):
+                if not overwrite:
+                    continue
+                storage.delete(target)
+            storage.save(target, ContentFile(_encode(resized, extension)))
+            written.append(target)
+    return written
+
+
+def process_product_image(product_image, overwrite=False):
+    """Generate derivatives for a ProductImage and flag it ready; returns success"""
+    try:
+        generate_derivatives(product_image.image_path.name, overwrite=overwrite)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Could not generate derivatives for %s', product_image.image_path.name)
+        return False
+    type(product_image).objects.filter(pk=product_image.pk).update(derivatives_ready=True)
+    product_image.derivatives_ready = True
+    # update() sends no signals, so refresh cached cards and page validators here.
+    conditional.touch_products([product_image.product_id])
+    catalog_cache.bump(catalog_cache.PRODUCTS)
+    return True
+
+
+def srcset(name, extension):
+    return ', '.join(
+        f'{default_storage.url(derivative_name(name, size, extension))} {pixels}w'
+        for size, pixels in SIZES.items()
+    )
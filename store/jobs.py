@@ -0,0 +1,130 @@
+"""Database-backed job queue for work that should not block a response.
+
+Views call ``enqueue()``. The Job row is written in the view's own
+transaction, so a job exists exactly when the change that caused it was
+committed. ``manage.py run_jobs`` claims due jobs and runs them on a thread
+or process pool. Failed jobs are retried with exponential backoff until
+max_attempts is reached.
+
+Handlers run outside any transaction and may be retried, so they must be
+idempotent: a worker that dies after the handler finished but before the job
+was marked done will run it again. Handlers that need atomicity open their
+own transaction, kept short so SQLite writers are not blocked for long.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .metrics import percentile
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 60 * 60
+# A job still 'running' after this long is assumed to belong to a dead worker.
+STALE_AFTER = timedelta(minutes=10)
+
+_handlers = {}
+
+
+def register(name):
+    """Decorator registering a job handler under name"""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, max_attempts=5, **payload):
+    if name not in _handlers:
+        raise KeyError(f'No job handler registered for {name!r}')
+    run_at = timezone.now() + delay if delay else timezone.now()
+    return Job.objects.create(name=name, payload=payload, run_at=run_at,
+                              max_attempts=max_attempts)
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim(limit):
+    """Mark up to limit due jobs as running and return their ids.
+
+    Each job is claimed with a conditional UPDATE, so two workers polling
+    the same rows cannot both win it, on any database backend.
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status='queued', run_at__lte=now)
+        | Job.objects.filter(status='running', started_at__lt=now - STALE_AFTER)
+    ).order_by('run_at', 'id').values_list('id', 'status')[:limit * 2]
+    claimed = []
+    for job_id, status in candidates:
+        won = Job.objects.filter(id=job_id, status=status).update(
+            status='running', started_at=now, attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def execute(job_id):
+    """Run one claimed job and record the outcome; returns the final status"""
+    job = Job.objects.get(pk=job_id)
+    handler = _handlers.get(job.name)
+    try:
+        if handler is None:
+            raise KeyError(f'No job handler registered for {job.name!r}')
+        handler(**job.payload)
+        Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(),
+                                             last_error='')
+        return 'done'
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts)
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(status='failed', finished_at=timezone.now(),
+                                                 last_error=error)
+            return 'failed'
+        Job.objects.filter(pk=job.pk).update(status='queued', last_error=error,
+                                             run_at=timezone.now() + backoff(job.attempts))
+        return 'retry'
+
+
+def purge_finished(older_than):
+    """Delete done jobs finished before now - older_than; returns the count"""
+    cutoff = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def queue_stats(sample_size=500):
+    """Queue depth by status plus wait and run latency of recent jobs"""
+    now = timezone.now()
+    depth = dict(Job.objects.values_list('status').annotate(n=Count('id')).order_by())
+    due = Job.objects.filter(status='queued', run_at__lte=now)
+    oldest_due = due.aggregate(oldest=Min('run_at'))['oldest']
+    recent = list(
+        Job.objects.filter(status='done').order_by('-finished_at')
+        .values_list('created_at', 'started_at', 'finished_at')[:sample_size]
+    )
+    wait = sorted((started - created).total_seconds() * 1000 for created, started, _ in recent)
+    run = sorted((finished - started).total_seconds() * 1000 for _, started, finished in recent)
+    return {
+        'queued': depth.get('queued', 0),
+        'due': due.count(),
+        'running': depth.get('running', 0),
+        'done': depth.get('done', 0),
+        'failed': depth.get('failed', 0),
+        'oldest_due_seconds': round((now - oldest_due).total_seconds(), 1) if oldest_due else 0,
+        'wait_p50_ms': round(percentile(wait, 50), 1),
+        'wait_p95_ms': round(percentile(wait, 95), 1),
+        'run_p50_ms': round(percentile(run, 50), 1),
+        'run_p95_ms': round(percentile(run, 95), 1),
+    }
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import archive
+
+
+class Command(BaseCommand):
+    help = ('Move Delivered and Rejected orders older than ORDER_ARCHIVE_DAYS, with their '
+            'payments, to the archive tables in batches; meant to run nightly from cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive orders older than this (default: '
+                                                     'settings.ORDER_ARCHIVE_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        progress = None
+        if options['verbosity'] >= 2:
+            progress = lambda orders, payments: self.stdout.write(f'{orders} orders archived')
+        orders, payments = archive.archive_orders(options['days'], options['batch_size'], progress)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {orders} orders and {payments} payments in {elapsed:.2f}s'))
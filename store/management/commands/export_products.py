@@ -0,0 +1,48 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import Product
+from store.product_io import FORMATS, detect_format, open_output, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream every product to a CSV or JSONL file in the format import_products reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Output format (default: from the file extension)')
+        parser.add_argument('--category', help='Only export products in this category')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database per round trip')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        products = Product.objects.order_by('id')
+        if options['category']:
+            products = products.filter(category__name=options['category'])
+        # iterator() streams rows from the cursor instead of caching the queryset.
+        rows = products.values_list(
+            'id', 'name', 'description', 'price', 'category__name', 'carat'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        start = time.perf_counter()
+        try:
+            stream = open_output(options['path'])
+        except OSError as exc:
+            raise CommandError(exc)
+        try:
+            count = write_rows(stream, fmt, rows)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        # Keep stdout clean for the data when exporting to it.
+        out = self.stderr if options['path'] == '-' else self.stdout
+        out.write(self.style.SUCCESS(
+            f'Exported {count} products in {elapsed:.2f}s ({rate:,.0f} rows/sec)'
+        ))
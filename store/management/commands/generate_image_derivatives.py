@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store import catalog_cache, conditional
+from store.images import generate_derivatives
+from store.models import ProductImage
+
+
+def _init_worker():
+    # Spawned workers (Windows, macOS) start without Django configured.
+    import django
+    django.setup()
+
+
+def _generate(pk, name, overwrite):
+    try:
+        return pk, len(generate_derivatives(name, overwrite=overwrite)), None
+    except Exception as exc:  # reported back to the parent, which keeps going
+        return pk, 0, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG derivatives for existing product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate derivatives even for images already marked ready')
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.all()
+        if not options['force']:
+            images = images.filter(derivatives_ready=False)
+        pending = list(images.values_list('pk', 'image_path'))
+        if not pending:
+            self.stdout.write('No images need derivatives.')
+            return
+
+        # Forked workers must not inherit open database connections.
+        connections.close_all()
+        start = time.perf_counter()
+        done, files = [], 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_generate, pk, name, options['force']) for pk, name in pending]
+            for future in as_completed(futures):
+                pk, written, error = future.result()
+                if error:
+                    self.stderr.write(f'Image {pk}: {error}')
+                else:
+                    done.append(pk)
+                    files += written
+
+        ready = ProductImage.objects.filter(pk__in=done)
+        ready.update(derivatives_ready=True)
+        conditional.touch_products(ready.values('product_id'))
+        catalog_cache.bump(catalog_cache.PRODUCTS)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(done)}/{len(pending)} images ({files} files) '
+            f'in {elapsed:.2f}s with {options["workers"]} workers'
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Delete expired sessions from the database in batches, each in its own short '
+            'transaction; meant to run daily from cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        cutoff = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=cutoff)
+        total = 0
+        while True:
+            # One DELETE ... WHERE session_key IN (SELECT ... LIMIT n) per batch,
+            # walking the expire_date index, so logins are never blocked for long.
+            batch = expired.order_by('expire_date').values('session_key')[:options['batch_size']]
+            with transaction.atomic():
+                deleted, _ = Session.objects.filter(session_key__in=batch).delete()
+            if not deleted:
+                break
+            total += deleted
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'{total} deleted')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired sessions in {elapsed:.2f}s'))
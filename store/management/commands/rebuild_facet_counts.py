@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import catalog_cache, facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the product_list facet counts from the product table'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = facets.rebuild()
+        catalog_cache.bump(catalog_cache.PRODUCTS)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} facet cells in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import recommendations
+
+
+class Command(BaseCommand):
+    help = ('Update the related-products table from the orders placed since the last run; '
+            'meant to run periodically from cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute everything from the whole order history')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = recommendations.rebuild(full=options['full'])
+        elapsed = time.perf_counter() - start
+        kind = 'Full' if stats['full'] else 'Incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind} rebuild: {stats['lines']} order lines, {stats['pairs']} product pairs, "
+            f"{stats['products']} products updated in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard and report sales aggregates from the order history'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = aggregates.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} aggregate rows in {elapsed:.2f}s'
+        ))
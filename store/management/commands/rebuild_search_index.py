@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from the product and category tables'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = search.rebuild_index()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} products in {elapsed:.2f}s'
+        ))
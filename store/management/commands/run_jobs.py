@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from store import catalog_cache, jobs
+
+
+def _init_process():
+    # Spawned workers (Windows, macOS) start without Django configured.
+    import django
+    django.setup()
+
+
+def _execute(job_id):
+    try:
+        return jobs.execute(job_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help='Thread pool (I/O-bound jobs) or process pool (CPU-bound jobs)')
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help='Seconds to sleep when no job is due')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due instead of polling')
+        parser.add_argument('--purge-days', type=int, default=7,
+                            help='Delete finished jobs older than this many days')
+        parser.add_argument('--stats', action='store_true', help='Print queue metrics and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in jobs.queue_stats().items():
+                self.stdout.write(f'{key:20} {value}')
+            return
+
+        # Jobs such as image derivatives bump the catalog version; on a
+        # per-process cache the web workers would never see those bumps.
+        if not catalog_cache.is_shared():
+            raise CommandError('run_jobs needs a shared cache: set CACHE_BACKEND to file or redis, '
+                               'not locmem')
+
+        if options['mode'] == 'process':
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+
+        purged = jobs.purge_finished(timedelta(days=options['purge_days']))
+        if purged:
+            self.stdout.write(f'Purged {purged} finished jobs')
+
+        counts = {'done': 0, 'retry': 0, 'failed': 0}
+        try:
+            with pool:
+                while True:
+                    claimed = jobs.claim(options['workers'])
+                    if not claimed:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    for status in pool.map(_execute, claimed):
+                        counts[status] += 1
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
+        self.stdout.write(self.style.SUCCESS(
+            f"Jobs done: {counts['done']}, retried: {counts['retry']}, failed: {counts['failed']}"
+        ))
@@ -0,0 +1,57 @@
+"""In-memory request metrics for the admin panel.
+
+Samples are kept per URL name in fixed-size ring buffers, so memory stays
+bounded no matter how long the process runs. Figures are per process.
+"""
+import threading
+from collections import deque
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_samples = {}
+
+
+def record(url_name, wall_ms, queries, sql_ms, duplicates):
+    window = getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+    with _lock:
+        buffer = _samples.get(url_name)
+        if buffer is None:
+            buffer = _samples[url_name] = deque(maxlen=window)
+        buffer.append((wall_ms, queries, sql_ms, duplicates))
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values))) - 1))
+    return values[index]
+
+
+def summary():
+    """One row per URL name, slowest p95 first"""
+    with _lock:
+        snapshot = {name: list(buffer) for name, buffer in _samples.items()}
+    rows = []
+    for name, samples in snapshot.items():
+        wall = sorted(sample[0] for sample in samples)
+        count = len(samples)
+        rows.append({
+            'url_name': name,
+            'requests': count,
+            'p50_ms': round(percentile(wall, 50), 2),
+            'p95_ms': round(percentile(wall, 95), 2),
+            'p99_ms': round(percentile(wall, 99), 2),
+            'avg_queries': round(sum(sample[1] for sample in samples) / count, 1),
+            'max_queries': max(sample[1] for sample in samples),
+            'avg_sql_ms': round(sum(sample[2] for sample in samples) / count, 2),
+            'duplicate_queries': sum(sample[3] for sample in samples),
+        })
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return rows
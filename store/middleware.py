@@ -0,0 +1,163 @@
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import metrics
+from .staticfiles import StaticFileIndex, accepted_encodings
+
+# A year: hashed file names change whenever their content does.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class QueryCollector:
+    """connection.execute_wrapper hook counting queries, SQL time and repeats"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.seen = set()
+        self.duplicates = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        key = (sql, repr(params))
+        if key in self.seen:
+            self.duplicates += 1
+        else:
+            self.seen.add(key)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    """Record wall time and SQL statistics for every request, by URL name.
+
+    Controlled by REQUEST_METRICS_ENABLED; when it is off Django drops the
+    middleware at startup, so it costs nothing per request. Works under both
+    WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        collector = QueryCollector()
+        start = time.perf_counter()
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+        self.record(request, collector, start)
+        return response
+
+    async def __acall__(self, request):
+        collector = QueryCollector()
+        start = time.perf_counter()
+        # Connections are per thread, and the event loop's is not the one the
+        # view queries on. ASGI runs all of a request's sync code, the async
+        # ORM included, in one thread, so the collector is installed there.
+        await sync_to_async(lambda: connection.execute_wrappers.append(collector))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(collector))()
+        self.record(request, collector, start)
+        return response
+
+    def record(self, request, collector, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        url_name = (match.url_name or match.view_name) if match else '<unresolved>'
+        metrics.record(url_name, wall_ms, collector.count, collector.duration * 1000,
+                       collector.duplicates)
+
+
+class StaticFilesMiddleware:
+    """Serve the collected static files from STATIC_ROOT.
+
+    Picks the brotli or gzip variant written by collectstatic when the
+    client accepts it. Content-hashed files are sent with a year-long
+    immutable Cache-Control, so browsers never ask for them again; other
+    files get STATIC_MAX_AGE and revalidate with If-Modified-Since.
+    Controlled by SERVE_STATIC (on when DEBUG is off); the file list is read
+    once at startup, so restart after collectstatic. Under ASGI the stat and
+    open run in a worker thread, off the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.index = StaticFileIndex(settings.STATIC_ROOT, settings.STATIC_URL)
+        if not self.index:
+            raise MiddlewareNotUsed
+        self.max_age = getattr(settings, 'STATIC_MAX_AGE', 60)
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.lookup(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self.serve(request, static_file)
+
+    async def __acall__(self, request):
+        static_file = self.lookup(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return await sync_to_async(self.serve, thread_sensitive=False)(request, static_file)
+
+    def lookup(self, request):
+        if request.method in ('GET', 'HEAD'):
+            return self.index.get(request.path_info)
+        return None
+
+    def serve(self, request, static_file):
+        mtime = os.stat(static_file.path).st_mtime
+        if not static_file.immutable and not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            return HttpResponseNotModified()
+
+        path, encoding = static_file.path, None
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for coding, variant in static_file.variants.items():
+            if coding in accepted:
+                path, encoding = variant, coding
+                break
+
+        response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+        # FileResponse names the file it was given, which may be the .gz one.
+        del response['Content-Disposition']
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if static_file.variants:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        response['Last-Modified'] = http_date(mtime)
+        if static_file.immutable:
+            response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:31
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_rows(apps, schema_editor):
+    """Fold duplicate (customer, product) rows into one before the constraint lands"""
+    Cart = apps.get_model('store', 'Cart')
+    duplicates = (
+        Cart.objects.values('customer_id', 'product_id')
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        Cart.objects.filter(pk=group['keep']).update(quantity=group['total'])
+        Cart.objects.filter(
+            customer_id=group['customer_id'], product_id=group['product_id']
+        ).exclude(pk=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('customer', 'product'), name='unique_cart_item'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:33
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+
+REVENUE_STATUS = 'Delivered'
+
+
+def backfill_sales_aggregates(apps, schema_editor):
+    """Compute the aggregate rows for the orders already in the table, as aggregates.rebuild() does"""
+    Order = apps.get_model('store', 'Order')
+    SalesAggregate = apps.get_model('store', 'SalesAggregate')
+    totals = {'n': Count('id'), 'qty': Sum('quantity'), 'total': Sum(F('price') * F('quantity'))}
+    delivered = Order.objects.filter(status=REVENUE_STATUS).order_by()
+    rows = [
+        SalesAggregate(kind='status', key=row['status'], order_count=row['n'],
+                       quantity=row['qty'], revenue=row['total'])
+        for row in Order.objects.order_by().values('status').annotate(**totals)
+    ]
+    for kind, trunc, fmt in (('day', TruncDay, '%Y-%m-%d'), ('month', TruncMonth, '%Y-%m')):
+        rows += [
+            SalesAggregate(kind=kind, key=row['period'].strftime(fmt), order_count=row['n'],
+                           quantity=row['qty'], revenue=row['total'])
+            for row in delivered.annotate(period=trunc('date')).values('period').annotate(**totals)
+        ]
+    rows += [
+        SalesAggregate(kind='category', key=str(row['product__category_id']), order_count=row['n'],
+                       quantity=row['qty'], revenue=row['total'])
+        for row in delivered.values('product__category_id').annotate(**totals)
+    ]
+    SalesAggregate.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_cart_unique_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('status', 'Status'), ('day', 'Day'), ('month', 'Month'), ('category', 'Category')], max_length=10)),
+                ('key', models.CharField(max_length=35)),
+                ('order_count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+            ],
+            options={
+                'db_table': 'sales_aggregate',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesaggregate',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='unique_sales_aggregate'),
+        ),
+        # Reversing drops the table, so there is nothing to undo.
+        migrations.RunPython(backfill_sales_aggregates, migrations.RunPython.noop),
+    ]
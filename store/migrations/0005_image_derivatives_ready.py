@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='derivatives_ready',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Case, Count, IntegerField, Value, When
+
+PRICE_EDGES = [10000, 25000, 50000, 100000, 250000]
+CARAT_EDGES = [2, 4, 6, 9]
+
+
+def bucket(field, edges):
+    return Case(
+        *[When(**{f'{field}__lt': edge}, then=Value(n)) for n, edge in enumerate(edges)],
+        default=Value(len(edges)), output_field=IntegerField(),
+    )
+
+
+def backfill_facet_counts(apps, schema_editor):
+    """Count the products already in the table into their cells, as facets.rebuild() does"""
+    Product = apps.get_model('store', 'Product')
+    FacetCount = apps.get_model('store', 'FacetCount')
+    rows = [
+        FacetCount(category_id=row['category_id'], price_bucket=row['price_bucket'],
+                   carat_bucket=row['carat_bucket'], products=row['n'])
+        for row in Product.objects.order_by().annotate(
+            price_bucket=bucket('price', PRICE_EDGES), carat_bucket=bucket('carat', CARAT_EDGES),
+        ).values('category_id', 'price_bucket', 'carat_bucket').annotate(n=Count('id'))
+    ]
+    FacetCount.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('carat_bucket', models.PositiveSmallIntegerField()),
+                ('products', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.category')),
+            ],
+            options={
+                'db_table': 'facet_count',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'price_bucket', 'carat_bucket'), name='unique_facet_count'),
+        ),
+        # Reversing drops the table, so there is nothing to undo.
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
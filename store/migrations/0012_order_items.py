@@ -0,0 +1,231 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:56
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+# Rows written by one checkout share everything but the product line, have
+# consecutive ids and were stamped within moments of each other.
+CHECKOUT_WINDOW_SECONDS = 5
+HEADER_FIELDS = ('customer_id', 'name', 'address', 'description', 'status')
+# Hot models whose ids their archived copies keep.
+ID_SHARING_MODELS = (('Order', 'ArchivedOrder'), ('OrderItem', 'ArchivedOrderItem'),
+                     ('Payment', 'ArchivedPayment'))
+
+
+def _same_checkout(first, row, tz):
+    """Whether row, a (id, date, *HEADER_FIELDS) tuple, was written by the same checkout as first"""
+    return ((row[1] - first[1]).total_seconds() <= CHECKOUT_WINDOW_SECONDS
+            and row[2:] == first[2:]
+            and row[1].astimezone(tz).date() == first[1].astimezone(tz).date())
+
+
+def _split_tier(apps, connection, order_model, item_model, payment_model):
+    """Turn one order table's per-line rows into headers with lines.
+
+    Every row becomes a line with the row's id, so line ids follow the old
+    order ids, and the first row of each checkout becomes the header. The
+    copy, the regrouping and the deletes are plain SQL; only the scan that
+    finds the checkouts runs in Python. Returns a Counter of merged-away rows
+    by aggregate (kind, key).
+    """
+    Order = apps.get_model('store', order_model)
+    OrderItem = apps.get_model('store', item_model)
+    Payment = apps.get_model('store', payment_model)
+    quote = connection.ops.quote_name
+    orders, items = quote(Order._meta.db_table), quote(OrderItem._meta.db_table)
+    item_id, item_order = quote(OrderItem._meta.pk.column), quote(OrderItem._meta.get_field('order').column)
+    columns = ', '.join(quote(Order._meta.get_field(name).column) for name in ('product', 'price', 'quantity'))
+    tz = timezone.get_current_timezone()
+    removed = Counter()
+
+    with connection.cursor() as cursor:
+        order_id = quote(Order._meta.pk.column)
+        cursor.execute(f'INSERT INTO {items} ({item_id}, {item_order}, {columns}) '
+                       f'SELECT {order_id}, {order_id}, {columns} FROM {orders}')
+        header, last_id = None, 0
+        while True:
+            # Keyset batches, so deleting rows already scanned cannot upset the scan.
+            rows = list(Order.objects.filter(id__gt=last_id).order_by('id').values_list(
+                'id', 'date', *HEADER_FIELDS)[:BATCH_SIZE])
+            if not rows:
+                break
+            merged = []
+            for row in rows:
+                if header is None or not _same_checkout(header, row, tz):
+                    header = row
+                    continue
+                merged.append((header[0], row[0]))
+                status = row[-1]
+                removed['status', status] += 1
+                if status == 'Delivered':
+                    day = row[1].astimezone(tz).date()
+                    removed['day', day.isoformat()] += 1
+                    removed['month', day.strftime('%Y-%m')] += 1
+            last_id = rows[-1][0]
+            if merged:
+                merged_ids = [pk for _, pk in merged]
+                cursor.executemany(f'UPDATE {items} SET {item_order} = %s WHERE {item_id} = %s', merged)
+                _delete(cursor, Payment, Payment._meta.get_field('order').column, merged_ids)
+                _delete(cursor, Order, Order._meta.pk.column, merged_ids)
+
+    line_totals = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        total=Sum(F('price') * F('quantity'))).values('total')
+    Order.objects.update(total=Coalesce(Subquery(line_totals), 0.0))
+    # One payment per order: keep the first if a header somehow had several.
+    first_payments = Payment.objects.values('order_id').annotate(first=Min('id')).values('first')
+    Payment.objects.exclude(id__in=first_payments).delete()
+    return removed
+
+
+def _delete(cursor, model, column, ids):
+    # Plain DELETE: the merged rows have nothing left pointing at them, so
+    # the collector's per-relation lookups would be wasted work.
+    quote = cursor.db.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})', ids)
+
+
+def split_orders(apps, schema_editor):
+    """Group the per-line Order rows of each checkout into one Order with OrderItem lines.
+
+    Sales aggregates keep their quantity and revenue; the order counts of
+    the status, day and month rows drop by the rows merged into a header.
+    Category rows count lines, so they do not change.
+    """
+    SalesAggregate = apps.get_model('store', 'SalesAggregate')
+    connection = schema_editor.connection
+    removed = _split_tier(apps, connection, 'Order', 'OrderItem', 'Payment')
+    removed.update(_split_tier(apps, connection, 'ArchivedOrder', 'ArchivedOrderItem', 'ArchivedPayment'))
+    for (kind, key), count in removed.items():
+        SalesAggregate.objects.filter(kind=kind, key=key).update(order_count=F('order_count') - count)
+    if connection.vendor == 'postgresql':
+        # Run the deferred foreign key checks now: PostgreSQL refuses to ALTER
+        # a table with pending trigger events, and the RemoveFields follow.
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+def advance_sequences(apps, schema_editor):
+    """Move the order, line and payment id sequences past every id in use, hot or archived.
+
+    Archived rows keep their ids, so a new id must not repeat one. The line
+    ids were inserted explicitly, and on SQLite removing and altering
+    columns remakes the order and payment tables, whose AUTOINCREMENT then
+    starts again at 1 when the hot table is empty.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for hot_name, archived_name in ID_SHARING_MODELS:
+            hot = apps.get_model('store', hot_name)
+            archived = apps.get_model('store', archived_name)
+            last_id = max(model.objects.aggregate(last=Max('id'))['last'] or 0 for model in (hot, archived))
+            if not last_id:
+                continue
+            table = hot._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [last_id, table])
+                if not cursor.rowcount:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, last_id])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(seq, GREATEST(%s, COALESCE(pg_sequence_last_value(seq), 0))) '
+                    'FROM CAST(pg_get_serial_sequence(%s, %s) AS regclass) AS seq',
+                    [last_id, quote(table), hot._meta.pk.column],
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.FloatField()),
+                ('quantity', models.IntegerField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product')),
+            ],
+            options={
+                'db_table': 'order_item',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('price', models.FloatField()),
+                ('quantity', models.IntegerField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product')),
+            ],
+            options={
+                'db_table': 'archived_order_item',
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.FloatField(default=0),
+        ),
+        # Irreversible: the split cannot tell which lines were bought together.
+        migrations.RunPython(split_orders),
+        migrations.RemoveField(
+            model_name='archivedorder',
+            name='price',
+        ),
+        migrations.RemoveField(
+            model_name='archivedorder',
+            name='product',
+        ),
+        migrations.RemoveField(
+            model_name='archivedorder',
+            name='quantity',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='price',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='product',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='quantity',
+        ),
+        migrations.AlterField(
+            model_name='archivedpayment',
+            name='order',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='store.archivedorder'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='order',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='store.order'),
+        ),
+        # Line ids are the old order ids, so the recorded position still holds.
+        migrations.RenameField(
+            model_name='recommendationstate',
+            old_name='last_order_id',
+            new_name='last_item_id',
+        ),
+        # Last, once SQLite has remade the order and payment tables.
+        migrations.RunPython(advance_sequences),
+    ]
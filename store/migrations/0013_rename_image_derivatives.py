@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def reset_derivatives(apps, schema_editor):
+    """Derivative names now keep the original's extension, so none under the new names exist yet.
+
+    Pages show the original uploads until manage.py generate_image_derivatives
+    writes them again.
+    """
+    ProductImage = apps.get_model('store', 'ProductImage')
+    ProductImage.objects.filter(derivatives_ready=True).update(derivatives_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_order_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_derivatives, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from django.db.models import OuterRef, Prefetch, Subquery
 
 class Admin(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -29,6 +31,7 @@ class Customer(models.Model):
 
 class Category(models.Model):
     name = models.CharField(max_length=35, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -36,6 +39,20 @@ class Category(models.Model):
     class Meta:
         db_table = 'category'
         verbose_name_plural = 'Categories'
+        indexes = [
+            models.Index(fields=['updated_at'], name='category_updated_at_idx'),
+        ]
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Products with their category and first image path, in a single query"""
+        primary_image = ProductImage.objects.filter(
+            product=OuterRef('pk')
+        ).order_by('id')
+        return self.select_related('category').annotate(
+            primary_image_path=Subquery(primary_image.values('image_path')[:1]),
+            primary_image_ready=Subquery(primary_image.values('derivatives_ready')[:1]),
+        )
 
 class Product(models.Model):
     name = models.CharField(max_length=10)
@@ -46,21 +63,33 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
     
     class Meta:
         db_table = 'product'
+        indexes = [
+            models.Index(fields=['category', 'id'], name='product_category_id_idx'),
+            models.Index(fields=['created_at'], name='product_created_at_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+            models.Index(fields=['category', 'updated_at'], name='product_category_updated_idx'),
+        ]
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image_path = models.ImageField(upload_to='products/')
+    derivatives_ready = models.BooleanField(default=False)
     
     def __str__(self):
         return f"Image for {self.product.name}"
     
     class Meta:
         db_table = 'image'
+        indexes = [
+            models.Index(fields=['product', 'id'], name='image_product_id_idx'),
+        ]
 
 class Cart(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -75,6 +104,15 @@ class Cart(models.Model):
     
     class Meta:
         db_table = 'cart'
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'product'], name='unique_cart_item'),
+        ]
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Orders with their lines and each line's product, in one extra query"""
+        items = self.model._meta.get_field('items').related_model
+        return self.prefetch_related(Prefetch('items', queryset=items.objects.select_related('product')))
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -85,17 +123,18 @@ class Order(models.Model):
     ]
     
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
     name = models.CharField(max_length=35)
     address = models.CharField(max_length=50)
     date = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=50, blank=True)
-    price = models.FloatField()
-    quantity = models.IntegerField()
+    # Sum of the lines, kept so listings and revenue need not join them.
+    total = models.FloatField(default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     
+    objects = OrderQuerySet.as_manager()
+    
     def get_total(self):
-        return self.price * self.quantity
+        return self.total
     
     def __str__(self):
         return f"Order #{self.id} - {self.customer.name}"
@@ -103,6 +142,26 @@ class Order(models.Model):
     class Meta:
         db_table = 'order'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'id'], name='order_date_id_idx'),
+            models.Index(fields=['status', 'date', 'id'], name='order_status_date_id_idx'),
+            models.Index(fields=['customer', 'date'], name='order_customer_date_idx'),
+        ]
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    price = models.FloatField()
+    quantity = models.IntegerField()
+    
+    def get_total(self):
+        return self.price * self.quantity
+    
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity} (order #{self.order_id})"
+    
+    class Meta:
+        db_table = 'order_item'
 
 class Payment(models.Model):
     PAYMENT_TYPE_CHOICES = [
@@ -112,7 +171,7 @@ class Payment(models.Model):
         ('NetBanking', 'Net Banking'),
     ]
     
-    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    order = models.OneToOneField(Order, on_delete=models.CASCADE)
     payment_type = models.CharField(max_length=30, choices=PAYMENT_TYPE_CHOICES)
     payment_date = models.DateTimeField(auto_now_add=True)
     
@@ -121,6 +180,72 @@ class Payment(models.Model):
     
     class Meta:
         db_table = 'payment'
+        indexes = [
+            models.Index(fields=['payment_date', 'id'], name='payment_date_id_idx'),
+        ]
+
+class ArchivedOrder(models.Model):
+    """A Delivered or Rejected order moved out of the hot table by store.archive.
+
+    Rows keep the id they had in Order, so order numbers stay valid.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    name = models.CharField(max_length=35)
+    address = models.CharField(max_length=50)
+    date = models.DateTimeField()
+    description = models.CharField(max_length=50, blank=True)
+    total = models.FloatField(default=0)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    archived_at = models.DateTimeField()
+
+    objects = OrderQuerySet.as_manager()
+
+    def get_total(self):
+        return self.total
+
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.customer.name}"
+
+    class Meta:
+        db_table = 'archived_order'
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'id'], name='archived_order_date_id_idx'),
+            models.Index(fields=['status', 'date', 'id'], name='archived_order_status_idx'),
+            models.Index(fields=['customer', 'date'], name='archived_order_customer_idx'),
+        ]
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    price = models.FloatField()
+    quantity = models.IntegerField()
+
+    def get_total(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity} (archived order #{self.order_id})"
+
+    class Meta:
+        db_table = 'archived_order_item'
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.OneToOneField(ArchivedOrder, on_delete=models.CASCADE)
+    payment_type = models.CharField(max_length=30, choices=Payment.PAYMENT_TYPE_CHOICES)
+    payment_date = models.DateTimeField()
+
+    def __str__(self):
+        return f"Payment for archived order #{self.order_id}"
+
+    class Meta:
+        db_table = 'archived_payment'
+        indexes = [
+            models.Index(fields=['payment_date', 'id'], name='archived_payment_date_id_idx'),
+        ]
 
 class Feedback(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -133,6 +258,9 @@ class Feedback(models.Model):
     class Meta:
         db_table = 'feedback'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'id'], name='feedback_date_id_idx'),
+        ]
 
 class Complaint(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -145,4 +273,134 @@ class Complaint(models.Model):
     
     class Meta:
         db_table = 'complaints'
-        ordering = ['-date']
\ No newline at end of file
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'id'], name='complaint_date_id_idx'),
+        ]
+
+class SalesAggregate(models.Model):
+    """Running order totals maintained by store.aggregates.
+
+    'status' rows count every order by status; 'day', 'month' and 'category'
+    rows cover delivered orders only, matching what the reports show.
+    """
+    KIND_CHOICES = [
+        ('status', 'Status'),
+        ('day', 'Day'),
+        ('month', 'Month'),
+        ('category', 'Category'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=35)
+    order_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0)
+    
+    def __str__(self):
+        return f"{self.kind} {self.key}"
+    
+    class Meta:
+        db_table = 'sales_aggregate'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_sales_aggregate'),
+        ]
+
+class FacetCount(models.Model):
+    """Products per (category, price bucket, carat bucket), maintained by store.facets"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    price_bucket = models.PositiveSmallIntegerField()
+    carat_bucket = models.PositiveSmallIntegerField()
+    products = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.category_id}/{self.price_bucket}/{self.carat_bucket}: {self.products}"
+    
+    class Meta:
+        db_table = 'facet_count'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'price_bucket', 'carat_bucket'],
+                                    name='unique_facet_count'),
+        ]
+
+class Job(models.Model):
+    """Unit of deferred work run by the run_jobs worker (see store.jobs)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"Job #{self.id} {self.name} ({self.status})"
+    
+    class Meta:
+        db_table = 'job'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_at_idx'),
+        ]
+class CoPurchase(models.Model):
+    """How many customers bought both products, maintained by store.recommendations.
+
+    Every pair is stored in both directions; the product_a == product_b row
+    holds the number of customers who bought the product at all.
+    """
+    product_a = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    product_b = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    customers = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.product_a_id} + {self.product_b_id}: {self.customers}"
+    
+    class Meta:
+        db_table = 'co_purchase'
+        constraints = [
+            models.UniqueConstraint(fields=['product_a', 'product_b'], name='unique_co_purchase'),
+        ]
+
+class ProductNeighbor(models.Model):
+    """Precomputed related product, read by product_detail in rank order"""
+    SOURCE_CHOICES = [
+        ('copurchase', 'Bought together'),
+        ('attributes', 'Similar price and carat'),
+    ]
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbor_of')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    
+    def __str__(self):
+        return f"{self.product_id} #{self.rank}: {self.neighbor_id}"
+    
+    class Meta:
+        db_table = 'product_neighbor'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_product_neighbor_rank'),
+        ]
+
+class RecommendationState(models.Model):
+    """Single row recording how far the last recommendations rebuild got"""
+    last_item_id = models.BigIntegerField(default=0)
+    last_product_id = models.BigIntegerField(default=0)
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Recommendations up to order line #{self.last_item_id}"
+    
+    class Meta:
+        db_table = 'recommendation_state'
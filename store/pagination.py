@@ -0,0 +1,227 @@
+"""Cursor (keyset) pagination for the catalog and admin tables.
+
+Instead of OFFSET, each page seeks past the sort key of the last row it
+showed, so page N costs the same as page 1 when the ordering is backed by
+an index. Cursors are opaque tokens carried in the ``cursor`` query
+parameter, which leaves the other filters in the query string untouched.
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+CURSOR_PARAM = 'cursor'
+CATALOG_PER_PAGE = 48
+ADMIN_PER_PAGE = 50
+
+
+def _serialize(value):
+    # Keep full microsecond precision; a truncated timestamp would skip rows.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, backwards=False):
+    payload = json.dumps({'v': [_serialize(v) for v in values], 'b': backwards},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (values, backwards) for a cursor token, or (None, False) if invalid"""
+    if not token:
+        return None, False
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(data['v']), bool(data['b'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None, False
+
+
+def _is_scalar(value):
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+class Page:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_query = ''
+        self.previous_query = ''
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Paginate a queryset on a unique ordering such as ('-date', '-id')"""
+
+    def __init__(self, queryset, ordering, per_page=ADMIN_PER_PAGE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.fields = [key.lstrip('-') for key in self.ordering]
+        self.per_page = per_page
+
+    def _parse(self, values):
+        """The cursor's values converted for the ordering fields, or None if it is not one of ours"""
+        if values is None or len(values) != len(self.fields):
+            return None
+        # Cursors arrive from the query string: one scalar per field, or forged.
+        if not all(_is_scalar(value) for value in values):
+            return None
+        model = self.queryset.model
+        try:
+            parsed = [model._meta.get_field(name).to_python(value)
+                      for name, value in zip(self.fields, values)]
+        except (ValidationError, ValueError, TypeError):
+            return None
+        return None if None in parsed else parsed
+
+    def _seek(self, values, backwards):
+        # (a, b) after (x, y) is: a > x OR (a = x AND b > y), per sort direction.
+        condition = Q()
+        for i, key in enumerate(self.ordering):
+            descending = key.startswith('-') != backwards
+            clause = Q(**{f'{self.fields[i]}__{"lt" if descending else "gt"}': values[i]})
+            for field, value in zip(self.fields[:i], values[:i]):
+                clause &= Q(**{field: value})
+            condition |= clause
+        # The redundant bound on the leading column (a >= x) lets the planner
+        # range-scan the index instead of walking it from the start for the OR.
+        if len(self.ordering) > 1:
+            descending = self.ordering[0].startswith('-') != backwards
+            condition &= Q(**{f'{self.fields[0]}__{"lte" if descending else "gte"}': values[0]})
+        return condition
+
+    def _reversed_ordering(self):
+        return [key[1:] if key.startswith('-') else f'-{key}' for key in self.ordering]
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _fetch(self, queryset, values, backwards):
+        """Up to per_page + 1 rows past the cursor, in the direction of travel"""
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        queryset = queryset.order_by(*(self._reversed_ordering() if backwards else self.ordering))
+        return list(queryset[:self.per_page + 1])
+
+    def _rows(self, values, backwards):
+        return self._fetch(self.queryset, values, backwards)
+
+    def page(self, cursor=None):
+        values, backwards = decode_cursor(cursor)
+        values = self._parse(values)
+        if values is None:
+            backwards = False
+        rows = self._rows(values, backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        if not rows:
+            return Page(rows)
+        return Page(
+            rows,
+            next_cursor=encode_cursor(self._key(rows[-1])) if has_next else None,
+            previous_cursor=encode_cursor(self._key(rows[0]), backwards=True) if has_previous else None,
+        )
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Keyset pages over several querysets with the same sort fields, such as
+    hot and archived orders.
+
+    Each page seeks into every queryset and merges their first per_page + 1
+    rows, so it costs one indexed query per queryset. The ordering must be
+    unique across all of them.
+    """
+
+    def __init__(self, querysets, ordering, per_page=ADMIN_PER_PAGE):
+        super().__init__(querysets[0], ordering, per_page)
+        self.querysets = querysets
+
+    def _rows(self, values, backwards):
+        rows = [row for queryset in self.querysets for row in self._fetch(queryset, values, backwards)]
+        # Stable sorts from the last key to the first give the combined order.
+        for key in reversed(self._reversed_ordering() if backwards else self.ordering):
+            field = key.lstrip('-')
+            rows.sort(key=lambda row: getattr(row, field), reverse=key.startswith('-'))
+        return rows[:self.per_page + 1]
+
+
+class RankedPaginator:
+    """Paginate queryset rows in the order of a precomputed list of ids.
+
+    Used for search hits, where the rank comes from the search index rather
+    than a column. The cursor holds a position in the ranked list.
+    """
+
+    def __init__(self, queryset, ranked_ids, per_page=CATALOG_PER_PAGE):
+        self.queryset = queryset
+        self.ranked_ids = ranked_ids
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        values, backwards = decode_cursor(cursor)
+        allowed = set(self.queryset.filter(pk__in=self.ranked_ids).values_list('pk', flat=True))
+        ranked = [pk for pk in self.ranked_ids if pk in allowed]
+
+        # A position in the ranked list; anything else starts from the top.
+        valid = (values is not None and len(values) == 1 and _is_scalar(values[0])
+                 and isinstance(values[0], int) and values[0] >= 0)
+        position = values[0] if valid else None
+        if position is None:
+            start, backwards = 0, False
+        elif backwards:
+            start = max(0, position - self.per_page)
+        else:
+            start = position + 1
+        end = min(start + self.per_page, position if backwards else len(ranked))
+        page_ids = ranked[start:end]
+
+        rows = list(self.queryset.filter(pk__in=page_ids))
+        order = {pk: index for index, pk in enumerate(page_ids)}
+        rows.sort(key=lambda obj: order[obj.pk])
+        return Page(
+            rows,
+            next_cursor=encode_cursor([end - 1]) if end < len(ranked) and rows else None,
+            previous_cursor=encode_cursor([start], backwards=True) if start > 0 and rows else None,
+        )
+
+
+def paginate(request, paginator):
+    """Fetch the page named by the request's cursor and build prev/next query strings"""
+    page = paginator.page(request.GET.get(CURSOR_PARAM))
+    params = request.GET.copy()
+    if page.has_next:
+        params[CURSOR_PARAM] = page.next_cursor
+        page.next_query = params.urlencode()
+    if page.has_previous:
+        params[CURSOR_PARAM] = page.previous_cursor
+        page.previous_query = params.urlencode()
+    return page
@@ -0,0 +1,72 @@
+"""Streaming CSV/JSONL readers and writers for the product import/export commands.
+
+Both formats use the columns in FIELDS, with the category given by name.
+Rows are read and written one at a time, so memory use does not grow with
+the size of the file.
+"""
+import csv
+import json
+import os
+import sys
+
+FIELDS = ('id', 'name', 'description', 'price', 'category', 'carat')
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    """Return the explicit format, else the one implied by the file extension"""
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    return open(path, newline='', encoding='utf-8-sig')
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row dict) pairs; malformed JSON lines yield a ValueError"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('expected a JSON object')
+        except ValueError as exc:
+            yield line_number, exc
+            continue
+        yield line_number, row
+
+
+def write_rows(stream, fmt, rows):
+    """Write row tuples in FIELDS order; returns the number written"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False))
+        stream.write('\n')
+        count += 1
+    return count
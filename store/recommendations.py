@@ -0,0 +1,318 @@
+"""Precomputed "related products" for the product detail page.
+
+``rebuild()`` counts how many customers bought each pair of products and
+keeps, for every product, its NEIGHBORS best matches by cosine similarity
+in ProductNeighbor. Products with too little purchase history are topped up
+with the closest products of the same category by price and carat.
+product_detail then reads its related products with one indexed lookup on
+(product, rank).
+
+Pair counts are kept in CoPurchase, so an incremental run only folds in the
+order lines placed since the previous run and recomputes the neighbours of
+the products those lines touched. Each customer contributes at most their first
+MAX_BASKET distinct products, so a few bulk buyers cannot dominate the
+counts or blow up the table.
+
+Incremental runs do not rescore products whose neighbours' popularity
+changed, and they give only newly added products attribute neighbours.
+Run with full=True from time to time (e.g. nightly) to clear that drift.
+
+Each run stops at the newest order line placed more than COMMIT_GRACE ago,
+and the next run starts from there. A line with a lower id may belong to a
+checkout that has not committed yet, and a mark moved past it would skip
+that line for good. Lines are placed in short transactions, so lines older
+than the grace period are safe to count.
+"""
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations
+
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import catalog_cache
+from .models import ArchivedOrderItem, CoPurchase, OrderItem, Product, ProductNeighbor, RecommendationState
+
+NEIGHBORS = 8
+MAX_BASKET = 50
+MIN_SUPPORT = 2
+PRICE_WINDOW = 20
+CARAT_WEIGHT = 0.1
+BATCH_SIZE = 1000
+INSERT_BATCH_SIZE = 10000
+# Lines placed more recently are left for the next run, see the module docstring.
+COMMIT_GRACE = timedelta(minutes=1)
+
+
+# ============= PAIR COUNTING =============
+
+def count_pairs(baskets):
+    """Count unordered pairs over baskets of distinct product ids: {(a, b): n} with a < b"""
+    counts = Counter()
+    for basket in baskets:
+        counts.update(combinations(sorted(basket), 2))
+    return counts
+
+
+def _baskets(rows, baskets=None):
+    """Group (customer_id, product_id) rows, in order line id order, into capped baskets"""
+    baskets = defaultdict(list) if baskets is None else baskets
+    for customer_id, product_id in rows:
+        basket = baskets[customer_id]
+        if len(basket) < MAX_BASKET and product_id not in basket:
+            basket.append(product_id)
+    return baskets
+
+
+# ============= NEIGHBOURS =============
+
+def _catalog_index(category_ids=None):
+    """{product id: (category group, position)}; groups are sorted by price"""
+    products = Product.objects.order_by('category_id', 'price', 'id')
+    if category_ids is not None:
+        products = products.filter(category_id__in=category_ids)
+    groups, positions = defaultdict(list), {}
+    for product_id, category_id, price, carat in products.values_list(
+            'id', 'category_id', 'price', 'carat').iterator(chunk_size=10000):
+        group = groups[category_id]
+        positions[product_id] = (group, len(group))
+        group.append((math.log1p(price), carat, product_id))
+    return positions
+
+
+def _similar(product_id, positions, exclude):
+    """(score, id) of the nearest products in the same category by price and carat"""
+    group, index = positions[product_id]
+    log_price, carat, _ = group[index]
+    candidates = []
+    for other_price, other_carat, other_id in group[max(index - PRICE_WINDOW, 0):index + PRICE_WINDOW + 1]:
+        if other_id != product_id and other_id not in exclude:
+            distance = abs(other_price - log_price) + CARAT_WEIGHT * abs(other_carat - carat)
+            candidates.append((1 / (1 + distance), other_id))
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+    return candidates
+
+
+def _neighbor_rows(product_ids, links, buyers, positions):
+    """NEIGHBOR_COLUMNS rows for product_ids from {a: {b: customers}} and {id: buyers}"""
+    rows = []
+    for product_id in product_ids:
+        scored = sorted(
+            ((count / math.sqrt(buyers[product_id] * buyers[other]), other)
+             for other, count in links.get(product_id, {}).items() if count >= MIN_SUPPORT),
+            key=lambda candidate: (-candidate[0], candidate[1]),
+        )[:NEIGHBORS]
+        chosen = [(score, other, 'copurchase') for score, other in scored]
+        if len(chosen) < NEIGHBORS and product_id in positions:
+            exclude = {other for _, other in scored}
+            chosen += [(score, other, 'attributes') for score, other in
+                       _similar(product_id, positions, exclude)[:NEIGHBORS - len(chosen)]]
+        rows += [(product_id, other, rank, score, source)
+                 for rank, (score, other, source) in enumerate(chosen)]
+    return rows
+
+
+def _stored_links(product_ids):
+    """Read the {a: {b: customers}} links and buyer counts of product_ids from CoPurchase"""
+    links, buyers = defaultdict(dict), {}
+    rows = CoPurchase.objects.filter(product_a__in=product_ids).values_list(
+        'product_a', 'product_b', 'customers')
+    for product_a, product_b, customers in rows:
+        if product_a == product_b:
+            buyers[product_a] = customers
+        else:
+            links[product_a][product_b] = customers
+    others = {other for targets in links.values() for other, count in targets.items()
+              if count >= MIN_SUPPORT and other not in buyers}
+    others = list(others)
+    for offset in range(0, len(others), BATCH_SIZE):
+        buyers.update(CoPurchase.objects.filter(
+            product_a__in=others[offset:offset + BATCH_SIZE], product_b=F('product_a'),
+        ).values_list('product_a', 'customers'))
+    return links, buyers
+
+
+# ============= REBUILD =============
+
+CO_PURCHASE_COLUMNS = ('product_a_id', 'product_b_id', 'customers')
+NEIGHBOR_COLUMNS = ('product_id', 'neighbor_id', 'rank', 'score', 'source')
+
+
+def _insert(model, columns, rows):
+    # A plain executemany() INSERT: the rows are already database values, and
+    # bulk_create() would spend far longer building model instances and SQL
+    # than the database spends writing them.
+    quote = connection.ops.quote_name
+    sql = (f'INSERT INTO {quote(model._meta.db_table)} '
+           f'({", ".join(quote(model._meta.get_field(name).column) for name in columns)}) '
+           f'VALUES ({", ".join(["%s"] * len(columns))})')
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), INSERT_BATCH_SIZE):
+            cursor.executemany(sql, rows[offset:offset + INSERT_BATCH_SIZE])
+
+
+def _state():
+    state, _ = RecommendationState.objects.select_for_update().get_or_create(pk=1)
+    return state
+
+
+def _purchases(**filters):
+    """(id, customer_id, product_id) of hot and archived order lines, in id order"""
+    columns = ('id', 'order__customer_id', 'product_id')
+    return OrderItem.objects.filter(**filters).order_by().values_list(*columns).union(
+        ArchivedOrderItem.objects.filter(**filters).order_by().values_list(*columns), all=True,
+    ).order_by('id')
+
+
+def _settled_item_id(after=0):
+    """The highest order line id up to which every line has committed.
+
+    Ids are handed out in time order, so every line up to the newest one
+    placed before the cutoff was inserted before it too, and its transaction
+    has committed unless it has been open for longer than COMMIT_GRACE.
+    """
+    cutoff = timezone.now() - COMMIT_GRACE
+    return max([after] + [
+        model.objects.filter(id__gt=after, order__date__lt=cutoff).aggregate(last=Max('id'))['last'] or 0
+        for model in (OrderItem, ArchivedOrderItem)
+    ])
+
+
+def _full_rebuild(state):
+    last_item_id = _settled_item_id()
+    last_product_id = Product.objects.aggregate(last=Max('id'))['last'] or 0
+    lines = _purchases(id__lte=last_item_id)
+    baskets = list(_baskets((customer_id, product_id) for _, customer_id, product_id
+                            in lines.iterator(chunk_size=10000)).values())
+
+    pairs = count_pairs(baskets)
+    buyers = Counter(product_id for basket in baskets for product_id in basket)
+    links = defaultdict(dict)
+    for (product_a, product_b), count in pairs.items():
+        links[product_a][product_b] = links[product_b][product_a] = count
+
+    co_purchases = [(product_id, product_id, count) for product_id, count in buyers.items()]
+    for (product_a, product_b), count in pairs.items():
+        co_purchases += [(product_a, product_b, count), (product_b, product_a, count)]
+    positions = _catalog_index()
+    neighbors = _neighbor_rows(list(positions), links, buyers, positions)
+
+    CoPurchase.objects.all().delete()
+    ProductNeighbor.objects.all().delete()
+    _insert(CoPurchase, CO_PURCHASE_COLUMNS, co_purchases)
+    _insert(ProductNeighbor, NEIGHBOR_COLUMNS, neighbors)
+    state.last_item_id, state.last_product_id = last_item_id, last_product_id
+    return {'lines': lines.count(), 'pairs': len(pairs), 'products': len(positions)}
+
+
+def _increments(state, last_item_id):
+    """Pair and buyer count increments from the order lines after the last run's, up to last_item_id"""
+    new_lines = list(_purchases(id__gt=state.last_item_id, id__lte=last_item_id))
+    if not new_lines:
+        return new_lines, Counter(), Counter()
+    customer_ids = {customer_id for _, customer_id, _ in new_lines}
+    previous = _baskets((customer_id, product_id) for _, customer_id, product_id in _purchases(
+        id__lte=state.last_item_id, order__customer_id__in=customer_ids,
+    ).iterator(chunk_size=10000))
+    before = {customer_id: list(previous[customer_id]) for customer_id in customer_ids}
+    after = _baskets(((customer_id, product_id) for _, customer_id, product_id in new_lines),
+                     previous)
+
+    pairs, buyers = Counter(), Counter()
+    for customer_id, old in before.items():
+        added = after[customer_id][len(old):]
+        buyers.update(added)
+        pairs.update(count_pairs([added]))
+        pairs.update(tuple(sorted(pair)) for pair in
+                     ((new, existing) for new in added for existing in old))
+    return new_lines, pairs, buyers
+
+
+def _apply_increments(pairs, buyers):
+    """Add the increments to CoPurchase; returns the ids of the products touched"""
+    deltas = defaultdict(dict)
+    for product_id, count in buyers.items():
+        deltas[product_id][product_id] = count
+    for (product_a, product_b), count in pairs.items():
+        deltas[product_a][product_b] = deltas[product_b][product_a] = count
+
+    touched = list(deltas)
+    updates, inserts = [], []
+    for offset in range(0, len(touched), BATCH_SIZE):
+        batch = touched[offset:offset + BATCH_SIZE]
+        existing = {(product_a, product_b): row_id for row_id, product_a, product_b in
+                    CoPurchase.objects.filter(product_a__in=batch).values_list(
+                        'id', 'product_a', 'product_b')}
+        for product_a in batch:
+            for product_b, count in deltas[product_a].items():
+                row_id = existing.get((product_a, product_b))
+                if row_id is None:
+                    inserts.append((product_a, product_b, count))
+                else:
+                    updates.append((count, row_id))
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(CoPurchase._meta.db_table)} SET {quote("customers")} = {quote("customers")} + %s '
+            f'WHERE {quote(CoPurchase._meta.pk.column)} = %s', updates)
+    _insert(CoPurchase, CO_PURCHASE_COLUMNS, inserts)
+    return touched
+
+
+def _incremental_rebuild(state):
+    last_item_id = _settled_item_id(state.last_item_id)
+    new_lines, pairs, buyers = _increments(state, last_item_id)
+    touched = set(_apply_increments(pairs, buyers))
+    new_products = set(Product.objects.filter(id__gt=state.last_product_id).values_list('id', flat=True))
+    touched = list(touched | new_products)
+
+    if touched:
+        category_ids = set(Product.objects.filter(id__in=touched).values_list('category_id', flat=True))
+        positions = _catalog_index(category_ids)
+        for offset in range(0, len(touched), BATCH_SIZE):
+            batch = touched[offset:offset + BATCH_SIZE]
+            links, counts = _stored_links(batch)
+            ProductNeighbor.objects.filter(product_id__in=batch).delete()
+            _insert(ProductNeighbor, NEIGHBOR_COLUMNS, _neighbor_rows(batch, links, counts, positions))
+    state.last_item_id = last_item_id
+    if new_products:
+        state.last_product_id = max(new_products)
+    return {'lines': len(new_lines), 'pairs': len(pairs), 'products': len(touched)}
+
+
+def rebuild(full=False):
+    """Bring the neighbour table up to date; returns counts of what was processed.
+
+    The first run, and any run with full=True, recomputes everything from
+    the order history; later runs only process order lines and products added
+    since the previous one.
+    """
+    with transaction.atomic():
+        state = _state()
+        full = full or state.rebuilt_at is None
+        if full:
+            stats = _full_rebuild(state)
+        else:
+            stats = _incremental_rebuild(state)
+        state.rebuilt_at = timezone.now()
+        state.save()
+        if stats['products']:
+            catalog_cache.bump(catalog_cache.PRODUCTS)
+    return dict(stats, full=full)
+
+
+def related_products(product, limit=4):
+    """The product's precomputed neighbours, falling back to others in its category"""
+    products = Product.objects.for_listing().filter(
+        neighbor_of__product_id=product.pk
+    ).order_by('neighbor_of__rank')[:limit]
+    products = list(products)
+    if not products:
+        # Products added since the last rebuild have no neighbours yet.
+        products = list(Product.objects.for_listing().filter(
+            category_id=product.category_id
+        ).exclude(pk=product.pk)[:limit])
+    return products
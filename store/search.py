@@ -0,0 +1,315 @@
+"""Product search index.
+
+On SQLite builds with FTS5 the index is a virtual table ranked with bm25().
+Other databases fall back to an in-process inverted index over the same
+columns. Both support prefix matching on every query term and are kept
+current by the signal handlers in store/signals.py.
+"""
+import re
+import threading
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Category, Product
+
+FTS_TABLE = 'product_search'
+
+# Upper bound on ranked hits, counted after the listing's filters; results
+# past this point are not useful to browse.
+RESULT_LIMIT = 500
+
+# Column weights, in (name, description, category) order.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+CATEGORY_WEIGHT = 5.0
+
+VERSION_KEY = 'search:index-version'
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class FTS5Index:
+    """Search index stored in an SQLite FTS5 table keyed by product id"""
+
+    def __init__(self):
+        self._ready = set()
+
+    def ensure(self):
+        db_name = str(connection.settings_dict['NAME'])
+        if db_name in self._ready:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE]
+            )
+            created = cursor.fetchone() is None
+            if created:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    "name, description, category, "
+                    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                )
+        # Only once committed: a CREATE rolled back with its transaction
+        # must be repeated.
+        transaction.on_commit(lambda: self._ready.add(db_name))
+        if created:
+            self.rebuild()
+
+    def rebuild(self):
+        self.ensure()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, category) "
+                f"SELECT p.id, p.name, p.description, c.name "
+                f"FROM {Product._meta.db_table} p "
+                f"JOIN {Category._meta.db_table} c ON c.id = p.category_id"
+            )
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            return cursor.fetchone()[0]
+
+    def add(self, product):
+        self.ensure()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, category) "
+                "VALUES (%s, %s, %s, %s)",
+                [product.pk, product.name, product.description, product.category.name]
+            )
+
+    def remove(self, product_id):
+        self.ensure()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def rename_category(self, category):
+        self.ensure()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET category = %s WHERE rowid IN "
+                f"(SELECT id FROM {Product._meta.db_table} WHERE category_id = %s)",
+                [category.name, category.pk]
+            )
+
+    def _match(self, tokens):
+        # Every term is quoted (tokens are \w+ only) and matched as a prefix.
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, tokens, limit, queryset=None):
+        self.ensure()
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params = [self._match(tokens)]
+        if queryset is not None:
+            subquery, subquery_params = queryset.order_by().values('pk').query.sql_with_params()
+            # The unary + keeps the IN out of FTS5's index constraints; FTS5
+            # would otherwise run the MATCH once per listed id.
+            sql += f" AND +rowid IN ({subquery})"
+            params.extend(subquery_params)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{sql} ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s",
+                params + [NAME_WEIGHT, DESCRIPTION_WEIGHT, CATEGORY_WEIGHT, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matches(self, tokens):
+        """Subquery selecting the id of every match, for a pk__in filter"""
+        self.ensure()
+        return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                      [self._match(tokens)])
+
+
+class PythonIndex:
+    """In-process inverted index used when FTS5 is not available.
+
+    Each process keeps its own copy. Once a write commits it stores a new
+    random version token in the cache, and every process, the writer
+    included, rebuilds its copy when it next sees a token other than the one
+    it built at. Tokens rather than a counter, so no cache needs an atomic
+    incr for two concurrent writes to both be noticed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._vocabulary = []
+        self._version = None
+
+    def _index_document(self, product_id, name, description, category):
+        tokens = {}
+        for weight, text in ((NAME_WEIGHT, name), (DESCRIPTION_WEIGHT, description),
+                             (CATEGORY_WEIGHT, category)):
+            for token in tokenize(text):
+                tokens[token] = tokens.get(token, 0) + weight
+        for token, weight in tokens.items():
+            self._postings[token][product_id] = weight
+        self._documents[product_id] = tuple(tokens)
+
+    def _changed(self):
+        """Called on commit of a write: every copy, this one too, is out of date"""
+        with self._lock:
+            cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            self._version = None
+
+    def _sync(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(VERSION_KEY, version, timeout=None):
+                version = cache.get(VERSION_KEY)
+        if self._version != version:
+            # Read the token first: a write committing during the build
+            # changes it again, so the next search rebuilds once more.
+            self._build()
+            self._version = version
+
+    def _build(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        rows = Product.objects.values_list('id', 'name', 'description', 'category__name')
+        for row in rows.iterator(chunk_size=2000):
+            self._index_document(*row)
+        self._vocabulary = sorted(self._postings)
+        return len(self._documents)
+
+    def rebuild(self):
+        with self._lock:
+            count = self._build()
+        transaction.on_commit(self._changed)
+        return count
+
+    # Writes only mark the copies stale once committed, so no process
+    # rebuilds from rows that may still roll back. The rebuild is one scan
+    # of the product table (about 250 ms at 20,000 products), and catalog
+    # writes are rare.
+
+    def add(self, product):
+        transaction.on_commit(self._changed)
+
+    def remove(self, product_id):
+        transaction.on_commit(self._changed)
+
+    def rename_category(self, category):
+        transaction.on_commit(self._changed)
+
+    def _expand(self, prefix):
+        start = bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def _rank(self, tokens):
+        with self._lock:
+            self._sync()
+            scores = None
+            for term in tokens:
+                term_scores = {}
+                for token in self._expand(term):
+                    # Exact word hits outrank prefix-only hits.
+                    boost = 2.0 if token == term else 1.0
+                    for product_id, weight in self._postings[token].items():
+                        term_scores[product_id] = term_scores.get(product_id, 0) + weight * boost
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pid: score + term_scores[pid]
+                              for pid, score in scores.items() if pid in term_scores}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return [product_id for product_id, _ in ranked]
+
+    def search(self, tokens, limit, queryset=None):
+        ranked = self._rank(tokens)
+        if queryset is not None and ranked:
+            allowed = set(queryset.filter(pk__in=ranked).values_list('pk', flat=True))
+            ranked = [product_id for product_id in ranked if product_id in allowed]
+        return ranked[:limit]
+
+    def matches(self, tokens):
+        return self._rank(tokens)
+
+
+_fts5_index = FTS5Index()
+_python_index = PythonIndex()
+
+
+def _fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+_backend_cache = {}
+
+
+def get_index():
+    """Return the search index implementation for the default database"""
+    vendor = connection.vendor
+    if vendor not in _backend_cache:
+        _backend_cache[vendor] = _fts5_index if _fts5_available() else _python_index
+    return _backend_cache[vendor]
+
+
+def rebuild_index():
+    """Re-index every product; returns the number of indexed products"""
+    return get_index().rebuild()
+
+
+def index_product(product):
+    get_index().add(product)
+
+
+def remove_product(product_id):
+    get_index().remove(product_id)
+
+
+def reindex_category(category):
+    get_index().rename_category(category)
+
+
+def search_product_ids(query, limit=RESULT_LIMIT, queryset=None):
+    """Return ids of products matching every term in query, best match first.
+
+    With a queryset only its rows are ranked, so its filters apply before
+    the limit rather than to the limited hits.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    return get_index().search(tokens, limit, queryset)
+
+
+def filter_matches(queryset, query):
+    """The rows of queryset that match every term in query, unranked and unlimited"""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+    return queryset.filter(pk__in=get_index().matches(tokens))
+
+
+def search_products(queryset, query, limit=RESULT_LIMIT):
+    """Return the products in queryset that match query, best match first"""
+    ids = search_product_ids(query, limit, queryset)
+    if not ids:
+        return []
+    position = {pk: index for index, pk in enumerate(ids)}
+    products = list(queryset.filter(pk__in=ids))
+    products.sort(key=lambda product: position[product.pk])
+    return products
@@ -0,0 +1,151 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from . import aggregates, jobs
+from .models import Admin, Cart, Customer, Order, OrderItem, Payment
+
+# ============= ADMIN ROLE =============
+
+# Short, because a revocation can miss a cache entry: a per-process cache
+# only hears of it in the process that made it, and a queryset delete of
+# Admin rows sends no signal. Within a minute the role is read again.
+ADMIN_ROLE_TIMEOUT = 60
+
+def admin_role_key(user_id):
+    return f'admin_role:{user_id}'
+
+def is_admin(user):
+    """Whether user has an Admin row; cached per user for a minute and memoized on the user object"""
+    if not user.is_authenticated:
+        return False
+    try:
+        return user._store_is_admin
+    except AttributeError:
+        pass
+    key = admin_role_key(user.pk)
+    result = cache.get(key)
+    if result is None:
+        result = Admin.objects.filter(user_id=user.pk).exists()
+        cache.set(key, result, ADMIN_ROLE_TIMEOUT)
+    user._store_is_admin = result
+    return result
+
+def invalidate_admin_role(user_id):
+    """Drop the cached role now and again once the Admin write commits"""
+    key = admin_role_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+# ============= CART =============
+
+CART_COUNT_TIMEOUT = 60 * 60 * 24
+
+def cart_count_key(user_id):
+    return f'cart_count:{user_id}'
+
+def get_cart_count(user):
+    """Total quantity in the user's cart, cached per user"""
+    key = cart_count_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Cart.objects.filter(customer__user=user).aggregate(
+            total=Sum('quantity')
+        )['total'] or 0
+        cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
+
+def add_cart_item(customer, product, quantity=1):
+    """Add quantity of product to the customer's cart without losing concurrent clicks.
+
+    An existing row is bumped with a single UPDATE ... SET quantity = quantity + n.
+    Otherwise the row is inserted, and if a concurrent request won that race
+    the unique constraint rejects our insert and we fall back to the update.
+    """
+    cart_items = Cart.objects.filter(customer=customer, product=product)
+    if not cart_items.update(quantity=F('quantity') + quantity):
+        try:
+            with transaction.atomic():
+                Cart.objects.create(customer=customer, product=product, quantity=quantity)
+        except IntegrityError:
+            cart_items.update(quantity=F('quantity') + quantity)
+    # update() sends no signals, so the Cart receivers don't see the bump
+    invalidate_cart_count(customer.user_id)
+
+def invalidate_cart_count(user_id):
+    """Drop the cached count now and again once the cart write commits.
+
+    The second delete covers a concurrent request that re-populated the
+    entry from the database before this transaction was visible.
+    """
+    key = cart_count_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+# ============= CUSTOMERS =============
+
+CUSTOMER_COUNT_KEY = 'customer_count'
+CUSTOMER_COUNT_TIMEOUT = 60 * 5
+
+def get_customer_count():
+    """Number of customers, cached until one is added or removed"""
+    count = cache.get(CUSTOMER_COUNT_KEY)
+    if count is None:
+        count = Customer.objects.count()
+        cache.set(CUSTOMER_COUNT_KEY, count, CUSTOMER_COUNT_TIMEOUT)
+    return count
+
+def invalidate_customer_count():
+    """Drop the cached count now and again once the customer write commits"""
+    cache.delete(CUSTOMER_COUNT_KEY)
+    transaction.on_commit(lambda: cache.delete(CUSTOMER_COUNT_KEY))
+
+# ============= ORDERS =============
+
+class EmptyCartError(Exception):
+    pass
+
+def place_order(customer, address, payment_type):
+    """Turn the customer's cart into one order with a line per cart row, in one transaction.
+
+    The cart rows are locked for the duration, products come in with the
+    cart in a single query, and the lines are written with one bulk insert.
+    Returns the created order.
+    """
+    with transaction.atomic():
+        cart_items = list(
+            Cart.objects.select_for_update(of=('self',))
+            .filter(customer=customer)
+            .select_related('product')
+        )
+        if not cart_items:
+            raise EmptyCartError
+        
+        items = [
+            OrderItem(product=item.product, price=item.product.price, quantity=item.quantity)
+            for item in cart_items
+        ]
+        order = Order.objects.create(
+            customer=customer,
+            name=customer.name,
+            address=address,
+            total=sum(item.get_total() for item in items),
+            status='Pending'
+        )
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        Payment.objects.create(order=order, payment_type=payment_type)
+        Cart.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+        aggregates.record_order(order, items)
+        jobs.enqueue('notify_order_placed', order_ids=[order.pk])
+    return order
+
+def update_order_status(order, new_status):
+    """Change an order's status; the Order signals move its totals to the new status bucket"""
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        locked.status = new_status
+        locked.save(update_fields=['status'])
+    order.status = new_status
+    return order
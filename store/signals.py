@@ -0,0 +1,162 @@
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, catalog_cache, conditional, facets, search, services
+from .models import (
+    Admin, ArchivedOrder, ArchivedOrderItem, Cart, Category, Customer, Order, OrderItem, Product,
+    ProductImage,
+)
+
+# ============= SEARCH INDEX =============
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Keep the search index entry in step with the product row"""
+    search.index_product(instance)
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    """Category names are indexed with each product, so renames must propagate"""
+    if not created:
+        search.reindex_category(instance)
+
+# ============= SALES AGGREGATES =============
+# Orders and lines also go through cascades. Their customer's or product's
+# pre_delete takes all of them out of the totals at once, so the per-order
+# and per-line receivers act only when delete() was called on them.
+
+def _deleted_directly(sender, origin):
+    """Whether delete() was called on sender's rows rather than reaching them by cascade"""
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is sender
+
+@receiver(pre_delete, sender=Customer)
+def unrecord_customer_orders(sender, instance, **kwargs):
+    aggregates.record_deleted_customer(instance)
+
+@receiver(pre_delete, sender=Product)
+def unrecord_product_lines(sender, instance, **kwargs):
+    aggregates.record_deleted_product(instance)
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=ArchivedOrder)
+def remember_order_status(sender, instance, update_fields=None, **kwargs):
+    """Note the stored status, so post_save can move the order's totals"""
+    old = None
+    if instance.pk and (update_fields is None or 'status' in update_fields):
+        old = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    instance._stored_status = old
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=ArchivedOrder)
+def move_order_totals(sender, instance, created, **kwargs):
+    """New orders are recorded with their lines by services.place_order"""
+    old = getattr(instance, '_stored_status', None)
+    if not created and old is not None:
+        aggregates.record_status_change(instance, old)
+
+@receiver(pre_delete, sender=Order)
+@receiver(pre_delete, sender=ArchivedOrder)
+def unrecord_order(sender, instance, origin=None, **kwargs):
+    """Before the delete, while the order's lines can still be read"""
+    if _deleted_directly(sender, origin):
+        aggregates.record_deleted_order(instance)
+
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=ArchivedOrderItem)
+def unrecord_order_item(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(sender, origin):
+        order = instance.order
+        aggregates.record_deleted_item(order, instance)
+        type(order).objects.filter(pk=order.pk).update(total=F('total') - instance.get_total())
+
+# ============= CART COUNT =============
+# A deleted product or customer clears the count of every cart it empties
+# up front, so the per-row receivers skip cascades.
+
+@receiver(pre_delete, sender=Product)
+def invalidate_product_cart_counts(sender, instance, **kwargs):
+    holders = Cart.objects.filter(product=instance).values_list('customer__user_id', flat=True)
+    for user_id in set(holders):
+        services.invalidate_cart_count(user_id)
+
+@receiver(pre_delete, sender=Customer)
+def invalidate_customer_cart_count(sender, instance, **kwargs):
+    services.invalidate_cart_count(instance.user_id)
+
+@receiver(post_save, sender=Cart)
+def invalidate_saved_cart_count(sender, instance, **kwargs):
+    services.invalidate_cart_count(instance.customer.user_id)
+
+@receiver(post_delete, sender=Cart)
+def invalidate_deleted_cart_count(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(sender, origin):
+        services.invalidate_cart_count(instance.customer.user_id)
+
+# ============= FACET COUNTS =============
+
+@receiver(pre_save, sender=Product)
+def remember_facet_cell(sender, instance, **kwargs):
+    """Note which cell the stored row is in, so post_save can move it"""
+    old = None
+    if instance.pk:
+        old = Product.objects.filter(pk=instance.pk).values_list('category_id', 'price', 'carat').first()
+    instance._facet_cell = facets.cell(*old) if old else None
+
+@receiver(post_save, sender=Product)
+def count_product_facets(sender, instance, **kwargs):
+    old = getattr(instance, '_facet_cell', None)
+    new = facets.cell(instance.category_id, instance.price, instance.carat)
+    if old != new:
+        if old:
+            facets.record(old, -1)
+        facets.record(new, 1)
+
+@receiver(post_delete, sender=Product)
+def uncount_product_facets(sender, instance, **kwargs):
+    facets.record(facets.cell(instance.category_id, instance.price, instance.carat), -1)
+
+# ============= CONDITIONAL GET =============
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def touch_image_product(sender, instance, **kwargs):
+    """Product pages show their images, so image changes count as product changes"""
+    conditional.touch_products([instance.product_id])
+
+@receiver(post_delete, sender=Product)
+def touch_product_category(sender, instance, **kwargs):
+    """A deleted product leaves no updated_at behind, so stamp its category instead"""
+    conditional.touch_category(instance.category_id)
+
+# ============= CATALOG CACHE =============
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_fragments(sender, **kwargs):
+    catalog_cache.bump(catalog_cache.PRODUCTS)
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_fragments(sender, **kwargs):
+    # Product cards show the category name too.
+    catalog_cache.bump(catalog_cache.CATEGORIES, catalog_cache.PRODUCTS)
+
+# ============= DASHBOARD COUNTS =============
+
+@receiver(post_save, sender=Customer)
+def count_new_customer(sender, instance, created, **kwargs):
+    if created:
+        services.invalidate_customer_count()
+
+@receiver(post_delete, sender=Customer)
+def uncount_customer(sender, instance, **kwargs):
+    services.invalidate_customer_count()
+
+# ============= ADMIN ROLE =============
+
+@receiver([post_save, post_delete], sender=Admin)
+def invalidate_admin_role(sender, instance, **kwargs):
+    services.invalidate_admin_role(instance.user_id)
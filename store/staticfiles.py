@@ -0,0 +1,120 @@
+"""Hashed, precompressed static files.
+
+CompressedManifestStaticFilesStorage is Django's manifest storage (content
+hashes in every file name, e.g. css/site.3f2a9c1b8d4e.css) that also writes
+a .gz copy of each compressible file, plus a .br copy when the optional
+brotli package is installed. The work happens once, at collectstatic time.
+
+StaticFileIndex maps URLs under STATIC_URL to the collected files and their
+compressed variants. store.middleware.StaticFilesMiddleware uses it to serve
+them from the app process.
+"""
+import gzip
+import json
+import mimetypes
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico')
+# Below this size the saving does not pay for the extra header bytes.
+MIN_COMPRESS_SIZE = 256
+# (encoding, file suffix), in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _compressors():
+    compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, ('.br', lambda data: brotli.compress(data, quality=11)))
+    return compressors
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that writes .gz (and .br) variants of the hashed files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            # Not worth a variant unless it saves at least 5%.
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, 'wb') as handle:
+                    handle.write(compressed)
+
+
+class StaticFile:
+    """One collected file: its path, type and compressed variants"""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {encoding: path + suffix for encoding, suffix in ENCODINGS
+                         if os.path.isfile(path + suffix)}
+
+
+class StaticFileIndex:
+    """Every file under root keyed by URL, built once when the process starts.
+
+    Files whose names appear as hashed names in the staticfiles manifest
+    are immutable: their content can never change under that URL.
+    """
+
+    def __init__(self, root, url, manifest_name='staticfiles.json'):
+        self.files = {}
+        root = str(root)
+        hashed = set()
+        try:
+            with open(os.path.join(root, manifest_name)) as handle:
+                hashed = set(json.load(handle).get('paths', {}).values())
+        except (OSError, ValueError):
+            pass
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(suffixes) or filename == manifest_name:
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                self.files[url + name] = StaticFile(path, name in hashed)
+
+    def __len__(self):
+        return len(self.files)
+
+    def get(self, path):
+        return self.files.get(path)
+
+
+def accepted_encodings(header):
+    """Content codings the Accept-Encoding header allows (q > 0)"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
@@ -0,0 +1,36 @@
+"""Job handlers; imported from StoreConfig.ready() so every process knows them."""
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .images import process_product_image
+from .jobs import register
+from .models import OrderItem, ProductImage
+
+
+@register('generate_image_derivatives')
+def generate_image_derivatives(image_id):
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None:
+        return  # deleted before the job ran
+    if not process_product_image(image):
+        raise RuntimeError(f'Could not generate derivatives for image {image_id}')
+
+
+@register('notify_order_placed')
+def notify_order_placed(order_ids):
+    items = list(OrderItem.objects.filter(order_id__in=order_ids).select_related('order__customer', 'product').order_by('id'))
+    if not items:
+        return
+    customer = items[0].order.customer
+    lines = '\n'.join(
+        f'  {item.product.name} x {item.quantity} - Rs. {item.get_total():.2f}' for item in items
+    )
+    total = sum(item.get_total() for item in items)
+    send_mail(
+        'Your Diamond Aura order has been placed',
+        f'Dear {customer.name},\n\nThank you for shopping with Diamond Aura. '
+        f'We have received your order:\n\n{lines}\n\nTotal: Rs. {total:.2f}\n\n'
+        f'We will contact you soon about delivery.\n',
+        settings.DEFAULT_FROM_EMAIL,
+        [customer.email],
+    )
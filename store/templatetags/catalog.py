@@ -0,0 +1,73 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from store import catalog_cache, images
+
+register = template.Library()
+
+
+class CatalogCacheNode(template.Node):
+    def __init__(self, nodelist, name, namespaces, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.namespaces = namespaces
+        self.vary_on = vary_on
+
+    def render(self, context):
+        return catalog_cache.get_or_render(
+            self.name.resolve(context),
+            self.namespaces.resolve(context).split(),
+            [var.resolve(context) for var in self.vary_on],
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag('catalog_cache')
+def do_catalog_cache(parser, token):
+    """Cache a fragment until one of its namespaces changes.
+
+    Usage::
+
+        {% catalog_cache "product_cards" "products categories" request.GET.urlencode %}
+            ...
+        {% endcatalog_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires a fragment name and its namespaces."
+        )
+    nodelist = parser.parse(('endcatalog_cache',))
+    parser.delete_first_token()
+    return CatalogCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
+
+
+@register.simple_tag
+def responsive_image(name, ready, size='card', sizes='100vw', alt='', css_class='', style='',
+                     loading='lazy'):
+    """<picture> with WebP and JPEG srcsets for a stored product image.
+
+    Falls back to the original upload while derivatives are not ready yet.
+    """
+    if not name:
+        return ''
+    if not ready:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="{}">',
+            default_storage.url(name), css_class, alt, style, loading
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="{}">'
+        '</picture>',
+        images.srcset(name, 'webp'), sizes,
+        default_storage.url(images.derivative_name(name, size, 'jpg')),
+        images.srcset(name, 'jpg'), sizes, css_class, alt, style, loading
+    )
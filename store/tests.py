@@ -0,0 +1,1152 @@
+import csv
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from io import BytesIO, StringIO
+from urllib.parse import urlencode
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .models import (
+    Admin, ArchivedOrder, ArchivedOrderItem, Cart, Category, Complaint, CoPurchase, Customer, Feedback,
+    Job, Order, OrderItem, Payment, Product, ProductImage, ProductNeighbor, SalesAggregate,
+)
+from . import (
+    admin_views, async_views, aggregates, archive, catalog_cache, exports, facets, images, jobs, metrics,
+    recommendations, search, services, views,
+)
+from .conditional import list_stamps_query, product_stamps_query
+from .middleware import RequestMetricsMiddleware
+from .pagination import CURSOR_PARAM, KeysetPaginator, encode_cursor
+from .services import add_cart_item
+
+# Each test gets empty per-process caches, whatever CACHE_BACKEND the
+# settings name, so no fragment or role cached by another run leaks in.
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in settings.CACHES
+}
+# Templates link plain file names; the manifest only exists after collectstatic.
+TEST_STORAGES = dict(settings.STORAGES, staticfiles={
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+})
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+class StoreTestCase(TestCase):
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+
+def seed_catalog(size, images=2):
+    """size products spread over four categories, each with `images` images"""
+    categories = [Category.objects.get_or_create(name=f'Category {i}')[0] for i in range(4)]
+    products = Product.objects.bulk_create([
+        Product(name=f'Ring {i}', description='solitaire diamond ring', price=1000 + i,
+                category=categories[i % len(categories)], carat=1)
+        for i in range(size)
+    ])
+    ProductImage.objects.bulk_create([
+        ProductImage(product=product, image_path=f'products/{product.pk}-{n}.jpg')
+        for product in products for n in range(images)
+    ])
+    return products
+
+
+def create_customer(username):
+    user = User.objects.create_user(username, password=username)
+    return Customer.objects.create(user=user, name=username.title(), email=f'{username}@example.com',
+                                   phone='9999999999', address='Surat')
+
+
+def login_admin(client, username='manager'):
+    user = User.objects.create_user(username, password=username)
+    Admin.objects.create(user=user, email=f'{username}@example.com', number='9999999999', address='Surat')
+    client.force_login(user)
+    return user
+
+
+def create_orders(customer, count, status='Pending'):
+    """count orders, in runs of seven sharing a timestamp so the paginators must break ties on id"""
+    now = timezone.now()
+    orders = Order.objects.bulk_create([
+        Order(customer=customer, name=customer.name, address='Surat', status=status)
+        for _ in range(count)
+    ])
+    for i, order in enumerate(orders):
+        order.date = now - timedelta(hours=i // 7)
+    Order.objects.bulk_update(orders, ['date'])
+    return orders
+
+
+# ============= CATALOG QUERIES =============
+
+class CatalogQueryCountTests(StoreTestCase):
+    """The catalog pages cost a fixed number of queries, whatever the catalog size"""
+
+    def assertPageQueries(self, url, cold, warm):
+        for size in (8, 48):
+            Product.objects.all().delete()
+            seed_catalog(size)
+            # bulk_create sends no signals, so nothing has invalidated the fragments.
+            caches['catalog'].clear()
+            with self.subTest(products=size):
+                with self.assertNumQueries(cold):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                with self.assertNumQueries(warm):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_home(self):
+        self.assertPageQueries(reverse('home'), cold=2, warm=0)
+
+    def test_product_list(self):
+        self.assertPageQueries(reverse('product_list'), cold=4, warm=1)
+
+
+class CatalogCacheTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        catalog_cache.reset_stats()
+        self.addCleanup(catalog_cache.reset_stats)
+
+    def test_every_bump_moves_the_version(self):
+        seen = set(catalog_cache.get_versions([catalog_cache.PRODUCTS]))
+        for _ in range(5):
+            catalog_cache.bump(catalog_cache.PRODUCTS)
+            seen.update(catalog_cache.get_versions([catalog_cache.PRODUCTS]))
+        self.assertEqual(len(seen), 6)
+
+    def test_hits_are_counted_without_writing_to_the_cache(self):
+        render = mock.Mock(return_value='<nav></nav>')
+        fragment = ('category_nav', [catalog_cache.CATEGORIES], [])
+        catalog_cache.get_or_render(*fragment, render)
+        with mock.patch.object(caches['catalog'], 'set') as cache_set, \
+                mock.patch.object(caches['catalog'], 'incr') as cache_incr:
+            self.assertEqual(catalog_cache.get_or_render(*fragment, render), '<nav></nav>')
+        cache_set.assert_not_called()
+        cache_incr.assert_not_called()
+        render.assert_called_once()
+        self.assertEqual(catalog_cache.stats()['category_nav'],
+                         {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+
+class AsyncCatalogViewTests(StoreTestCase):
+    """store.async_views serve the same pages as store.views, at the same query cost.
+
+    urls.py picks one set of views at import time, so both are called directly.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.product = seed_catalog(12)[0]
+        self.customer = create_customer('shopper')
+
+    def serve(self, view, user, path, *args):
+        request = RequestFactory().get(path)
+        request.user = user
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, *args)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def assertSamePages(self, name, path, *args):
+        for user in (AnonymousUser(), self.customer.user):
+            served = {}
+            for label, view in (('sync', getattr(views, name)),
+                                ('async', async_to_sync(getattr(async_views, name)))):
+                for alias in settings.CACHES:
+                    caches[alias].clear()
+                served[label] = [self.serve(view, user, path, *args) for _ in ('cold', 'warm')]
+            with self.subTest(user=str(user)):
+                self.assertEqual(served['async'], served['sync'])
+
+    def test_home(self):
+        self.assertSamePages('home', reverse('home'))
+
+    def test_product_list(self):
+        self.assertSamePages('product_list', reverse('product_list') + '?category=1&carat=1')
+
+    def test_product_detail(self):
+        self.assertSamePages('product_detail', reverse('product_detail', args=[self.product.pk]),
+                             self.product.pk)
+
+
+# ============= CONDITIONAL GET =============
+
+class ConditionalGetTests(StoreTestCase):
+    """Unchanged catalog pages answer revalidation with 304; product and category edits change the validators"""
+
+    def setUp(self):
+        super().setUp()
+        self.product = seed_catalog(6)[0]
+        # Stamped an hour ago, so edits made now move Last-Modified forward.
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Product.objects.update(updated_at=hour_ago)
+        Category.objects.update(updated_at=hour_ago)
+        self.pages = [reverse('product_list'), reverse('product_detail', args=[self.product.pk])]
+
+    def validators(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag'], response['Last-Modified']
+
+    def test_unchanged_pages_get_304(self):
+        for url in self.pages:
+            with self.subTest(url):
+                etag, last_modified = self.validators(url)
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                response = self.client.get(url, headers={'If-Modified-Since': last_modified})
+                self.assertEqual(response.status_code, 304)
+
+    def assertEditChangesValidators(self, edit):
+        before = {url: self.validators(url) for url in self.pages}
+        edit()
+        for url, (etag, last_modified) in before.items():
+            with self.subTest(url):
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                response = self.client.get(url, headers={'If-Modified-Since': last_modified})
+                self.assertEqual(response.status_code, 200)
+
+    def test_product_edit(self):
+        def edit():
+            self.product.price = 2500
+            self.product.save()
+        self.assertEditChangesValidators(edit)
+
+    def test_category_rename(self):
+        def edit():
+            category = self.product.category
+            category.name = 'Solitaires'
+            category.save()
+        self.assertEditChangesValidators(edit)
+
+    def test_category_count(self):
+        before = {url: self.validators(url)[0] for url in self.pages}
+        Category.objects.create(name='Bangles')
+        Category.objects.filter(name='Bangles').update(updated_at=timezone.now() - timedelta(days=1))
+        for url, etag in before.items():
+            with self.subTest(url):
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 200)
+
+
+# ============= QUERY PLANS =============
+
+FULL_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+
+
+def hot_queries():
+    """name -> (queryset, the plan step that must drive it) for the hot storefront and admin queries.
+
+    Keyset pages are checked past the first page, since that is where a
+    missing index actually costs something.
+    """
+    now = timezone.now()
+    month = timedelta(days=30)
+    # Same shape as KeysetPaginator's seek condition on ('-date', '-id').
+    before = lambda: (Q(date__lt=now) | Q(date=now, id__lt=10**6)) & Q(date__lte=now)
+    return {
+        'product_list page': (
+            Product.objects.for_listing().filter(id__gt=48).order_by('id')[:49],
+            'SEARCH product USING INTEGER PRIMARY KEY'),
+        'product_list category page': (
+            Product.objects.for_listing().filter(category_id=1, id__gt=48).order_by('id')[:49],
+            'SEARCH product USING INDEX product_category_id_idx'),
+        'product_list faceted page': (
+            Product.objects.for_listing().filter(
+                Q(price__gte=10000, price__lt=25000) | Q(price__gte=50000, price__lt=100000),
+                category_id__in=[1, 2], carat__gte=2, carat__lt=4, id__gt=48).order_by('id')[:49],
+            'SEARCH product USING INDEX product_category_id_idx'),
+        'product_detail related': (
+            Product.objects.for_listing().filter(neighbor_of__product_id=5).order_by('neighbor_of__rank')[:4],
+            'SEARCH product_neighbor USING INDEX'),
+        'product_detail related fallback': (
+            Product.objects.for_listing().filter(category_id=1).exclude(pk=5)[:4],
+            'SEARCH product USING INDEX product_category_updated_idx'),
+        'product_list validators': (list_stamps_query(), 'USING COVERING INDEX product_updated_at_idx'),
+        'product_detail validators': (product_stamps_query(5), 'SEARCH product USING INTEGER PRIMARY KEY'),
+        'newest products': (
+            Product.objects.order_by('-created_at')[:8], 'SCAN product USING INDEX product_created_at_idx'),
+        'my_orders': (
+            Order.objects.filter(customer_id=1), 'SEARCH order USING INDEX order_customer_date_idx'),
+        'manage_orders page': (
+            Order.objects.select_related('customer').filter(before()).order_by('-date', '-id')[:51],
+            'SEARCH order USING INDEX order_date_id_idx'),
+        'manage_orders status page': (
+            Order.objects.select_related('customer').filter(
+                before(), status='Pending').order_by('-date', '-id')[:51],
+            'SEARCH order USING INDEX order_status_date_id_idx'),
+        'manage_orders history page': (
+            ArchivedOrder.objects.select_related('customer').filter(before()).order_by('-date', '-id')[:51],
+            'SEARCH archived_order USING INDEX archived_order_date_id_idx'),
+        'my_orders history': (
+            ArchivedOrder.objects.filter(customer_id=1),
+            'SEARCH archived_order USING INDEX archived_order_customer_idx'),
+        'order lines prefetch': (
+            OrderItem.objects.select_related('product').filter(order_id__in=[1, 2, 3]),
+            'SEARCH order_item USING INDEX order_item_order_id'),
+        'archived order lines prefetch': (
+            ArchivedOrderItem.objects.select_related('product').filter(order_id__in=[1, 2, 3]),
+            'SEARCH archived_order_item USING INDEX archived_order_item_order_id'),
+        'archive batch': (
+            Order.objects.filter(
+                status__in=('Delivered', 'Rejected'), date__lt=now).order_by().values('id')[:2000],
+            'SEARCH order USING COVERING INDEX order_status_date_id_idx'),
+        'dashboard recent orders': (Order.objects.all()[:5], 'SCAN order USING INDEX order_date_id_idx'),
+        'manage_feedback page': (
+            Feedback.objects.select_related('customer').filter(before()).order_by('-date', '-id')[:51],
+            'SEARCH feedback USING INDEX feedback_date_id_idx'),
+        'manage_complaints page': (
+            Complaint.objects.select_related('customer', 'product').filter(
+                before()).order_by('-date', '-id')[:51],
+            'SEARCH complaints USING INDEX complaint_date_id_idx'),
+        'export orders range': (
+            Order.objects.filter(items__isnull=False, date__gte=now - month, date__lt=now).order_by(
+                'date', 'id', 'items__id').values('id', 'items__product__name'),
+            'SEARCH order USING COVERING INDEX order_date_id_idx'),
+        'export orders status range': (
+            Order.objects.filter(
+                items__isnull=False, date__gte=now - month, date__lt=now, status='Pending',
+            ).order_by('date', 'id', 'items__id').values('id', 'items__product__name'),
+            'SEARCH order USING COVERING INDEX order_status_date_id_idx'),
+        'export payments range': (
+            Payment.objects.filter(payment_date__gte=now - month, payment_date__lt=now).order_by(
+                'payment_date', 'id'),
+            'SEARCH payment USING INDEX payment_date_id_idx'),
+        'manage_users page': (
+            Customer.objects.select_related('user').filter(id__gt=50).order_by('id')[:51],
+            'SEARCH customer USING INTEGER PRIMARY KEY'),
+    }
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class QueryPlanTests(StoreTestCase):
+    """Every hot query searches or walks the index meant for it, with no full table scan"""
+
+    def test_hot_queries(self):
+        for name, (queryset, expected) in hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertEqual(FULL_SCAN.findall(plan), [], plan)
+                self.assertIn(expected, plan)
+
+
+# ============= REQUEST METRICS =============
+
+@override_settings(REQUEST_METRICS_ENABLED=True)
+class RequestMetricsTests(StoreTestCase):
+    """Every query a view runs is counted, whether it is served over WSGI or ASGI"""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        seed_catalog(8)
+
+    def recorded_queries(self):
+        return {row['url_name']: row['max_queries'] for row in metrics.summary()}
+
+    def test_wsgi(self):
+        self.client.get(reverse('product_list'))
+        self.assertEqual(self.recorded_queries(), {'product_list': 4})
+
+    async def test_asgi(self):
+        await self.async_client.get(reverse('product_list'))
+        self.assertEqual(self.recorded_queries(), {'product_list': 4})
+
+    def test_async_chain_is_not_adapted(self):
+        async def get_response(request):
+            return None
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+
+
+# ============= ADMIN ROLE =============
+
+class AdminRoleTests(StoreTestCase):
+
+    def test_revoking_the_role_takes_effect_on_the_next_request(self):
+        user = User.objects.create_user('manager')
+        admin = Admin.objects.create(user=user, email='m@example.com', number='9999999999',
+                                     address='Surat')
+        self.assertTrue(services.is_admin(User.objects.get(pk=user.pk)))
+        cached = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(services.is_admin(cached))
+        admin.delete()
+        self.assertFalse(services.is_admin(User.objects.get(pk=user.pk)))
+
+
+# ============= DASHBOARD =============
+
+class DashboardCountTests(StoreTestCase):
+    """The dashboard's product and customer counts come without counting the tables"""
+
+    def test_product_total_follows_saves_and_deletes(self):
+        category = Category.objects.create(name='Rings')
+        products = [Product.objects.create(name=f'Ring {i}', description='', price=1000 * i,
+                                           category=category, carat=i) for i in range(1, 6)]
+        products[0].delete()
+        products[1].price = 500000
+        products[1].save()
+        self.assertEqual(facets.product_total(), 4)
+
+    def test_customer_count_is_cached_until_a_customer_changes(self):
+        create_customer('first')
+        self.assertEqual(services.get_customer_count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(services.get_customer_count(), 1)
+        second = create_customer('second')
+        self.assertEqual(services.get_customer_count(), 2)
+        second.delete()
+        self.assertEqual(services.get_customer_count(), 1)
+
+
+# ============= SALES AGGREGATES =============
+
+class OrderTotalsTests(StoreTestCase):
+    """Status changes and deletes from anywhere leave the totals as rebuild() computes them"""
+
+    def setUp(self):
+        super().setUp()
+        self.products = seed_catalog(3, images=0)
+        # Built now, so the first product delete does not pay for it.
+        search.rebuild_index()
+
+    def place_orders(self, customer, count, products):
+        for i in range(count):
+            for product in products:
+                add_cart_item(customer, product, 2)
+            order = services.place_order(customer, 'Surat', 'COD')
+            if i % 2:
+                services.update_order_status(order, 'Delivered')
+
+    def delete_queries(self, instance):
+        with CaptureQueriesContext(connection) as queries:
+            instance.delete()
+        return len(queries)
+
+    def assertTotalsMatchRebuild(self):
+        def rows():
+            return sorted((row.kind, row.key, row.order_count, row.quantity, round(row.revenue, 2))
+                          for row in SalesAggregate.objects.all()
+                          if (row.order_count, row.quantity, round(row.revenue, 2)) != (0, 0, 0))
+        kept = rows()
+        aggregates.rebuild()
+        self.assertEqual(kept, rows())
+        for order in Order.objects.prefetch_related('items'):
+            self.assertAlmostEqual(order.total, sum(item.get_total() for item in order.items.all()))
+
+    def test_customer(self):
+        few, many = create_customer('few'), create_customer('many')
+        self.place_orders(few, 2, self.products)
+        self.place_orders(many, 8, self.products)
+        self.place_orders(create_customer('kept'), 2, self.products)
+        # Delivered orders move to the archive, so both tiers are involved.
+        archive.archive_orders(days=0)
+        self.assertEqual(self.delete_queries(few), self.delete_queries(many))
+        self.assertTotalsMatchRebuild()
+
+    def test_product(self):
+        customer = create_customer('shopper')
+        rarely, often = self.products[:2]
+        self.place_orders(customer, 2, [rarely, self.products[2]])
+        self.place_orders(customer, 8, [often, self.products[2]])
+        archive.archive_orders(days=0)
+        self.assertEqual(self.delete_queries(rarely), self.delete_queries(often))
+        self.assertTotalsMatchRebuild()
+
+    def test_orders_and_lines(self):
+        customer = create_customer('shopper')
+        self.place_orders(customer, 6, self.products)
+        Order.objects.first().delete()
+        Order.objects.filter(status='Delivered').delete()
+        Order.objects.first().items.first().delete()
+        self.assertTotalsMatchRebuild()
+
+    def test_status_saved_directly(self):
+        customer = create_customer('shopper')
+        self.place_orders(customer, 4, self.products)
+        for order, status in zip(Order.objects.order_by('id'), ('Delivered', 'Rejected', 'Pending', 'Accepted')):
+            order.status = status
+            order.save()
+        archive.archive_orders(days=0)
+        archived = ArchivedOrder.objects.get(status='Delivered')
+        archived.status = 'Rejected'
+        archived.save()
+        self.assertTotalsMatchRebuild()
+
+    def test_status_changed_in_django_admin(self):
+        customer = create_customer('shopper')
+        self.place_orders(customer, 1, self.products)
+        order = Order.objects.get()
+        items = list(order.items.all())
+        self.client.force_login(User.objects.create_superuser('root', password='root'))
+        data = {
+            'customer': customer.pk, 'name': order.name, 'address': order.address,
+            'description': '', 'total': order.total, 'status': 'Delivered',
+            'items-TOTAL_FORMS': len(items), 'items-INITIAL_FORMS': len(items),
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        }
+        for i, item in enumerate(items):
+            data.update({f'items-{i}-id': item.pk, f'items-{i}-order': order.pk,
+                         f'items-{i}-product': item.product_id, f'items-{i}-price': item.price,
+                         f'items-{i}-quantity': item.quantity})
+        response = self.client.post(reverse('admin:store_order_change', args=[order.pk]), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.get().status, 'Delivered')
+        self.assertEqual(aggregates.dashboard_totals()['total_revenue'], order.total)
+        self.assertTotalsMatchRebuild()
+
+    def test_lines_and_total_are_read_only_in_django_admin(self):
+        customer = create_customer('shopper')
+        self.place_orders(customer, 1, self.products)
+        order = Order.objects.get()
+        items = list(order.items.order_by('id').values_list('pk', 'product', 'price', 'quantity'))
+        self.client.force_login(User.objects.create_superuser('root', password='root'))
+        data = {
+            'customer': customer.pk, 'name': order.name, 'address': order.address,
+            'description': '', 'total': 1, 'status': order.status,
+            'items-TOTAL_FORMS': len(items) + 1, 'items-INITIAL_FORMS': len(items),
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            f'items-{len(items)}-product': self.products[0].pk, f'items-{len(items)}-price': 1,
+            f'items-{len(items)}-quantity': 9,
+        }
+        for i, (pk, product, price, quantity) in enumerate(items):
+            data.update({f'items-{i}-id': pk, f'items-{i}-order': order.pk, f'items-{i}-product': product,
+                         f'items-{i}-price': price / 2, f'items-{i}-quantity': quantity * 3,
+                         f'items-{i}-DELETE': 'on' if i == 0 else ''})
+        url = reverse('admin:store_order_change', args=[order.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, data)
+        self.assertEqual(list(order.items.order_by('id').values_list('pk', 'product', 'price', 'quantity')),
+                         items)
+        self.assertEqual(Order.objects.get().total, order.total)
+        self.assertTotalsMatchRebuild()
+
+
+# ============= SEARCH =============
+
+class SearchTests(StoreTestCase):
+    """Ranked search on the database's own index: FTS5 on SQLite, the in-process one elsewhere"""
+
+    def setUp(self):
+        super().setUp()
+        rings = Category.objects.create(name='Rings')
+        self.pendants = Category.objects.create(name='Pendants')
+        Product.objects.bulk_create(
+            [Product(name=f'Ring {i}', description='gold band', price=1000 + i, category=rings, carat=1)
+             for i in range(search.RESULT_LIMIT + 100)]
+            + [Product(name=f'Ring P{i}', description='gold drop', price=300000,
+                       category=self.pendants, carat=9) for i in range(5)]
+        )
+        search.rebuild_index()
+
+    def test_filters_apply_before_the_result_limit(self):
+        response = self.client.get(reverse('product_list'),
+                                   {'search': 'ring', 'category': self.pendants.pk})
+        self.assertEqual(len(response.context['page']), 5)
+
+    def test_facet_counts_cover_every_match(self):
+        response = self.client.get(reverse('product_list'), {'search': 'ring'})
+        categories = {option['label']: option['count']
+                      for option in response.context['facets']['facets'][0]['options']}
+        self.assertEqual(categories, {'Rings': search.RESULT_LIMIT + 100, 'Pendants': 5})
+        self.assertEqual(response.context['facets']['total'], search.RESULT_LIMIT + 105)
+
+    def test_terms_match_as_prefixes_across_columns(self):
+        self.assertEqual(len(search.search_product_ids('pend dro')), 5)
+        self.assertEqual(search.filter_matches(Product.objects.all(), 'ring').count(),
+                         search.RESULT_LIMIT + 105)
+
+    def committed(self):
+        """Run the in-process index's on-commit callbacks; FTS5 writes are transactional"""
+        if search.get_index() is search._python_index:
+            return self.captureOnCommitCallbacks(execute=True)
+        return nullcontext()
+
+    def test_index_follows_saves_and_deletes(self):
+        with self.committed():
+            product = Product.objects.create(name='Bangle', description='twist', price=5000,
+                                             category=self.pendants, carat=2)
+        self.assertEqual(search.search_product_ids('twist'), [product.pk])
+        with self.committed():
+            product.delete()
+        self.assertEqual(search.search_product_ids('twist'), [])
+
+
+class PythonIndexSearchTests(SearchTests):
+    """The same checks on the in-process index, whatever the database"""
+
+    def setUp(self):
+        patcher = mock.patch.object(search, 'get_index', return_value=search._python_index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_every_process_sees_every_committed_write(self):
+        # Two processes' copies, sharing the cache.
+        first, second = search.PythonIndex(), search.PythonIndex()
+        self.assertEqual(first.matches(['twist']), [])
+        self.assertEqual(second.matches(['twist']), [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            bangle = Product.objects.create(name='Bangle', description='twist', price=5000,
+                                            category=self.pendants, carat=2)
+            first.add(bangle)
+            torque = Product.objects.create(name='Torque', description='twist', price=5000,
+                                            category=self.pendants, carat=2)
+            second.add(torque)
+        # Nothing is announced before the commit.
+        self.assertEqual(first.matches(['twist']), [])
+        for callback in callbacks:
+            callback()
+        for index in (first, second):
+            self.assertEqual(sorted(index.matches(['twist'])), [bangle.pk, torque.pk])
+
+
+# ============= PAGINATION =============
+
+class ForgedCursorTests(StoreTestCase):
+    """A cursor the paginator did not issue shows the first page rather than an error"""
+
+    FORGED = [[None], [[1]], [{'id': 1}], [True], [1, 2], ['not a number'], []]
+
+    def test_product_list(self):
+        seed_catalog(60)
+        url = reverse('product_list')
+        first_page = list(self.client.get(url).context['page'])
+        for values in self.FORGED:
+            with self.subTest(values=values):
+                response = self.client.get(url, {CURSOR_PARAM: encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['page']), first_page)
+
+    def test_search_results(self):
+        seed_catalog(60)
+        url = reverse('product_list')
+        for values in self.FORGED + [[-5]]:
+            with self.subTest(values=values):
+                response = self.client.get(url, {'search': 'ring', CURSOR_PARAM: encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.context['page'].has_previous)
+
+    def test_datetime_ordering(self):
+        paginator = KeysetPaginator(Order.objects.all(), ordering=('-date', '-id'))
+        for values in ([None, 1], [[2024], 1], [{'year': 2024}, 1], ['yesterday', 1],
+                       ['2024-01-01T00:00:00+00:00', [1]]):
+            with self.subTest(values=values):
+                page = paginator.page(encode_cursor(values))
+                self.assertFalse(page.has_previous)
+
+
+def admin_context(view, request):
+    """The context an admin view renders; the repo ships no admin_panel templates besides metrics"""
+    with mock.patch(f'{view.__module__}.render', side_effect=lambda request, template, context: context):
+        return view(request)
+
+
+class CursorWalkTests(StoreTestCase):
+    """Following next to the end and previous back again shows every row exactly once"""
+
+    def walk(self, fetch, params=None):
+        """Row ids of each page, forwards; checks the way back gives the same pages.
+
+        fetch(query_string) returns the Page for that query string.
+        """
+        pages, page = [], fetch(urlencode(params or {}))
+        pages.append([row.pk for row in page])
+        while page.has_next:
+            page = fetch(page.next_query)
+            pages.append([row.pk for row in page])
+        backwards = [pages[-1]]
+        while page.has_previous:
+            page = fetch(page.previous_query)
+            backwards.append([row.pk for row in page])
+        self.assertEqual(backwards[::-1], pages)
+        return pages
+
+    def admin_pages(self, view, user, params=None):
+        factory = RequestFactory()
+
+        def fetch(query):
+            request = factory.get(f'/?{query}')
+            request.user = user
+            return admin_context(view, request)['page']
+        return self.walk(fetch, params)
+
+    def test_product_list(self):
+        seed_catalog(130, images=0)
+        url = reverse('product_list')
+        pages = self.walk(lambda query: self.client.get(f'{url}?{query}').context['page'])
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(pages, []), list(Product.objects.order_by('id').values_list('pk', flat=True)))
+
+    def test_manage_orders(self):
+        customer = create_customer('shopper')
+        create_orders(customer, 80)
+        create_orders(customer, 40, status='Delivered')
+        newest_first = Order.objects.order_by('-date', '-id')
+        user = login_admin(self.client)
+        pages = self.admin_pages(admin_views.manage_orders, user)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(pages, []), list(newest_first.values_list('pk', flat=True)))
+        pages = self.admin_pages(admin_views.manage_orders, user, {'status': 'Delivered'})
+        self.assertEqual(sum(pages, []),
+                         list(newest_first.filter(status='Delivered').values_list('pk', flat=True)))
+
+    def test_manage_orders_history(self):
+        """Archived orders share timestamps with hot ones, so the tiers meet inside runs of equal dates"""
+        customer = create_customer('shopper')
+        orders = create_orders(customer, 120)
+        Order.objects.filter(pk__in=[order.pk for order in orders[::3]]).update(status='Delivered')
+        archive.archive_orders(days=0)
+        user = login_admin(self.client)
+
+        def expected(**filters):
+            rows = [(date, pk) for model in (Order, ArchivedOrder)
+                    for date, pk in model.objects.filter(**filters).values_list('date', 'pk')]
+            return [pk for _, pk in sorted(rows, reverse=True)]
+
+        pages = self.admin_pages(admin_views.manage_orders, user, {'history': 1})
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(pages, []), expected())
+        archived = set(ArchivedOrder.objects.values_list('pk', flat=True))
+        self.assertTrue(all(archived & set(page) and set(page) - archived for page in pages))
+        pages = self.admin_pages(admin_views.manage_orders, user, {'history': 1, 'status': 'Delivered'})
+        self.assertEqual(sum(pages, []), expected(status='Delivered'))
+
+
+# ============= CART =============
+
+class CartTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.customer = create_customer('shopper')
+        self.product = seed_catalog(1)[0]
+
+    def test_one_row_per_customer_and_product(self):
+        Cart.objects.create(customer=self.customer, product=self.product, quantity=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(customer=self.customer, product=self.product, quantity=1)
+
+    def test_repeated_adds_increment_the_row(self):
+        for quantity in (1, 2, 3):
+            add_cart_item(self.customer, self.product, quantity)
+        self.assertEqual(list(Cart.objects.values_list('quantity', flat=True)), [6])
+
+    def test_count_is_cached(self):
+        add_cart_item(self.customer, self.product, 2)
+        self.assertEqual(services.get_cart_count(self.customer.user), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(services.get_cart_count(self.customer.user), 2)
+
+    def test_count_follows_every_cart_write(self):
+        """Writes outside the cart views, cascades included, drop the cached count"""
+        user = self.customer.user
+        other = seed_catalog(1)[0]
+
+        def count_after(write):
+            services.get_cart_count(user)
+            write()
+            return services.get_cart_count(user)
+
+        self.assertEqual(count_after(lambda: add_cart_item(self.customer, self.product)), 1)
+        self.assertEqual(count_after(lambda: add_cart_item(self.customer, self.product)), 2)
+        row = Cart.objects.get(product=self.product)
+        row.quantity = 5
+        self.assertEqual(count_after(row.save), 5)
+        self.assertEqual(count_after(lambda: Cart.objects.create(
+            customer=self.customer, product=other, quantity=3)), 8)
+        self.assertEqual(count_after(other.delete), 5)
+        self.assertEqual(count_after(lambda: Cart.objects.filter(pk=row.pk).delete()), 0)
+        add_cart_item(self.customer, self.product, 4)
+        self.assertEqual(count_after(lambda: services.place_order(self.customer, 'Surat', 'COD')), 0)
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+class CartConcurrencyTests(TransactionTestCase):
+    """Clicks racing from several threads all land in a single cart row"""
+
+    WORKERS = 8
+    CLICKS = 10
+
+    def test_parallel_adds(self):
+        customer = create_customer('racer')
+        product = seed_catalog(1)[0]
+        # Every thread tries its first insert at once, so all but one lose
+        # the race to the unique constraint and fall back to the update.
+        start = threading.Barrier(self.WORKERS)
+
+        def click(_):
+            try:
+                start.wait()
+                for _ in range(self.CLICKS):
+                    add_cart_item(customer, product)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            list(pool.map(click, range(self.WORKERS)))
+        self.assertEqual(list(Cart.objects.values_list('quantity', flat=True)),
+                         [self.WORKERS * self.CLICKS])
+
+
+# ============= IMAGES =============
+
+class ImageDerivativeTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.storage = InMemoryStorage()
+        self.upload('products/ring.jpg', Image.new('RGB', (800, 600), 'red'), 'JPEG')
+        self.upload('products/ring.png', Image.new('RGBA', (300, 300), 'blue'), 'PNG')
+
+    def upload(self, name, image, image_format):
+        buffer = BytesIO()
+        image.save(buffer, image_format)
+        self.storage.save(name, ContentFile(buffer.getvalue()))
+
+    def derivative(self, name, size, extension):
+        with self.storage.open(images.derivative_name(name, size, extension), 'rb') as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_every_size_and_format(self):
+        written = images.generate_derivatives('products/ring.jpg', storage=self.storage)
+        self.assertCountEqual(written, [images.derivative_name('products/ring.jpg', size, extension)
+                                        for size in images.SIZES for extension in images.FORMATS])
+        card = self.derivative('products/ring.jpg', 'card', 'webp')
+        self.assertEqual((card.format, card.size), ('WEBP', (480, 480)))
+
+    def test_originals_sharing_a_stem_keep_their_own_derivatives(self):
+        jpg = images.generate_derivatives('products/ring.jpg', storage=self.storage)
+        png = images.generate_derivatives('products/ring.png', storage=self.storage)
+        self.assertEqual(len(png), len(jpg))
+        self.assertFalse(set(jpg) & set(png))
+        red, _, blue = self.derivative('products/ring.png', 'thumb', 'jpg').getpixel((80, 80))
+        self.assertGreater(blue, red)
+
+    def test_existing_derivatives_are_kept_unless_overwritten(self):
+        written = images.generate_derivatives('products/ring.jpg', storage=self.storage)
+        self.assertEqual(images.generate_derivatives('products/ring.jpg', storage=self.storage), [])
+        self.assertCountEqual(
+            images.generate_derivatives('products/ring.jpg', overwrite=True, storage=self.storage), written)
+
+    def test_srcset(self):
+        self.assertEqual(images.srcset('products/ring.png', 'webp'),
+                         '/media/products/ring.png__thumb.webp 160w, '
+                         '/media/products/ring.png__card.webp 480w, '
+                         '/media/products/ring.png__detail.webp 1200w')
+
+
+# ============= JOBS =============
+
+def failing_job(**payload):
+    raise RuntimeError('mail server down')
+
+
+@mock.patch.dict(jobs._handlers, {'failing': failing_job})
+class JobQueueTests(StoreTestCase):
+
+    def make_due(self, job):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+    def test_claim_takes_each_due_job_once(self):
+        first = jobs.enqueue('failing')
+        second = jobs.enqueue('failing')
+        jobs.enqueue('failing', delay=timedelta(minutes=5))
+        self.assertEqual(jobs.claim(10), [first.pk, second.pk])
+        self.assertEqual(jobs.claim(10), [])
+        self.assertEqual(set(Job.objects.filter(status='running').values_list('attempts', flat=True)), {1})
+
+    def test_claim_takes_back_jobs_of_dead_workers(self):
+        job = jobs.enqueue('failing')
+        jobs.claim(1)
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - jobs.STALE_AFTER - timedelta(seconds=1))
+        self.assertEqual(jobs.claim(1), [job.pk])
+        self.assertEqual(Job.objects.get(pk=job.pk).attempts, 2)
+
+    def test_failures_back_off_until_attempts_run_out(self):
+        job = jobs.enqueue('failing', max_attempts=3)
+        for attempt, outcome in enumerate(['retry', 'retry', 'failed'], start=1):
+            self.make_due(job)
+            self.assertEqual(jobs.claim(1), [job.pk])
+            before = timezone.now()
+            with self.assertLogs('store.jobs', 'WARNING'):
+                self.assertEqual(jobs.execute(job.pk), outcome)
+            job.refresh_from_db()
+            self.assertIn('mail server down', job.last_error)
+            if outcome == 'retry':
+                self.assertEqual(job.status, 'queued')
+                wait = job.run_at - before
+                self.assertGreaterEqual(wait, jobs.backoff(attempt))
+                self.assertLess(wait, jobs.backoff(attempt) + timedelta(seconds=5))
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(jobs.claim(1), [])
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual([jobs.backoff(n).total_seconds() for n in (1, 2, 3)], [10, 20, 40])
+        self.assertEqual(jobs.backoff(20).total_seconds(), jobs.BACKOFF_MAX_SECONDS)
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+@mock.patch.dict(jobs._handlers, {'failing': failing_job})
+class RunJobsTests(TransactionTestCase):
+    """The worker runs committed jobs on its pool threads, each with its own connection"""
+
+    def test_once(self):
+        customer = create_customer('shopper')
+        add_cart_item(customer, seed_catalog(1)[0], 2)
+        services.place_order(customer, 'Surat', 'COD')
+        jobs.enqueue('failing')
+        out = StringIO()
+        with mock.patch.object(catalog_cache, 'is_shared', return_value=True), \
+                self.assertLogs('store.jobs', 'WARNING'):
+            call_command('run_jobs', '--once', '--workers', '2', stdout=out)
+        self.assertIn('Jobs done: 1, retried: 1, failed: 0', out.getvalue())
+        self.assertEqual(dict(Job.objects.values_list('name', 'status')),
+                         {'notify_order_placed': 'done', 'failing': 'queued'})
+        self.assertEqual([message.to for message in mail.outbox], [['shopper@example.com']])
+
+    def test_refuses_a_per_process_cache(self):
+        with self.assertRaisesMessage(CommandError, 'shared cache'):
+            call_command('run_jobs', '--once')
+
+
+# ============= PRODUCT IMPORT/EXPORT =============
+
+class ProductImportExportTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        seed_catalog(5, images=0)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name, content=None):
+        path = os.path.join(self.directory, name)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_products', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def catalog(self):
+        return sorted(Product.objects.values_list('name', 'description', 'price', 'category__name', 'carat'))
+
+    def test_round_trip(self):
+        exported = self.catalog()
+        for name in ('products.csv', 'products.jsonl'):
+            with self.subTest(name):
+                path = self.path(name)
+                call_command('export_products', path, stdout=StringIO())
+                out, _ = self.run_import(path)
+                self.assertIn('0 created, 0 updated, 5 unchanged, 0 rejected', out)
+                Product.objects.all().delete()
+                out, _ = self.run_import(path)
+                self.assertIn('5 created, 0 updated, 0 unchanged, 0 rejected', out)
+                self.assertEqual(self.catalog(), exported)
+
+    def test_invalid_rows_are_rejected(self):
+        path = self.path('products.csv', (
+            'id,name,description,price,category,carat\n'
+            ',Negative,bad price,-5,Category 0,1\n'
+            ',Orphan,no such category,100,Earrings,1\n'
+            ',Far too long a name,bad name,100,Category 0,1\n'
+            ',Valid,a good row,100,Category 1,1\n'
+        ))
+        out, err = self.run_import(path)
+        self.assertIn('1 created, 0 updated, 0 unchanged, 3 rejected', out)
+        lines = err.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('Line 2: price:'))
+        self.assertEqual(lines[1], "Line 3: category: unknown category 'Earrings'")
+        self.assertTrue(lines[2].startswith('Line 4: name:'))
+        self.assertEqual(Product.objects.filter(description__in=['bad price', 'no such category', 'bad name'])
+                         .count(), 0)
+        self.assertTrue(Product.objects.filter(name='Valid', category__name='Category 1').exists())
+
+
+# ============= EXPORTS =============
+
+class OrderExportTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        login_admin(self.client)
+        customer = create_customer('shopper')
+        first, second = seed_catalog(2, images=0)
+        add_cart_item(customer, first, 2)
+        add_cart_item(customer, second, 1)
+        self.delivered = services.place_order(customer, 'Surat', 'COD')
+        services.update_order_status(self.delivered, 'Delivered')
+        add_cart_item(customer, second, 3)
+        self.pending = services.place_order(customer, 'Surat', 'UPI')
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_orders'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], list(exports.ORDER_HEADER))
+        return response['Content-Disposition'], [(row[0], row[4], row[6], row[8], row[9]) for row in rows[1:]]
+
+    def test_one_row_per_line_in_date_order(self):
+        disposition, rows = self.export()
+        self.assertEqual(disposition, 'attachment; filename="orders.csv"')
+        self.assertEqual(rows, [
+            (str(self.delivered.pk), 'Ring 0', '2', '2000.00', 'Delivered'),
+            (str(self.delivered.pk), 'Ring 1', '1', '1001.00', 'Delivered'),
+            (str(self.pending.pk), 'Ring 1', '3', '3003.00', 'Pending'),
+        ])
+
+    def test_status_filter_and_archived_orders(self):
+        disposition, rows = self.export(status='Pending')
+        self.assertEqual(disposition, 'attachment; filename="orders-pending.csv"')
+        self.assertEqual([row[0] for row in rows], [str(self.pending.pk)])
+        archive.archive_orders(days=0)
+        self.assertEqual([row[0] for row in self.export()[1]], [str(self.pending.pk)])
+        self.assertEqual([row[0] for row in self.export(history=1)[1]],
+                         [str(self.delivered.pk)] * 2 + [str(self.pending.pk)])
+
+    def test_invalid_filters_redirect(self):
+        for params in ({'status': 'Lost'}, {'date_from': '2026-02-01', 'date_to': '2026-01-01'},
+                       {'date_from': 'yesterday'}):
+            with self.subTest(**params):
+                response = self.client.get(reverse('export_orders'), params)
+                self.assertRedirects(response, reverse('manage_orders'), fetch_redirect_response=False)
+
+
+# ============= RECOMMENDATIONS =============
+
+class RecommendationTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ring, self.band, self.stud, self.chain = seed_catalog(4, images=0)
+
+    def buy(self, username, *products, settled=True):
+        customer = Customer.objects.filter(user__username=username).first() or create_customer(username)
+        for product in products:
+            add_cart_item(customer, product)
+        order = services.place_order(customer, 'Surat', 'COD')
+        if settled:
+            Order.objects.filter(pk=order.pk).update(
+                date=timezone.now() - recommendations.COMMIT_GRACE - timedelta(seconds=1))
+
+    def co_purchases(self):
+        return sorted(CoPurchase.objects.values_list('product_a', 'product_b', 'customers'))
+
+    def neighbors(self, product):
+        return list(ProductNeighbor.objects.filter(product=product).order_by('rank').values_list(
+            'neighbor', 'source'))
+
+    def test_full_rebuild(self):
+        self.buy('ann', self.ring, self.band)
+        self.buy('bob', self.ring, self.band, self.stud)
+        self.buy('cat', self.ring, self.stud)
+        stats = recommendations.rebuild()
+        self.assertEqual(stats, {'lines': 7, 'pairs': 3, 'products': 4, 'full': True})
+        self.assertEqual(self.neighbors(self.ring)[:2],
+                         [(self.band.pk, 'copurchase'), (self.stud.pk, 'copurchase')])
+        self.assertEqual(recommendations.related_products(self.ring)[:2], [self.band, self.stud])
+
+    def test_incremental_rebuild_matches_a_full_one(self):
+        self.buy('ann', self.ring, self.band)
+        self.buy('bob', self.ring)
+        recommendations.rebuild()
+        self.buy('bob', self.band, self.chain)
+        self.buy('cat', self.ring, self.chain)
+        stats = recommendations.rebuild()
+        self.assertEqual((stats['full'], stats['lines']), (False, 4))
+        incremental = self.co_purchases(), [self.neighbors(product) for product in (self.ring, self.chain)]
+        recommendations.rebuild(full=True)
+        self.assertEqual((self.co_purchases(), [self.neighbors(product) for product in (self.ring, self.chain)]),
+                         incremental)
+
+    def test_recent_lines_wait_for_the_next_run(self):
+        """Lines placed within COMMIT_GRACE may sit above an id whose checkout is still open"""
+        self.buy('ann', self.ring, self.band)
+        recommendations.rebuild()
+        self.buy('bob', self.ring, self.band, settled=False)
+        self.assertEqual(recommendations.rebuild()['lines'], 0)
+        Order.objects.update(date=timezone.now() - recommendations.COMMIT_GRACE - timedelta(seconds=1))
+        self.assertEqual(recommendations.rebuild()['lines'], 2)
+        self.assertEqual(self.neighbors(self.ring)[0], (self.band.pk, 'copurchase'))
+
+
+# ============= SESSIONS =============
+
+CACHED_DB_SESSIONS = 'django.contrib.sessions.backends.cached_db'
+
+
+class SessionTests(StoreTestCase):
+
+    def test_engine_follows_the_cache(self):
+        """A per-process cache would keep serving sessions flushed by another worker"""
+        expected = CACHED_DB_SESSIONS if settings.SHARED_CACHE else 'django.contrib.sessions.backends.db'
+        self.assertEqual(settings.SESSION_ENGINE, expected)
+        self.assertEqual(settings.SESSION_CACHE_ALIAS, 'sessions')
+
+    @override_settings(SESSION_ENGINE=CACHED_DB_SESSIONS)
+    def test_cached_db_reads_the_cache_first(self):
+        self.client.force_login(create_customer('shopper').user)
+
+        def session_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('product_list'))
+            self.assertTrue(response.wsgi_request.user.is_authenticated)
+            return [query['sql'] for query in queries if 'django_session' in query['sql']]
+
+        self.assertEqual(session_queries(), [])
+        # Evicted from the cache, the session is read back from the database.
+        caches['sessions'].clear()
+        self.assertEqual(len(session_queries()), 1)
+        self.assertEqual(session_queries(), [])
+
+    def test_purge_removes_only_expired_sessions(self):
+        now = timezone.now()
+        for i, age in enumerate((-3, -2, -1, 1, 2)):
+            Session.objects.create(session_key=f'session{i}', session_data=SessionStore().encode({}),
+                                   expire_date=now + timedelta(days=age))
+        out = StringIO()
+        call_command('purge_sessions', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted 3 expired sessions', out.getvalue())
+        self.assertEqual(sorted(Session.objects.values_list('session_key', flat=True)), ['session3', 'session4'])
@@ -1,11 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from . import views, admin_views
+from . import views, admin_views, async_views
+
+# Async catalog read views under ASGI, see store/async_views.py.
+catalog_views = async_views if settings.ASYNC_CATALOG_VIEWS else views
 
 urlpatterns = [
     # Public URLs
-    path('', views.home, name='home'),
-    path('products/', views.product_list, name='product_list'),
-    path('product/<int:pk>/', views.product_detail, name='product_detail'),
+    path('', catalog_views.home, name='home'),
+    path('products/', catalog_views.product_list, name='product_list'),
+    path('product/<int:pk>/', catalog_views.product_detail, name='product_detail'),
     
     # Authentication
     path('register/', views.register, name='register'),
@@ -48,6 +52,8 @@ urlpatterns = [
     # Order Management
     path('admin-panel/orders/', admin_views.manage_orders, name='manage_orders'),
     path('admin-panel/orders/update/<int:pk>/', admin_views.update_order_status, name='update_order_status'),
+    path('admin-panel/orders/export/', admin_views.export_orders, name='export_orders'),
+    path('admin-panel/payments/export/', admin_views.export_payments, name='export_payments'),
     
     # User Management
     path('admin-panel/users/', admin_views.manage_users, name='manage_users'),
@@ -58,4 +64,6 @@ urlpatterns = [
     
     # Reports
     path('admin-panel/reports/', admin_views.reports, name='reports'),
+    path('admin-panel/reports/export/<str:report>/', admin_views.export_report, name='export_report'),
+    path('admin-panel/metrics/', admin_views.request_metrics, name='request_metrics'),
 ]
\ No newline at end of file
@@ -2,49 +2,66 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import Product, Category, Cart, Order, Customer, Feedback, Complaint, Payment
+from django.utils.functional import SimpleLazyObject
+from .models import Product, Category, Cart, Order, ArchivedOrder, Customer, Feedback, Complaint
 from .forms import CustomerRegistrationForm, FeedbackForm, ComplaintForm
+from . import archive, facets, recommendations, search
+from .conditional import conditional_page, list_stamps, product_stamps
+from .pagination import CATALOG_PER_PAGE, KeysetPaginator, RankedPaginator, paginate
+from .services import EmptyCartError, add_cart_item, place_order
 
 # ============= PUBLIC VIEWS =============
 
 def home(request):
     """Homepage with featured products"""
     categories = Category.objects.all()
-    featured_products = Product.objects.all()[:8]
+    featured_products = Product.objects.for_listing()[:8]
     return render(request, 'store/home.html', {
         'categories': categories,
         'featured_products': featured_products
     })
 
+def catalog_page(request, products):
+    """The page of products for the request's ?search and ?cursor parameters"""
+    search_query = request.GET.get('search')
+    if search_query:
+        # Ranked within the filtered products, so the hit limit cannot drop them.
+        ranked_ids = search.search_product_ids(search_query, queryset=products)
+        paginator = RankedPaginator(products, ranked_ids, per_page=CATALOG_PER_PAGE)
+    else:
+        paginator = KeysetPaginator(products, ordering=('id',), per_page=CATALOG_PER_PAGE)
+    return paginate(request, paginator)
+
+def catalog_facets(request, selection, categories):
+    """Facet counts for the selection, limited to the ?search results if any"""
+    search_query = request.GET.get('search')
+    # Every match, not just the ranked hits a page can reach.
+    matches = search.filter_matches(Product.objects.all(), search_query) if search_query else None
+    return facets.sidebar(selection, categories, matches)
+
+@conditional_page(list_stamps)
 def product_list(request):
-    """Display all products with filtering"""
-    products = Product.objects.all()
+    """Display all products with category, price and carat filters"""
+    selection = facets.parse(request.GET)
+    products = facets.filter_products(Product.objects.for_listing(), selection)
     categories = Category.objects.all()
     
-    # Filter by category
-    category_id = request.GET.get('category')
-    if category_id:
-        products = products.filter(category_id=category_id)
-    
-    # Search functionality
-    search_query = request.GET.get('search')
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
+    # Evaluated only if their fragments are not already cached.
+    page = SimpleLazyObject(lambda: catalog_page(request, products))
+    facet_sidebar = SimpleLazyObject(lambda: catalog_facets(request, selection, categories))
     
     return render(request, 'store/product_list.html', {
-        'products': products,
-        'categories': categories,
-        'selected_category': category_id
+        'page': page,
+        'facets': facet_sidebar,
+        'facet_key': facets.selection_key(selection, request.GET.get('search', '')),
     })
 
+@conditional_page(product_stamps)
 def product_detail(request, pk):
     """Product detail page"""
-    product = get_object_or_404(Product, pk=pk)
-    related_products = Product.objects.filter(category=product.category).exclude(pk=pk)[:4]
+    product = get_object_or_404(Product.objects.select_related('category'), pk=pk)
+    # Lazy, so a cached product_detail fragment skips the lookup.
+    related_products = SimpleLazyObject(lambda: recommendations.related_products(product))
     return render(request, 'store/product_detail.html', {
         'product': product,
         'related_products': related_products
@@ -97,15 +114,7 @@ def add_to_cart(request, pk):
     product = get_object_or_404(Product, pk=pk)
     customer = get_object_or_404(Customer, user=request.user)
     
-    cart_item, created = Cart.objects.get_or_create(
-        customer=customer,
-        product=product,
-        defaults={'quantity': 1}
-    )
-    
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    add_cart_item(customer, product)
     
     messages.success(request, f'{product.name} added to cart!')
     return redirect('cart')
@@ -153,42 +162,27 @@ def remove_from_cart(request, pk):
 def checkout(request):
     """Checkout process"""
     customer = get_object_or_404(Customer, user=request.user)
-    cart_items = Cart.objects.filter(customer=customer)
-    
-    if not cart_items.exists():
-        messages.warning(request, 'Your cart is empty!')
-        return redirect('cart')
-    
-    total = sum(item.get_total() for item in cart_items)
     
     if request.method == 'POST':
         payment_type = request.POST.get('payment_type')
         address = request.POST.get('address', customer.address)
         
-        # Create orders for each cart item
-        for item in cart_items:
-            order = Order.objects.create(
-                customer=customer,
-                product=item.product,
-                name=customer.name,
-                address=address,
-                price=item.product.price,
-                quantity=item.quantity,
-                status='Pending'
-            )
-            
-            # Create payment record
-            Payment.objects.create(
-                order=order,
-                payment_type=payment_type
-            )
-        
-        # Clear cart
-        cart_items.delete()
+        try:
+            place_order(customer, address, payment_type)
+        except EmptyCartError:
+            messages.warning(request, 'Your cart is empty!')
+            return redirect('cart')
         
         messages.success(request, 'Order placed successfully! We will contact you soon.')
         return redirect('my_orders')
     
+    cart_items = list(Cart.objects.filter(customer=customer).select_related('product'))
+    if not cart_items:
+        messages.warning(request, 'Your cart is empty!')
+        return redirect('cart')
+    
+    total = sum(item.get_total() for item in cart_items)
+    
     return render(request, 'store/checkout.html', {
         'cart_items': cart_items,
         'total': total,
@@ -197,10 +191,14 @@ def checkout(request):
 
 @login_required
 def my_orders(request):
-    """View customer orders"""
+    """View customer orders; ?history=1 adds the archived ones"""
     customer = get_object_or_404(Customer, user=request.user)
-    orders = Order.objects.filter(customer=customer)
-    return render(request, 'store/my_orders.html', {'orders': orders})
+    orders = Order.objects.filter(customer=customer).with_items()
+    history = archive.wants_history(request)
+    if history:
+        archived = ArchivedOrder.objects.filter(customer=customer).with_items()
+        orders = archive.newest_first(orders, archived)
+    return render(request, 'store/my_orders.html', {'orders': orders, 'history': history})
 
 # ============= FEEDBACK & COMPLAINT VIEWS =============
 